@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class NotesAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from overhead import scheduler
+        from . import history, semantic
+
+        scheduler.register('notes_app.thin_versions', history.thin_due, 24 * 60 * 60)
+        scheduler.register('notes_app.embed_stale', semantic.embed_stale, 60 * 60)
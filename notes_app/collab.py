@@ -0,0 +1,393 @@
+"""
+Real-time collaborative editing of notes.
+
+Editors of a note (its owner and users it is shared with for editing) join a
+session over Server-Sent Events and send their edits as operations against
+the revision they last saw. Operations use the ot.js format: a list of
+components where a positive int retains that many characters, a negative
+int deletes that many and a string is inserted. Lengths are counted in
+UTF-16 code units like JavaScript strings, so the document is held as
+UTF-16-LE bytes.
+
+The server keeps one ``Session`` per note with open editors, in memory:
+
+* an operation based on an older revision is transformed against the ones
+  applied since (the last ``HISTORY_SIZE`` are kept; older clients resync),
+  applied, and broadcast to ``note:<id>`` with its new revision
+* the content is written to ``Note.content`` ``PERSIST_SECONDS`` after the
+  first unsaved edit and when the last editor leaves, through the normal
+  save path (versions, previews, search index)
+* presence (who is connected and where their cursor is) is broadcast on join,
+  leave and cursor moves
+
+Like the SSE broker, sessions live in one process: every editor of a note
+must be served by the same ASGI worker.
+"""
+
+import threading
+import uuid
+from collections import deque
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from overhead import background
+from overhead.events import broker
+
+from . import history
+from .models import Note, SharedNote
+
+HISTORY_SIZE = 1000
+PERSIST_SECONDS = 5
+COLORS = ('#E0585B', '#3F8AE0', '#4CAF50', '#F5A623', '#9B59B6', '#1ABC9C', '#E67E22', '#34495E')
+
+
+class CollabError(ValueError):
+    """Raised for malformed operations and unknown clients"""
+
+
+class ResyncRequired(Exception):
+    """The client is too far behind (or its session ended) and must rejoin"""
+
+
+def encode(text):
+    # Clients may split a surrogate pair across operations
+    return text.encode('utf-16-le', 'surrogatepass')
+
+
+def units(text):
+    """Length of ``text`` in UTF-16 code units"""
+    return len(encode(text)) // 2
+
+
+# ==== Operations ====
+
+class _Builder:
+    """Collects components, merging neighbours the way ot.js normalizes operations"""
+
+    def __init__(self):
+        self.ops = []
+
+    def retain(self, n):
+        if n <= 0:
+            return
+        if self.ops and isinstance(self.ops[-1], int) and self.ops[-1] > 0:
+            self.ops[-1] += n
+        else:
+            self.ops.append(n)
+
+    def insert(self, text):
+        if not text:
+            return
+        ops = self.ops
+        if ops and isinstance(ops[-1], str):
+            ops[-1] += text
+        elif ops and isinstance(ops[-1], int) and ops[-1] < 0:
+            # Inserts go before an adjacent delete
+            if len(ops) > 1 and isinstance(ops[-2], str):
+                ops[-2] += text
+            else:
+                ops.insert(len(ops) - 1, text)
+        else:
+            ops.append(text)
+
+    def delete(self, n):
+        if n <= 0:
+            return
+        if self.ops and isinstance(self.ops[-1], int) and self.ops[-1] < 0:
+            self.ops[-1] -= n
+        else:
+            self.ops.append(-n)
+
+
+def validate(op):
+    """Normalized copy of an operation received from a client"""
+    if not isinstance(op, list):
+        raise CollabError('Operation must be a list')
+    builder = _Builder()
+    for component in op:
+        if isinstance(component, str):
+            builder.insert(component)
+        elif isinstance(component, int) and not isinstance(component, bool) and component:
+            if component > 0:
+                builder.retain(component)
+            else:
+                builder.delete(-component)
+        else:
+            raise CollabError(f"Invalid operation component {component!r}")
+    return builder.ops
+
+
+def base_length(op):
+    return sum(abs(component) for component in op if isinstance(component, int))
+
+
+def apply(document, op):
+    """Apply ``op`` to a UTF-16-LE ``bytearray`` document, returning the new document"""
+    if base_length(op) != len(document) // 2:
+        raise CollabError('Operation does not match the document length')
+    result = bytearray()
+    position = 0
+    for component in op:
+        if isinstance(component, str):
+            result += encode(component)
+        elif component > 0:
+            result += document[position:position + 2 * component]
+            position += 2 * component
+        else:
+            position -= 2 * component
+    return result
+
+
+def transform(a, b):
+    """``(a', b')`` such that applying a then b' equals b then a'; inserts of ``a`` go first"""
+    a_prime, b_prime = _Builder(), _Builder()
+    ops_a, ops_b = list(a), list(b)
+    i = j = 0
+    op_a = ops_a[0] if ops_a else None
+    op_b = ops_b[0] if ops_b else None
+
+    def next_a():
+        nonlocal i, op_a
+        i += 1
+        op_a = ops_a[i] if i < len(ops_a) else None
+
+    def next_b():
+        nonlocal j, op_b
+        j += 1
+        op_b = ops_b[j] if j < len(ops_b) else None
+
+    while op_a is not None or op_b is not None:
+        if isinstance(op_a, str):
+            a_prime.insert(op_a)
+            b_prime.retain(units(op_a))
+            next_a()
+            continue
+        if isinstance(op_b, str):
+            a_prime.retain(units(op_b))
+            b_prime.insert(op_b)
+            next_b()
+            continue
+        if op_a is None or op_b is None:
+            raise CollabError('Operations were not made against the same document')
+
+        if op_a > 0 and op_b > 0:
+            length = min(op_a, op_b)
+            a_prime.retain(length)
+            b_prime.retain(length)
+        elif op_a < 0 and op_b < 0:
+            length = min(-op_a, -op_b)
+        elif op_a < 0:
+            length = min(-op_a, op_b)
+            a_prime.delete(length)
+        else:
+            length = min(op_a, -op_b)
+            b_prime.delete(length)
+
+        op_a = op_a - length if op_a > 0 else op_a + length
+        op_b = op_b - length if op_b > 0 else op_b + length
+        if op_a == 0:
+            next_a()
+        if op_b == 0:
+            next_b()
+    return a_prime.ops, b_prime.ops
+
+
+def replace_op(old, new):
+    """Operation turning ``old`` into ``new`` (one replaced range between common prefix and suffix)"""
+    old_units, new_units = encode(old), encode(new)
+    prefix = 0
+    limit = min(len(old_units), len(new_units)) // 2
+    while prefix < limit and old_units[2 * prefix:2 * prefix + 2] == new_units[2 * prefix:2 * prefix + 2]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old_units[len(old_units) - 2 * suffix - 2:len(old_units) - 2 * suffix] == \
+            new_units[len(new_units) - 2 * suffix - 2:len(new_units) - 2 * suffix]:
+        suffix += 1
+    builder = _Builder()
+    builder.retain(prefix)
+    builder.insert(new_units[2 * prefix:len(new_units) - 2 * suffix].decode('utf-16-le', 'surrogatepass'))
+    builder.delete(len(old_units) // 2 - prefix - suffix)
+    builder.retain(suffix)
+    return builder.ops
+
+
+# ==== Sessions ====
+
+class Session:
+    def __init__(self, note_id, content):
+        self.note_id = note_id
+        self.document = bytearray(encode(content))
+        self.revision = 0
+        self.history = deque(maxlen=HISTORY_SIZE)  # Operations that produced revisions revision - len + 1 .. revision
+        self.persisted_revision = 0
+        self.persist_timer = None
+        self.persist_lock = threading.Lock()  # One persist at a time, so an older snapshot never lands last
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    @property
+    def content(self):
+        return self.document.decode('utf-16-le', 'surrogatepass')
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def channel(note_id):
+    return f"note:{note_id}"
+
+
+def permission(user, note_id):
+    """'EDIT' or 'VIEW' for the owner and users the note is shared with, otherwise None"""
+    if Note.objects.filter(pk=note_id, user=user).exists():
+        return 'EDIT'
+    share = SharedNote.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()), note_id=note_id, shared_with=user,
+    ).values_list('permission', flat=True).first()
+    return share
+
+
+def _presence(client):
+    return {key: client[key] for key in ('client_id', 'user_id', 'name', 'color', 'can_edit', 'cursor')}
+
+
+def join(note_id, user, access):
+    """Add an editor to the note's session (opening it if needed); returns the initial state"""
+    with _sessions_lock:
+        session = _sessions.get(note_id)
+        if session is None:
+            content = Note.objects.filter(pk=note_id).values_list('content', flat=True).first() or ''
+            session = _sessions[note_id] = Session(note_id, content)
+        with session.lock:
+            client = {
+                'client_id': uuid.uuid4().hex[:12],
+                'user_id': user.id,
+                'name': user.get_full_name() or user.username,
+                'color': COLORS[len(session.clients) % len(COLORS)],
+                'can_edit': access == 'EDIT',
+                'cursor': None,
+            }
+            session.clients[client['client_id']] = client
+            broker.publish(channel(note_id), 'collab.join', _presence(client))
+            return {
+                'client_id': client['client_id'],
+                'revision': session.revision,
+                'content': session.content,
+                'clients': [_presence(other) for other in session.clients.values()],
+            }
+
+
+def leave(note_id, client_id):
+    """Remove an editor; when the last one leaves the session is saved and closed in the background"""
+    session = _sessions.get(note_id)
+    if session is None:
+        return
+    with session.lock:
+        session.clients.pop(client_id, None)
+        broker.publish(channel(note_id), 'collab.leave', {'client_id': client_id})
+        last = not session.clients
+    if last:
+        background.submit(_close_session, session)
+
+
+def _close_session(session):
+    # The session stays open while saving, so an editor joining meanwhile gets its content
+    _persist_session(session)
+    with _sessions_lock, session.lock:
+        if session.clients or _sessions.get(session.note_id) is not session:
+            return
+        del _sessions[session.note_id]
+        if session.persist_timer is not None:
+            session.persist_timer.cancel()
+
+
+def _client(session, client_id):
+    client = session.clients.get(client_id)
+    if client is None:
+        raise ResyncRequired('Unknown client, join the session again')
+    return client
+
+
+def submit(note_id, client_id, revision, op, user_id=None):
+    """Apply a client operation made against ``revision``; returns the new revision"""
+    op = validate(op)
+    session = _sessions.get(note_id)
+    if session is None:
+        raise ResyncRequired('The session has ended, join it again')
+    with session.lock:
+        if client_id is not None:
+            client = _client(session, client_id)
+            if not client['can_edit'] or (user_id is not None and client['user_id'] != user_id):
+                raise PermissionError('Not allowed to edit this note')
+        if not isinstance(revision, int) or revision > session.revision:
+            raise CollabError('Unknown revision')
+        behind = session.revision - revision
+        if behind > len(session.history):
+            raise ResyncRequired('Too many changes since this revision, reload the note')
+        for concurrent in list(session.history)[len(session.history) - behind:]:
+            op, _ = transform(op, concurrent)
+        session.document = apply(session.document, op)
+        session.history.append(op)
+        session.revision += 1
+        broker.publish(channel(note_id), 'collab.op', {
+            'revision': session.revision,
+            'client_id': client_id,
+            'op': op,
+        })
+        if session.persist_timer is None:
+            session.persist_timer = threading.Timer(PERSIST_SECONDS, background.submit, [_persist_session, session])
+            session.persist_timer.daemon = True
+            session.persist_timer.start()
+        return session.revision
+
+
+def move_cursor(note_id, client_id, cursor, user_id=None):
+    """Record and broadcast a client's cursor (``[start, end]`` at its current revision, or None)"""
+    session = _sessions.get(note_id)
+    if session is None:
+        raise ResyncRequired('The session has ended, join it again')
+    if cursor is not None and not (
+        isinstance(cursor, list) and len(cursor) == 2 and all(isinstance(value, int) for value in cursor)
+    ):
+        raise CollabError('Cursor must be [start, end]')
+    with session.lock:
+        client = _client(session, client_id)
+        if user_id is not None and client['user_id'] != user_id:
+            raise PermissionError('Not allowed to move this cursor')
+        client['cursor'] = cursor
+        broker.publish(channel(note_id), 'collab.presence', _presence(client))
+
+
+def replace(note_id, content):
+    """Apply a whole-document write made outside the session (e.g. an autosave PUT) to a live session"""
+    session = _sessions.get(note_id)
+    if session is None:
+        return False
+    with session.lock:
+        revision, old = session.revision, session.content
+    submit(note_id, None, revision, replace_op(old, content))
+    return True
+
+
+def _persist_session(session):
+    # The timer and _close_session can both submit a persist to the background pool
+    with session.persist_lock:
+        with session.lock:
+            session.persist_timer = None
+            revision = session.revision
+            content = session.document.decode('utf-16-le', 'replace')  # A lone surrogate cannot be stored
+        if revision <= session.persisted_revision:
+            return
+        with transaction.atomic():
+            note = Note.objects.select_for_update().filter(pk=session.note_id).first()
+            if note is not None and note.content != content:
+                history.record(note, note.content, min_interval=history.autosave_interval())
+                note.content = content
+                note.save()
+        with session.lock:
+            session.persisted_revision = revision
+
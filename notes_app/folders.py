@@ -0,0 +1,68 @@
+"""
+Cached folder tree of the notes sidebar.
+
+The tree is built from one query for all folders of a user, linked through
+an in-memory parent -> children map, and cached per user. Folder signals
+drop the cached tree when a folder is created, changed or deleted. Note
+counts change with every note that is created, moved or archived, so they
+are not cached but read with a single aggregate per request.
+"""
+
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Folder, Note
+
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _key(user_id):
+    return f"notes_app:folder-tree:{user_id}"
+
+
+def invalidate(user_id):
+    """Drop the cached tree once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(_key(user_id)))
+
+
+def build_tree(user):
+    """Nested folder dicts in sidebar order (position, name)"""
+    children = defaultdict(list)
+    for folder in Folder.objects.filter(user=user).values('id', 'parent_id', 'name', 'color', 'icon', 'position'):
+        children[folder.pop('parent_id')].append(folder)
+
+    def attach(items):
+        for item in items:
+            item['children'] = attach(children.get(item['id'], []))
+        return items
+
+    # Folders whose parent chain never reaches the root are unreachable, as before
+    return attach(children.get(None, []))
+
+
+def note_counts(user):
+    """Number of active notes per folder id"""
+    return dict(
+        Note.objects.filter(user=user, is_archived=False, folder__isnull=False)
+        .values('folder_id').annotate(count=Count('id')).values_list('folder_id', 'count')
+    )
+
+
+def folder_tree(user):
+    """The cached tree with current note counts filled in"""
+    tree = cache.get(_key(user.id))
+    if tree is None:
+        tree = build_tree(user)
+        cache.set(_key(user.id), tree, CACHE_TIMEOUT)
+    counts = note_counts(user)
+
+    def with_counts(items):
+        return [
+            {**item, 'note_count': counts.get(item['id'], 0), 'children': with_counts(item['children'])}
+            for item in items
+        ]
+
+    return with_counts(tree)
@@ -0,0 +1,243 @@
+"""
+Delta-compressed note version history.
+
+A ``NoteVersion`` stores the content a note had before a change. Most
+versions are stored as a zlib-compressed line delta against the previous
+version: copy ranges of its lines plus inserted text. Every
+``SNAPSHOT_INTERVAL`` versions (and whenever a delta would not be smaller)
+the full content is stored instead, so reconstructing any version reads one
+snapshot and at most ``SNAPSHOT_INTERVAL - 1`` deltas.
+
+History is kept in full, thinned by age according to
+``NOTES_VERSION_RETENTION``: a list of ``(max age in days, bucket seconds)``
+tiers. Within a tier only the newest version of each bucket survives
+(bucket 0 keeps everything); a final tier with ``None`` as its age keeps
+old versions forever, otherwise versions older than the last tier are
+dropped. Thinning re-encodes the surviving chain, so deltas never point at a
+deleted version. ``thin_due`` runs daily from the scheduler.
+
+Autosaves record at most one version per ``NOTES_VERSION_INTERVAL_SECONDS``:
+the first save of a burst of edits keeps the content from before the burst,
+the saves that follow only update the note. The state a burst ends in is
+kept by the first save after the interval, i.e. once the note was idle.
+"""
+
+import datetime
+import difflib
+import hashlib
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import NoteVersion
+
+SNAPSHOT_INTERVAL = 20
+DEFAULT_RETENTION = (
+    (1, 0),  # The last day: every version
+    (7, 60 * 60),  # The last week: one per hour
+    (90, 24 * 60 * 60),  # The last 90 days: one per day
+    (None, 7 * 24 * 60 * 60),  # Older: one per week
+)
+# Notes whose versions crossed a tier boundary this long ago are thinned again
+THIN_LOOKBACK = datetime.timedelta(days=2)
+
+
+class CorruptHistory(Exception):
+    """Raised when a reconstructed version does not match its checksum"""
+
+
+def checksum(content):
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def retention():
+    return getattr(settings, 'NOTES_VERSION_RETENTION', DEFAULT_RETENTION)
+
+
+def make_delta(base, content):
+    """Line delta turning ``base`` into ``content``: ``[start, end]`` copies base lines, strings are inserted"""
+    base_lines = base.splitlines(keepends=True)
+    lines = content.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, base_lines, lines).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(lines[j1:j2]))
+    return ops
+
+
+def apply_delta(base, ops):
+    base_lines = base.splitlines(keepends=True)
+    return ''.join(''.join(base_lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+def _encode(base, content, chain_length):
+    """``(kind, data)`` for ``content`` following ``base`` after ``chain_length`` deltas"""
+    snapshot = zlib.compress(content.encode())
+    if base is None or chain_length >= SNAPSHOT_INTERVAL - 1:
+        return 'snapshot', snapshot
+    delta = zlib.compress(json.dumps(make_delta(base, content), separators=(',', ':')).encode())
+    if len(delta) >= len(snapshot):
+        return 'snapshot', snapshot
+    return 'delta', delta
+
+
+def _decode(version, base):
+    data = zlib.decompress(bytes(version.data)).decode()
+    if version.kind == 'snapshot':
+        return data
+    if base is None:
+        raise CorruptHistory(f"Version {version.version_number} of note {version.note_id} has no base version")
+    return apply_delta(base, json.loads(data))
+
+
+def _chain(note_id, version_number):
+    """Versions from the nearest snapshot up to ``version_number``, oldest first"""
+    versions = NoteVersion.objects.filter(note_id=note_id, version_number__lte=version_number).order_by('-version_number')
+    rows = list(versions[:SNAPSHOT_INTERVAL])
+    if rows and not any(row.kind == 'snapshot' for row in rows):
+        rows = list(versions)  # Chain written with a larger interval
+    chain = []
+    for row in rows:
+        chain.append(row)
+        if row.kind == 'snapshot':
+            break
+    return chain[::-1]
+
+
+def content(note_id, version_number):
+    """Content of one version, or None if the note has no such version"""
+    chain = _chain(note_id, version_number)
+    if not chain or chain[-1].version_number != version_number:
+        return None
+    text = None
+    for version in chain:
+        text = _decode(version, text)
+    if checksum(text) != chain[-1].checksum:
+        raise CorruptHistory(f"Version {version_number} of note {note_id} does not match its checksum")
+    return text
+
+
+def autosave_interval():
+    return datetime.timedelta(seconds=getattr(settings, 'NOTES_VERSION_INTERVAL_SECONDS', 300))
+
+
+def record(note, text, created_at=None, min_interval=None):
+    """Append ``text`` as the newest version of ``note``; returns the version, or None if it was not recorded
+
+    Nothing is recorded when ``text`` equals the newest version or, with
+    ``min_interval``, when the newest version is younger than that.
+    """
+    created_at = created_at or timezone.now()
+    last = note.versions.order_by('-version_number').only('version_number', 'checksum', 'created_at').first()
+    if last and min_interval and created_at - last.created_at < min_interval:
+        return None
+    digest = checksum(text)
+    if last and last.checksum == digest:
+        return None
+
+    base, chain_length = None, 0
+    if last:
+        chain = _chain(note.pk, last.version_number)
+        for version in chain:
+            base = _decode(version, base)
+        chain_length = len(chain) - 1
+    kind, data = _encode(base, text, chain_length)
+    return NoteVersion.objects.create(
+        note=note,
+        version_number=last.version_number + 1 if last else 1,
+        kind=kind,
+        data=data,
+        size=len(text),
+        checksum=digest,
+        created_at=created_at,
+    )
+
+
+def first_version(note, created_at=None):
+    """Unsaved first version of a new note, for ``bulk_create``"""
+    return NoteVersion(
+        note=note,
+        version_number=1,
+        kind='snapshot',
+        data=zlib.compress(note.content.encode()),
+        size=len(note.content),
+        checksum=checksum(note.content),
+        created_at=created_at or timezone.now(),
+    )
+
+
+def diff(old, new, old_label, new_label):
+    """Unified diff between two contents"""
+    return ''.join(difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True), fromfile=old_label, tofile=new_label,
+    ))
+
+
+def versions_to_keep(versions, now):
+    """Numbers of the versions that survive retention; ``versions`` are ``(number, created_at)`` pairs"""
+    keep = set()
+    buckets = set()
+    for number, created_at in sorted(versions, reverse=True):
+        age = now - created_at
+        for tier, (max_days, bucket_seconds) in enumerate(retention()):
+            if max_days is None or age <= datetime.timedelta(days=max_days):
+                break
+        else:
+            continue  # Older than every tier
+        if not bucket_seconds:
+            keep.add(number)
+            continue
+        bucket = (tier, int(created_at.timestamp()) // bucket_seconds)
+        if bucket not in buckets:
+            buckets.add(bucket)
+            keep.add(number)
+    return keep
+
+
+def thin(note_id, now=None):
+    """Apply retention to one note, re-encoding the versions that remain; returns the number removed"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        versions = list(NoteVersion.objects.filter(note_id=note_id).order_by('version_number'))
+        keep = versions_to_keep([(version.version_number, version.created_at) for version in versions], now)
+        if len(keep) == len(versions):
+            return 0
+
+        changed = []
+        text = kept_text = None
+        chain_length = 0
+        for version in versions:
+            text = _decode(version, text)
+            if version.version_number not in keep:
+                continue
+            kind, data = _encode(kept_text, text, chain_length)
+            chain_length = 0 if kind == 'snapshot' else chain_length + 1
+            kept_text = text
+            if kind != version.kind or data != bytes(version.data):
+                version.kind, version.data = kind, data
+                changed.append(version)
+
+        NoteVersion.objects.bulk_update(changed, ['kind', 'data'], batch_size=500)
+        removed = [version.pk for version in versions if version.version_number not in keep]
+        NoteVersion.objects.filter(pk__in=removed).delete()
+        return len(removed)
+
+
+def thin_due(now=None, lookback=THIN_LOOKBACK):
+    """Scheduler job: thin the notes with versions that moved to a coarser tier within ``lookback``"""
+    now = now or timezone.now()
+    crossed = Q()
+    for max_days, _ in retention():
+        if max_days is not None:
+            boundary = now - datetime.timedelta(days=max_days)
+            crossed |= Q(created_at__lte=boundary, created_at__gt=boundary - lookback)
+    if not crossed:
+        return 0
+    note_ids = NoteVersion.objects.filter(crossed).values_list('note_id', flat=True).distinct()
+    return sum(thin(note_id, now) for note_id in list(note_ids))
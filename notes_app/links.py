@@ -0,0 +1,202 @@
+"""
+Wiki links between notes.
+
+``[[Title]]``, ``[[Title#Heading]]``, ``[[Title|shown text]]`` and embeds
+(``![[Title]]``) in a note's content are stored as ``NoteLink`` rows when
+the note is saved, so backlinks and the link graph are index lookups
+instead of scans over every note's content. Links to files (a target with
+an extension other than ``.md``) and links inside code are ignored.
+
+A link points at the oldest note of the same user whose title matches
+case-insensitively. Links to titles no note has yet keep their
+``target_key`` and no target; they are resolved when a note gets that
+title. Renaming or deleting a note moves its incoming links to another
+note with the old title, or leaves them unresolved. Bulk writes that
+bypass the note signals must call ``update_notes`` and ``resolve_pending``
+themselves.
+"""
+
+import posixpath
+import re
+import string
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Note, NoteLink
+
+WIKI_LINK = re.compile(r'!?\[\[([^\[\]\n]+?)\]\]')
+CODE = re.compile(r'```.*?```|~~~.*?~~~|`[^`\n]*`', re.S)
+MAX_LINKS = 1000  # Per note
+CONTEXT_CHARS = 200
+GRAPH_DEPTH = 2
+MAX_GRAPH_DEPTH = 3
+MAX_GRAPH_NODES = 200
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def title_key(title):
+    """``title`` the way ``Lower('title')`` compares it (SQLite's LOWER only folds ASCII letters)"""
+    if connection.vendor == 'sqlite':
+        return title.translate(_ASCII_LOWER)
+    return title.lower()
+
+
+def _context(content, start, end):
+    """The line around ``content[start:end]``, cut to about ``CONTEXT_CHARS``"""
+    line_start = content.rfind('\n', 0, start) + 1
+    line_end = content.find('\n', end)
+    line_end = len(content) if line_end < 0 else line_end
+    left = max(line_start, start - CONTEXT_CHARS // 2)
+    right = min(line_end, left + CONTEXT_CHARS)
+    return ('…' if left > line_start else '') + content[left:right].strip() + ('…' if right < line_end else '')
+
+
+def parse(content):
+    """Links in ``content`` as ``(target title, anchor, alias, context)`` tuples, in order"""
+    code = [match.span() for match in CODE.finditer(content)]
+    found = []
+    for match in WIKI_LINK.finditer(content):
+        if any(start <= match.start() < end for start, end in code):
+            continue
+        target, _, alias = match.group(1).replace('\\|', '|').partition('|')
+        target, _, anchor = target.partition('#')
+        target = posixpath.basename(target.strip())  # Vault paths resolve by title
+        name, extension = posixpath.splitext(target)
+        if extension.lower() == '.md':
+            target = name
+        elif extension and ' ' not in extension:
+            continue  # A file, not a note
+        if not target:
+            continue  # [[#Heading]] within the same note
+        found.append((target[:255], anchor.strip()[:255], alias.strip()[:255], _context(content, *match.span())[:255]))
+        if len(found) >= MAX_LINKS:
+            break
+    return found
+
+
+def targets(user_id, keys):
+    """Note id by title key for the given keys, the oldest note winning"""
+    found = {}
+    keys = list(keys)
+    for offset in range(0, len(keys), 500):
+        notes = Note.objects.annotate(key=Lower('title')).filter(user_id=user_id, key__in=keys[offset:offset + 500])
+        for key, note_id in notes.order_by('-id').values_list('key', 'id'):
+            found[key] = note_id
+    return found
+
+
+def _build(notes):
+    """Unsaved links of ``notes`` (all of one user) with their targets resolved"""
+    parsed = [(note, parse(note.content)) for note in notes]
+    keys = {title_key(title) for _, links in parsed for title, _, _, _ in links}
+    found = targets(notes[0].user_id, keys) if keys else {}
+    return [
+        NoteLink(
+            user_id=note.user_id,
+            source_id=note.pk,
+            target_id=found.get(title_key(title)),
+            target_key=title_key(title),
+            target_title=title,
+            anchor=anchor,
+            alias=alias,
+            context=context,
+            position=position,
+        )
+        for note, links in parsed for position, (title, anchor, alias, context) in enumerate(links)
+    ]
+
+
+def _fields(link):
+    return link.target_id, link.target_key, link.target_title, link.anchor, link.alias, link.context
+
+
+def update_note(note):
+    """Refresh the outgoing links of a saved note and the links pointing at its title"""
+    new = _build([note])
+    with transaction.atomic():
+        old = list(NoteLink.objects.filter(source=note).order_by('position'))
+        if [_fields(link) for link in old] != [_fields(link) for link in new]:
+            NoteLink.objects.filter(source=note).delete()
+            NoteLink.objects.bulk_create(new)
+        retarget(note)
+
+
+def update_notes(notes):
+    """``update_note`` for many notes of one user in a few queries (incoming links are left to ``resolve_pending``)"""
+    notes = list(notes)
+    if not notes:
+        return
+    with transaction.atomic():
+        NoteLink.objects.filter(source__in=[note.pk for note in notes]).delete()
+        NoteLink.objects.bulk_create(_build(notes), batch_size=500)
+
+
+def retarget(note):
+    """After a save: links that point at the note under an old title move on, links to its title find it"""
+    key = title_key(note.title)
+    renamed = set(NoteLink.objects.filter(target=note).exclude(target_key=key).values_list('target_key', flat=True))
+    if renamed:
+        NoteLink.objects.filter(target=note, target_key__in=renamed).update(target=None)
+        resolve_pending(note.user_id, renamed)
+    NoteLink.objects.filter(user_id=note.user_id, target__isnull=True, target_key=key).update(target=note)
+
+
+def resolve_pending(user_id, keys=None):
+    """Point unresolved links of a user (to ``keys``, or all) at the notes that now have those titles"""
+    pending = NoteLink.objects.filter(user_id=user_id, target__isnull=True)
+    if keys is not None:
+        pending = pending.filter(target_key__in=list(keys))
+    found = targets(user_id, set(pending.values_list('target_key', flat=True)))
+    by_target = defaultdict(list)
+    for key, note_id in found.items():
+        by_target[note_id].append(key)
+    for note_id, note_keys in by_target.items():
+        pending.filter(target_key__in=note_keys).update(target_id=note_id)
+
+
+def backlinks(note):
+    """Links pointing at ``note`` with their source notes, most recently updated source first"""
+    return NoteLink.objects.filter(target=note).select_related('source').only(
+        'anchor', 'alias', 'context', 'position',
+        'source__id', 'source__title', 'source__folder', 'source__updated_at', 'source__is_archived',
+    ).order_by('-source__updated_at', 'source_id', 'position')
+
+
+def graph(note, depth=GRAPH_DEPTH, max_nodes=MAX_GRAPH_NODES):
+    """Notes within ``depth`` links of ``note`` (in either direction) and the links between them
+
+    Returns ``(nodes, edges, truncated)``: node dicts with their distance from
+    ``note``, and ``(source id, target id)`` edges between returned nodes.
+    """
+    depth = max(1, min(depth, MAX_GRAPH_DEPTH))
+    distance = {note.pk: 0}
+    frontier = {note.pk}
+    truncated = False
+    for hop in range(1, depth + 1):
+        neighbours = set()
+        for source_id, target_id in NoteLink.objects.filter(
+            Q(source_id__in=frontier) | Q(target_id__in=frontier), target__isnull=False,
+        ).values_list('source_id', 'target_id'):
+            neighbours.update((source_id, target_id))
+        frontier = set()
+        for note_id in sorted(neighbours - set(distance)):
+            if len(distance) >= max_nodes:
+                truncated = True
+                break
+            distance[note_id] = hop
+            frontier.add(note_id)
+        if not frontier:
+            break
+
+    nodes = [
+        {**values, 'distance': distance[values['id']]}
+        for values in Note.objects.filter(pk__in=list(distance)).values('id', 'title', 'folder_id', 'is_archived')
+    ]
+    nodes.sort(key=lambda node: (node['distance'], node['title'].lower()))
+    edges = sorted(set(NoteLink.objects.filter(
+        source_id__in=list(distance), target_id__in=list(distance),
+    ).values_list('source_id', 'target_id')))
+    return nodes, edges, truncated
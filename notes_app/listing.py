@@ -0,0 +1,59 @@
+"""
+Keyset pagination of note listings.
+
+Listings are ordered by ``-is_pinned, -updated_at, -id`` (the model order
+plus the id as a tiebreaker). The cursor is the sort key of the last note
+of a page, so every page is an index range scan on
+``notes_note_listing_idx`` instead of an OFFSET that re-reads all earlier
+rows, and notes edited while paging do not shift later pages. Cursors
+hold the timestamp in epoch microseconds so they only contain URL-safe
+characters.
+"""
+
+import datetime
+
+from django.db.models import Q
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+ORDERING = ('-is_pinned', '-updated_at', '-id')
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class CursorError(ValueError):
+    """Raised for a cursor that was not produced by ``encode_cursor``"""
+
+
+def encode_cursor(note):
+    micros = (note.updated_at - EPOCH) // datetime.timedelta(microseconds=1)
+    return f"{int(note.is_pinned)}-{micros}-{note.id}"
+
+
+def decode_cursor(cursor):
+    try:
+        pinned, micros, note_id = cursor.split('-')
+        return pinned == '1', EPOCH + datetime.timedelta(microseconds=int(micros)), int(note_id)
+    except (AttributeError, ValueError, OverflowError):
+        raise CursorError(f"Invalid cursor '{cursor}'")
+
+
+def after(cursor):
+    """Condition selecting the notes that sort after ``cursor``"""
+    pinned, updated_at, note_id = decode_cursor(cursor)
+    condition = Q(is_pinned=pinned, updated_at__lt=updated_at) | Q(is_pinned=pinned, updated_at=updated_at, id__lt=note_id)
+    if pinned:
+        condition |= Q(is_pinned=False)
+    return condition
+
+
+def page(queryset, cursor=None, limit=PAGE_SIZE):
+    """One page of ``queryset``; returns ``(notes, next cursor or None)``"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        queryset = queryset.filter(after(cursor))
+    notes = list(queryset.order_by(*ORDERING)[:limit + 1])
+    if len(notes) > limit:
+        notes = notes[:limit]
+        return notes, encode_cursor(notes[-1])
+    return notes, None
@@ -0,0 +1,24 @@
+"""Management command to compute the semantic search embeddings of notes"""
+from django.core.management.base import BaseCommand
+
+from notes_app import semantic
+from notes_app.models import Note
+
+
+class Command(BaseCommand):
+    help = 'Embeds notes whose semantic search chunks are missing or out of date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Check every note instead of the stale ones')
+        parser.add_argument('--user', help='Only the notes of this username')
+
+    def handle(self, *args, **options):
+        notes = Note.objects.all() if options['all'] else Note.objects.filter(pk__in=semantic.stale_note_ids())
+        if options['user']:
+            notes = notes.filter(user__username=options['user'])
+        note_ids = list(notes.order_by('id').values_list('id', flat=True))
+
+        embedded = 0
+        for offset in range(0, len(note_ids), semantic.UPDATE_BATCH):
+            embedded += semantic.update_notes(note_ids[offset:offset + semantic.UPDATE_BATCH])
+        self.stdout.write(self.style.SUCCESS(f"Checked {len(note_ids)} notes, embedded {embedded} chunks"))
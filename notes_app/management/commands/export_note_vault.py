@@ -0,0 +1,31 @@
+"""Management command to export notes as a Markdown vault archive"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from notes_app import vault
+from notes_app.models import Folder
+
+
+class Command(BaseCommand):
+    help = "Writes a user's notes (or one folder with its subfolders) to a Markdown vault ZIP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='ZIP file to write')
+        parser.add_argument('--user', required=True, help='Username whose notes to export')
+        parser.add_argument('--folder', type=int, help='ID of the folder to export (default: all notes)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+            folder = Folder.objects.get(pk=options['folder'], user=user) if options['folder'] else None
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']}")
+        except Folder.DoesNotExist:
+            raise CommandError(f"Unknown folder {options['folder']}")
+
+        size = 0
+        with open(options['path'], 'wb') as f:
+            for chunk in vault.export_archive(user, folder):
+                f.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {size} bytes to {options['path']}"))
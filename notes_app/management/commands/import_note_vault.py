@@ -0,0 +1,38 @@
+"""Management command to import a Markdown or Obsidian vault archive as notes"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from notes_app import vault
+from notes_app.models import Folder
+
+
+class Command(BaseCommand):
+    help = 'Imports the folders, notes, tags and attachments of a vault ZIP for a user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='ZIP archive of a Markdown or Obsidian vault')
+        parser.add_argument('--user', required=True, help='Username to import the notes for')
+        parser.add_argument('--folder', type=int, help='ID of the folder to import into (default: top level)')
+        parser.add_argument('--batch-size', type=int, default=vault.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+            folder = Folder.objects.get(pk=options['folder'], user=user) if options['folder'] else None
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']}")
+        except Folder.DoesNotExist:
+            raise CommandError(f"Unknown folder {options['folder']}")
+
+        try:
+            with open(options['path'], 'rb') as f:
+                report = vault.import_archive(user, f, folder=folder, batch_size=options['batch_size'])
+        except vault.VaultError as e:
+            raise CommandError(str(e))
+
+        for skipped in report['skipped']:
+            self.stdout.write(self.style.WARNING(f"{skipped['path']}: {skipped['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['notes']} notes, {report['folders']} folders, "
+            f"{report['tags']} tags and {report['attachments']} attachments"
+        ))
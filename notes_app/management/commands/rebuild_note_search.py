@@ -0,0 +1,15 @@
+"""Management command to rebuild the full-text search index of notes"""
+from django.core.management.base import BaseCommand
+
+from notes_app import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the SQLite FTS5 index over note titles, contents and tag names'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write('Full-text index is only used on SQLite, nothing to do')
+            return
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the note search index'))
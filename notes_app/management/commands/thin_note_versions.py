@@ -0,0 +1,24 @@
+"""Management command to apply the version retention policy to note histories"""
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from notes_app import history
+from notes_app.models import NoteVersion
+
+
+class Command(BaseCommand):
+    help = 'Thins note version histories according to NOTES_VERSION_RETENTION'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Thin every note instead of recently due ones')
+        parser.add_argument('--lookback-days', type=int, default=history.THIN_LOOKBACK.days,
+                            help='Thin notes with versions that reached a coarser tier within this many days')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            note_ids = NoteVersion.objects.values_list('note_id', flat=True).distinct()
+            removed = sum(history.thin(note_id) for note_id in list(note_ids))
+        else:
+            removed = history.thin_due(lookback=datetime.timedelta(days=options['lookback_days']))
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} note versions'))
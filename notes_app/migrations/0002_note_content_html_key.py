@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='content_html_key',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+TABLE = 'notes_app_note_fts'
+
+
+def create_index(apps, schema_editor):
+    # FTS5 index used by notes_app.search; other databases use substring search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+        f"USING fts5(title, content, tags, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {TABLE} (rowid, title, content, tags) "
+        "SELECT n.id, n.title, n.content, COALESCE(("
+        "SELECT group_concat(t.name, ' ') FROM notes_app_note_tags nt "
+        "JOIN notes_app_tag t ON t.id = nt.tag_id WHERE nt.note_id = n.id), '') "
+        "FROM notes_app_note n"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes_app', '0002_note_content_html_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
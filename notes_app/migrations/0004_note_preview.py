@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_previews(apps, schema_editor):
+    Note = apps.get_model('notes_app', 'Note')
+    batch = []
+    for note in Note.objects.only('id', 'content').iterator(chunk_size=1000):
+        note.preview = ' '.join(note.content[:400].split())[:200]
+        batch.append(note)
+        if len(batch) >= 1000:
+            Note.objects.bulk_update(batch, ['preview'])
+            batch = []
+    Note.objects.bulk_update(batch, ['preview'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes_app', '0003_note_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='preview',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'is_archived', 'is_pinned', 'updated_at'], name='notes_note_listing_idx'),
+        ),
+        migrations.RunPython(backfill_previews, migrations.RunPython.noop),
+    ]
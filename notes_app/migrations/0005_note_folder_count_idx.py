@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes_app', '0004_note_preview'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'is_archived', 'folder'], name='notes_note_folder_count_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+import hashlib
+import zlib
+
+from django.db import migrations, models
+
+
+def compress_versions(apps, schema_editor):
+    NoteVersion = apps.get_model('notes_app', 'NoteVersion')
+    batch = []
+    for version in NoteVersion.objects.iterator(chunk_size=500):
+        version.kind = 'snapshot'
+        version.data = zlib.compress(version.content.encode())
+        version.size = len(version.content)
+        version.checksum = hashlib.sha1(version.content.encode()).hexdigest()
+        batch.append(version)
+        if len(batch) >= 500:
+            NoteVersion.objects.bulk_update(batch, ['kind', 'data', 'size', 'checksum'])
+            batch = []
+    NoteVersion.objects.bulk_update(batch, ['kind', 'data', 'size', 'checksum'])
+
+
+def decompress_versions(apps, schema_editor):
+    NoteVersion = apps.get_model('notes_app', 'NoteVersion')
+    # Deltas cannot be expanded without the history code, keep their snapshots only
+    NoteVersion.objects.exclude(kind='snapshot').delete()
+    for version in NoteVersion.objects.iterator(chunk_size=500):
+        version.content = zlib.decompress(bytes(version.data)).decode()
+        version.save(update_fields=['content'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes_app', '0005_note_folder_count_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noteversion',
+            name='kind',
+            field=models.CharField(choices=[('snapshot', 'Snapshot'), ('delta', 'Delta')], default='snapshot', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='noteversion',
+            name='data',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='noteversion',
+            name='size',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='noteversion',
+            name='checksum',
+            field=models.CharField(default='', max_length=40),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='noteversion',
+            name='content',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(compress_versions, decompress_versions),
+        migrations.RemoveField(
+            model_name='noteversion',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:18
+
+import posixpath
+import re
+import string
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+# Frozen copy of the link parser in links.py as of this migration, so later
+# changes to the app code cannot change what the backfill computes
+WIKI_LINK = re.compile(r'!?\[\[([^\[\]\n]+?)\]\]')
+CODE = re.compile(r'```.*?```|~~~.*?~~~|`[^`\n]*`', re.S)
+MAX_LINKS = 1000
+CONTEXT_CHARS = 200
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def title_key(title, vendor):
+    return title.translate(ASCII_LOWER) if vendor == 'sqlite' else title.lower()
+
+
+def context(content, start, end):
+    line_start = content.rfind('\n', 0, start) + 1
+    line_end = content.find('\n', end)
+    line_end = len(content) if line_end < 0 else line_end
+    left = max(line_start, start - CONTEXT_CHARS // 2)
+    right = min(line_end, left + CONTEXT_CHARS)
+    return ('…' if left > line_start else '') + content[left:right].strip() + ('…' if right < line_end else '')
+
+
+def parse(content):
+    code = [match.span() for match in CODE.finditer(content)]
+    found = []
+    for match in WIKI_LINK.finditer(content):
+        if any(start <= match.start() < end for start, end in code):
+            continue
+        target, _, alias = match.group(1).replace('\\|', '|').partition('|')
+        target, _, anchor = target.partition('#')
+        target = posixpath.basename(target.strip())
+        name, extension = posixpath.splitext(target)
+        if extension.lower() == '.md':
+            target = name
+        elif extension and ' ' not in extension:
+            continue
+        if not target:
+            continue
+        found.append((target[:255], anchor.strip()[:255], alias.strip()[:255], context(content, *match.span())[:255]))
+        if len(found) >= MAX_LINKS:
+            break
+    return found
+
+
+def build_links(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    Note = apps.get_model('notes_app', 'Note')
+    NoteLink = apps.get_model('notes_app', 'NoteLink')
+    # Oldest note per (user, lowercased title), as links.targets picks it
+    found = {}
+    for user_id, key, note_id in Note.objects.annotate(key=Lower('title')).order_by('-id').values_list('user_id', 'key', 'id'):
+        found[user_id, key] = note_id
+    batch = []
+    for note in Note.objects.only('id', 'user_id', 'content').iterator(chunk_size=500):
+        for position, (title, anchor, alias, context) in enumerate(parse(note.content)):
+            key = title_key(title, vendor)
+            batch.append(NoteLink(
+                user_id=note.user_id, source_id=note.id, target_id=found.get((note.user_id, key)), target_key=key,
+                target_title=title, anchor=anchor, alias=alias, context=context, position=position,
+            ))
+        if len(batch) >= 500:
+            NoteLink.objects.bulk_create(batch)
+            batch = []
+    NoteLink.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes_app', '0006_compressed_note_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_key', models.CharField(max_length=255)),
+                ('target_title', models.CharField(max_length=255)),
+                ('anchor', models.CharField(blank=True, max_length=255)),
+                ('alias', models.CharField(blank=True, max_length=255)),
+                ('context', models.CharField(blank=True, max_length=255)),
+                ('position', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['source', 'position'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(models.F('user'), django.db.models.functions.text.Lower('title'), name='notes_note_title_key_idx'),
+        ),
+        migrations.AddField(
+            model_name='notelink',
+            name='source',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_links', to='notes_app.note'),
+        ),
+        migrations.AddField(
+            model_name='notelink',
+            name='target',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='incoming_links', to='notes_app.note'),
+        ),
+        migrations.AddField(
+            model_name='notelink',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_links', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notelink',
+            index=models.Index(fields=['user', 'target_key'], name='notes_link_target_key_idx'),
+        ),
+        migrations.RunPython(build_links, migrations.RunPython.noop),
+    ]
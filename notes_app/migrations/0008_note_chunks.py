@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes_app', '0007_note_links'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('heading', models.CharField(blank=True, max_length=255)),
+                ('start', models.IntegerField(default=0)),
+                ('end', models.IntegerField(default=0)),
+                ('model', models.CharField(max_length=100)),
+                ('text_hash', models.CharField(max_length=40)),
+                ('vector', models.BinaryField()),
+                ('embedded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='notes_app.note')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_chunks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['note', 'position'],
+                'indexes': [models.Index(fields=['user', 'model'], name='notes_chunk_user_model_idx')],
+                'unique_together': {('note', 'position')},
+            },
+        ),
+    ]
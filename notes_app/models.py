@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.utils import timezone
 import json
@@ -43,6 +44,8 @@ class Note(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField(blank=True)
     content_html = models.TextField(blank=True)
+    content_html_key = models.CharField(max_length=64, blank=True)  # Hash of the content and renderer version behind content_html
+    preview = models.CharField(max_length=200, blank=True)  # Start of the content for listings
     tags = models.ManyToManyField(Tag, blank=True, related_name='notes')
     is_favorite = models.BooleanField(default=False)
     is_pinned = models.BooleanField(default=False)
@@ -54,18 +57,35 @@ class Note(models.Model):
     
     class Meta:
         ordering = ['-is_pinned', '-updated_at']
+        indexes = [
+            models.Index(fields=['user', 'is_archived', 'is_pinned', 'updated_at'], name='notes_note_listing_idx'),
+            models.Index(fields=['user', 'is_archived', 'folder'], name='notes_note_folder_count_idx'),
+            models.Index('user', Lower('title'), name='notes_note_title_key_idx'),  # Wiki-link resolution
+        ]
     
     def __str__(self):
         return f"{self.title} ({self.user.username})"
     
+    @staticmethod
+    def build_preview(content):
+        return ' '.join(content[:400].split())[:200]
+    
     def update_word_count(self):
+        """Set word_count from the content; saved with the note (see signals.prepare_content)"""
         self.word_count = len(self.content.split()) if self.content else 0
-        self.save()
 
 class NoteVersion(models.Model):
+    KIND_CHOICES = [
+        ('snapshot', 'Snapshot'),
+        ('delta', 'Delta'),
+    ]
+    
     note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='versions')
-    content = models.TextField()
     version_number = models.IntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='snapshot')
+    data = models.BinaryField()  # zlib-compressed content, or line delta from the previous version (see history.py)
+    size = models.IntegerField(default=0)  # Length of the content
+    checksum = models.CharField(max_length=40)  # SHA-1 of the content
     created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
@@ -105,3 +125,45 @@ class SharedNote(models.Model):
     
     def __str__(self):
         return f"{self.note.title} shared with {self.shared_with.username}"
+
+class NoteLink(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='note_links')
+    source = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='outgoing_links')
+    target = models.ForeignKey(Note, null=True, blank=True, on_delete=models.SET_NULL, related_name='incoming_links')
+    target_key = models.CharField(max_length=255)  # Lowercased title the link points at, kept while unresolved
+    target_title = models.CharField(max_length=255)  # As written in the link
+    anchor = models.CharField(max_length=255, blank=True)  # Heading or ^block after '#'
+    alias = models.CharField(max_length=255, blank=True)  # Display text after '|'
+    context = models.CharField(max_length=255, blank=True)  # The line around the link, for linked references
+    position = models.IntegerField(default=0)  # Order of the link in the source
+    
+    class Meta:
+        ordering = ['source', 'position']
+        indexes = [
+            models.Index(fields=['user', 'target_key'], name='notes_link_target_key_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source_id} -> {self.target_title}"
+
+class NoteChunk(models.Model):
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='chunks')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='note_chunks')
+    position = models.IntegerField()
+    heading = models.CharField(max_length=255, blank=True)  # Heading path of the section the chunk is in
+    start = models.IntegerField(default=0)  # Offsets of the chunk in the note content
+    end = models.IntegerField(default=0)
+    model = models.CharField(max_length=100)  # Embedding provider that computed the vector
+    text_hash = models.CharField(max_length=40)  # SHA-1 of the provider and embedded text
+    vector = models.BinaryField()  # Little-endian float32 values (see semantic.py)
+    embedded_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['note', 'position']
+        unique_together = ['note', 'position']
+        indexes = [
+            models.Index(fields=['user', 'model'], name='notes_chunk_user_model_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.note_id} #{self.position}"
@@ -0,0 +1,85 @@
+"""
+Markdown rendering of notes with a stored render cache.
+
+``Note.content_html`` holds the rendered HTML and ``Note.content_html_key``
+a hash of the content and renderer version it was rendered from, so a note
+is converted once per content change instead of on every open. Notes are
+rendered when they are saved; notes longer than ``BACKGROUND_RENDER_CHARS``
+(where Pygments highlighting of many code blocks takes a while) are
+rendered by the background pool after commit instead. A note whose stored
+HTML is stale (not rendered yet, or rendered by an older renderer version)
+is rendered on open and the result is stored.
+
+Creating a ``markdown.Markdown`` instance loads every extension, so idle
+instances are kept in a pool and ``reset()`` before each conversion.
+"""
+
+import hashlib
+import queue
+
+import markdown
+
+from overhead import background
+
+from .models import Note
+
+RENDERER_VERSION = '1'  # Bump when extensions or their configuration change
+EXTENSIONS = ['extra', 'codehilite', 'fenced_code', 'tables']
+BACKGROUND_RENDER_CHARS = 20000
+
+_pool = queue.SimpleQueue()
+
+
+def render(content):
+    """Convert Markdown to HTML with a pooled converter"""
+    try:
+        md = _pool.get_nowait()
+    except queue.Empty:
+        md = markdown.Markdown(extensions=EXTENSIONS)
+    try:
+        return md.reset().convert(content)
+    finally:
+        _pool.put(md)
+
+
+def render_key(content):
+    return hashlib.sha256(f"{RENDERER_VERSION}\0{content}".encode()).hexdigest()
+
+
+def prepare(note):
+    """Refresh the stored HTML of a note about to be saved; returns True if it must be rendered later"""
+    key = render_key(note.content)
+    if note.content_html_key == key:
+        return False
+    if len(note.content) > BACKGROUND_RENDER_CHARS:
+        note.content_html_key = ''  # Stale until the background job has run
+        return True
+    note.content_html = render(note.content)
+    note.content_html_key = key
+    return False
+
+
+def render_note(note_id):
+    """Background job: render a note and store the HTML unless the note changed meanwhile"""
+    stored = Note.objects.filter(pk=note_id).values_list('content', 'updated_at').first()
+    if stored is None:
+        return
+    content, updated_at = stored
+    Note.objects.filter(pk=note_id, updated_at=updated_at).update(
+        content_html=render(content),
+        content_html_key=render_key(content),
+    )
+
+
+def schedule(note_id):
+    background.submit_on_commit(render_note, note_id)
+
+
+def note_html(note):
+    """HTML of a note, rendering and storing it when the stored copy is stale"""
+    key = render_key(note.content)
+    if note.content_html_key == key:
+        return note.content_html
+    html = render(note.content)
+    Note.objects.filter(pk=note.pk, updated_at=note.updated_at).update(content_html=html, content_html_key=key)
+    return html
@@ -0,0 +1,172 @@
+"""
+Full-text search over notes.
+
+On SQLite the FTS5 table ``notes_app_note_fts`` indexes the title, content
+and tag names of every note (its rowid is the note id). Signals keep it in
+sync when notes are saved or deleted and when tags are renamed, deleted or
+added to and removed from notes; bulk writes that bypass signals must call
+``index_notes`` themselves. Results are ranked with BM25, weighting title
+and tag hits above body hits, and ``snippet()`` picks the best matching
+fragment anywhere in the note.
+
+Other databases fall back to substring matching, ranked by title hits,
+with the snippet cut around the first hit in the body.
+"""
+
+import html
+import re
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Note
+
+TABLE = 'notes_app_note_fts'
+WORD = re.compile(r'\w+', re.UNICODE)
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+SNIPPET_WORDS = 24
+# Column weights for bm25(): title, content, tags
+WEIGHTS = (10.0, 1.0, 5.0)
+# Highlight markers that cannot occur in notes, replaced after escaping
+MARK_START, MARK_END = '\x02', '\x03'
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+    f"USING fts5(title, content, tags, tokenize='unicode61 remove_diacritics 2')"
+)
+# Index rows (id, title, content, tag names) of notes
+SELECT_ROWS_SQL = (
+    "SELECT n.id, n.title, n.content, COALESCE(("
+    "SELECT group_concat(t.name, ' ') FROM notes_app_note_tags nt "
+    "JOIN notes_app_tag t ON t.id = nt.tag_id WHERE nt.note_id = n.id), '') "
+    "FROM notes_app_note n"
+)
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(text):
+    """FTS5 query for free text: every word must occur, the last one as a prefix"""
+    words = WORD.findall(text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def rebuild():
+    """Recreate the index from all notes"""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_SQL)
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(f"INSERT INTO {TABLE} (rowid, title, content, tags) {SELECT_ROWS_SQL}")
+
+
+def index_notes(note_ids):
+    """Refresh the index rows of the given notes (deleted notes are dropped)"""
+    note_ids = list(note_ids)
+    if not note_ids or not is_supported():
+        return
+    placeholders = ', '.join(['%s'] * len(note_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", note_ids)
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, title, content, tags) {SELECT_ROWS_SQL} WHERE n.id IN ({placeholders})",
+            note_ids,
+        )
+
+
+def remove_notes(note_ids):
+    note_ids = list(note_ids)
+    if not note_ids or not is_supported():
+        return
+    placeholders = ', '.join(['%s'] * len(note_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", note_ids)
+
+
+def filter_notes(queryset, text):
+    """Restrict a note queryset to notes matching ``text`` (unranked)"""
+    if not is_supported():
+        return queryset.filter(_fallback_filter(text)).distinct()
+    expression = match_expression(text)
+    if expression is None:
+        return queryset
+    return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [expression]))
+
+
+def highlight(fragment):
+    """Escape a snippet and turn the match markers into <mark> tags"""
+    return html.escape(fragment).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def search(user, text, page=1, page_size=PAGE_SIZE):
+    """Ranked page of matching notes; returns ``(results, total)`` with ``(note, snippet html)`` results"""
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    offset = (max(page, 1) - 1) * page_size
+    if not is_supported():
+        return _fallback_search(user, text, offset, page_size)
+    expression = match_expression(text)
+    if expression is None:
+        return [], 0
+
+    # CROSS JOIN keeps the index as the outer loop; driven from the notes
+    # table, SQLite would evaluate the MATCH once per note of the user
+    source = f"{TABLE} CROSS JOIN notes_app_note n ON n.id = {TABLE}.rowid"
+    where = f"{TABLE} MATCH %s AND n.user_id = %s AND n.is_archived = %s"
+    params = [expression, user.id, False]
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {source} WHERE {where}", params)
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT n.id, snippet({TABLE}, -1, %s, %s, %s, %s) FROM {source} "
+            f"WHERE {where} ORDER BY bm25({TABLE}, %s, %s, %s) LIMIT %s OFFSET %s",
+            [MARK_START, MARK_END, '…', SNIPPET_WORDS, *params, *WEIGHTS, page_size, offset],
+        )
+        rows = cursor.fetchall()
+
+    notes = Note.objects.filter(id__in=[note_id for note_id, _ in rows]).select_related('folder').defer(
+        'content', 'content_html'
+    ).in_bulk()
+    return [(notes[note_id], highlight(snippet)) for note_id, snippet in rows if note_id in notes], total
+
+
+def _fallback_filter(text):
+    words = WORD.findall(text or '')
+    condition = Q()
+    for word in words:
+        condition &= Q(title__icontains=word) | Q(content__icontains=word) | Q(tags__name__icontains=word)
+    return condition
+
+
+def _fallback_snippet(content, words):
+    lowered = content.lower()
+    positions = [lowered.find(word.lower()) for word in words]
+    positions = [position for position in positions if position >= 0]
+    start = max(0, min(positions) - 60) if positions else 0
+    fragment = content[start:start + 200]
+    for word in words:
+        fragment = re.sub(f"({re.escape(word)})", f"{MARK_START}\\1{MARK_END}", fragment, flags=re.IGNORECASE)
+    return highlight(('…' if start else '') + fragment + ('…' if start + 200 < len(content) else ''))
+
+
+def _fallback_search(user, text, offset, limit):
+    words = WORD.findall(text or '')
+    if not words:
+        return [], 0
+    notes = Note.objects.filter(user=user, is_archived=False).filter(_fallback_filter(text)).distinct()
+    total = notes.count()
+    title_hits = Q()
+    for word in words:
+        title_hits &= Q(title__icontains=word)
+    ranked = notes.annotate(
+        title_hit=Case(When(title_hits, then=Value(1)), default=Value(0), output_field=IntegerField())
+    ).select_related('folder').order_by('-title_hit', '-updated_at')[offset:offset + limit]
+    return [(note, _fallback_snippet(note.content, words)) for note in ranked], total
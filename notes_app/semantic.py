@@ -0,0 +1,523 @@
+"""
+Semantic search over notes.
+
+Notes are split into chunks per heading section (long sections into
+overlapping windows of ``CHUNK_WORDS`` words). Each chunk is embedded,
+together with the note title and its heading path, by the provider named in
+``NOTES_EMBEDDING_PROVIDER``. That is a class with a ``name``, its
+``dimensions`` and ``embed(texts)`` returning unit-length vectors. The
+default ``HashingEmbedder`` is a local stand-in that needs no model
+download. Vectors are stored as float32 in ``NoteChunk`` rows.
+
+Saving a note queues it for the background pool. Only chunks whose text
+changed are embedded again. An hourly scheduler job catches notes whose
+update was lost, e.g. in a restart, and embeds notes that predate the
+feature.
+
+Queries are answered from an in-memory ``VectorIndex`` per user (the last
+``MAX_CACHED_INDEXES`` users). It is loaded from the chunk table when a
+cheap count/max-id signature shows the table changed, and updated in place
+by the background job of the process that holds it. With NumPy, scores are
+one matrix product. Once a user has ``IVF_MIN_VECTORS`` chunks, the index is
+also clustered with k-means, and a query only scores the chunks of the
+``PROBE_SHARE`` of clusters nearest to it (approximate search). Without
+NumPy, the index falls back to an exact scan in pure Python.
+"""
+
+import array
+import hashlib
+import heapq
+import html
+import math
+import operator
+import re
+import sys
+import threading
+import zlib
+from collections import OrderedDict, defaultdict
+from itertools import repeat
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from overhead import background
+
+from . import links
+from .models import Note, NoteChunk
+
+try:
+    import numpy
+except ImportError:  # Optional: exact pure-Python scan instead
+    numpy = None
+
+DEFAULT_PROVIDER = 'notes_app.semantic.HashingEmbedder'
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 30
+EMBED_BATCH = 64  # Texts per provider call
+UPDATE_BATCH = 100  # Notes per background job
+PAGE_SIZE = 20
+MAX_RESULTS = 100
+MIN_SCORE = 0.05
+SNIPPET_CHARS = 200
+MAX_CACHED_INDEXES = 8
+IVF_MIN_VECTORS = 100000  # Below this an exact matrix product takes a few milliseconds
+IVF_SAMPLE_PER_LIST = 40
+IVF_ITERATIONS = 8
+PROBE_SHARE = 0.15  # Share of the clusters scored per query
+MIN_PROBES = 16
+
+HEADING = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t#]*$', re.M)
+WORD = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = frozenset(
+    'a about above after again all am an and any are as at be because been before being below between both but by '
+    'can could did do does doing down during each few for from further had has have having he her here hers him his '
+    'how i if in into is it its just me more most my no nor not now of off on once only or other our out over own '
+    'same she should so some such than that the their them then there these they this those through to too under '
+    'until up very was we were what when where which while who whom why will with would you your'.split()
+)
+
+
+class HashingEmbedder:
+    """Local stand-in provider: signed feature hashing of words, word pairs and character 4-grams
+
+    Needs no model or download and is deterministic across processes. Notes
+    match on shared words and word stems ("migrating" and "migration" share
+    most 4-grams), not on synonyms; configure a real embedding model as
+    ``NOTES_EMBEDDING_PROVIDER`` for that.
+    """
+
+    name = 'hashing-256-v1'
+    dimensions = 256
+
+    def embed(self, texts):
+        return [self.vector(text) for text in texts]
+
+    def features(self, text):
+        words = [word for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+        weights = defaultdict(float)
+        for i, word in enumerate(words):
+            weights[word] += 1.0
+            if i:
+                weights[f"{words[i - 1]} {word}"] += 0.5
+            marked = f"<{word}>"
+            for j in range(len(marked) - 3):
+                weights['#' + marked[j:j + 4]] += 0.25
+        return weights
+
+    def vector(self, text):
+        vector = [0.0] * self.dimensions
+        for feature, weight in self.features(text).items():
+            digest = zlib.crc32(feature.encode())
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dimensions] += sign * (1 + math.log(weight)) if weight >= 1 else sign * weight
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+
+_providers = {}
+
+
+def provider():
+    path = getattr(settings, 'NOTES_EMBEDDING_PROVIDER', DEFAULT_PROVIDER)
+    if path not in _providers:
+        _providers[path] = import_string(path)()
+    return _providers[path]
+
+
+def pack(vector):
+    values = array.array('f', vector)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack(data):
+    values = array.array('f')
+    values.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+# ==== Chunking ====
+
+def sections(content):
+    """``(heading path, start, end)`` of the heading sections of Markdown ``content``"""
+    code = [match.span() for match in links.CODE.finditer(content)]
+    headings = [
+        match for match in HEADING.finditer(content)
+        if not any(start <= match.start() < end for start, end in code)
+    ]
+    found = []
+    if not headings or headings[0].start() > 0:
+        found.append(('', 0, headings[0].start() if headings else len(content)))
+    path = []
+    for i, match in enumerate(headings):
+        level = len(match.group(1))
+        path = [entry for entry in path if entry[0] < level] + [(level, match.group(2).strip())]
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(content)
+        found.append((' › '.join(name for _, name in path)[:255], match.start(), end))
+    return found
+
+
+def chunks(content):
+    """``(heading path, start, end)`` chunks of a note: sections, long ones in overlapping word windows"""
+    found = []
+    for heading, start, end in sections(content):
+        words = [match.span() for match in re.finditer(r'\S+', content[start:end])]
+        if not words:
+            continue
+        step = CHUNK_WORDS - CHUNK_OVERLAP
+        for first in range(0, max(len(words) - CHUNK_OVERLAP, 1), step):
+            window = words[first:first + CHUNK_WORDS]
+            found.append((heading, start + window[0][0], start + window[-1][1]))
+    # Every note gets a chunk, so notes without text are not taken for unembedded ones
+    return found or [('', 0, len(content))]
+
+
+def chunk_text(title, heading, text):
+    return '\n'.join(part for part in (title, heading, text) if part)
+
+
+def text_hash(provider_name, text):
+    return hashlib.sha1(f"{provider_name}\0{text}".encode()).hexdigest()
+
+
+# ==== Index ====
+
+class VectorIndex:
+    """In-memory chunk vectors of one user for nearest-neighbour lookup by cosine similarity"""
+
+    def __init__(self, dimensions, rows):
+        """``rows`` are ``(chunk id, note id, packed vector)``"""
+        self.dimensions = dimensions
+        self.signature = None
+        rows = [row for row in rows if len(row[2]) == 4 * dimensions]
+        self.chunk_ids = [row[0] for row in rows]
+        self.note_ids = [row[1] for row in rows]
+        self.centroids = self.assignment = self.lists = None
+        if numpy is not None:
+            self.chunk_ids = numpy.array(self.chunk_ids, dtype=numpy.int64)
+            self.note_ids = numpy.array(self.note_ids, dtype=numpy.int64)
+            data = b''.join(bytes(row[2]) for row in rows)
+            self.matrix = numpy.frombuffer(data, dtype='<f4').reshape(len(rows), dimensions)
+            if len(rows) >= IVF_MIN_VECTORS:
+                self.train()
+        else:
+            self.values = unpack(b''.join(bytes(row[2]) for row in rows))  # Row-major, one vector after another
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def train(self):
+        """Cluster the vectors with spherical k-means for approximate search"""
+        rng = numpy.random.default_rng(0)
+        lists = int(math.sqrt(len(self)))
+        sample = self.matrix[rng.choice(len(self), min(len(self), lists * IVF_SAMPLE_PER_LIST), replace=False)]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(IVF_ITERATIONS):
+            assignment = (sample @ centroids.T).argmax(axis=1)
+            sums = numpy.zeros_like(centroids)
+            numpy.add.at(sums, assignment, sample)
+            norms = numpy.linalg.norm(sums, axis=1)
+            filled = norms > 0  # Empty clusters keep their centroid
+            centroids[filled] = sums[filled] / norms[filled, None]
+        self.centroids = centroids
+        self.assignment = self.assign(self.matrix)
+        self.group()
+
+    def group(self):
+        """Row numbers of each cluster, as slices of one array"""
+        order = numpy.argsort(self.assignment, kind='stable')
+        bounds = numpy.searchsorted(self.assignment[order], numpy.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def assign(self, vectors):
+        # In blocks, so the score matrix stays small for large indexes
+        return numpy.concatenate([
+            (vectors[offset:offset + 65536] @ self.centroids.T).argmax(axis=1)
+            for offset in range(0, len(vectors), 65536)
+        ]) if len(vectors) else numpy.zeros(0, dtype=numpy.int64)
+
+    def search(self, query, k):
+        """``(score, chunk id, note id)`` of the ``k`` most similar chunks, best first"""
+        if not len(self):
+            return []
+        if numpy is None:
+            scores = self.scan(query)
+            best = heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+            return [(scores[i], self.chunk_ids[i], self.note_ids[i]) for i in best]
+
+        query = numpy.asarray(query, dtype=numpy.float32)
+        if self.centroids is not None:
+            probes = max(MIN_PROBES, int(len(self.centroids) * PROBE_SHARE))
+            probed = numpy.argsort(-(self.centroids @ query))[:probes]
+            rows = numpy.concatenate([self.lists[i] for i in probed])
+            scores = self.matrix[rows] @ query
+        else:
+            rows = numpy.arange(len(self))
+            scores = self.matrix @ query
+        k = min(k, len(scores))
+        if not k:
+            return []
+        best = numpy.argpartition(-scores, k - 1)[:k]
+        best = best[numpy.argsort(-scores[best])]
+        return [
+            (float(scores[i]), int(self.chunk_ids[rows[i]]), int(self.note_ids[rows[i]]))
+            for i in best
+        ]
+
+    def scan(self, query):
+        """Exact scores of all vectors without NumPy"""
+        dimensions = self.dimensions
+        used = [(dimension, value) for dimension, value in enumerate(query) if value]
+        if len(used) * 4 > dimensions:
+            return [
+                sum(map(operator.mul, query, self.values[i * dimensions:(i + 1) * dimensions]))
+                for i in range(len(self))
+            ]
+        # Sparse query (short text with the hashing provider): add up the used columns
+        scores = [0.0] * len(self)
+        for dimension, value in used:
+            scores = list(map(operator.add, scores, map(operator.mul, self.values[dimension::dimensions], repeat(value))))
+        return scores
+
+    def replaced(self, note_ids, rows):
+        """A copy with the chunks of ``note_ids`` replaced by ``rows``, keeping the trained clusters"""
+        rows = [row for row in rows if len(row[2]) == 4 * self.dimensions]
+        index = VectorIndex(self.dimensions, [])
+        if numpy is None:
+            note_ids = set(note_ids)
+            keep = [i for i, note_id in enumerate(self.note_ids) if note_id not in note_ids]
+            index.chunk_ids = [self.chunk_ids[i] for i in keep] + [row[0] for row in rows]
+            index.note_ids = [self.note_ids[i] for i in keep] + [row[1] for row in rows]
+            index.values = array.array('f')
+            for i in keep:
+                index.values += self.values[i * self.dimensions:(i + 1) * self.dimensions]
+            index.values += unpack(b''.join(bytes(row[2]) for row in rows))
+            return index
+
+        keep = ~numpy.isin(self.note_ids, list(note_ids))
+        added = numpy.frombuffer(b''.join(bytes(row[2]) for row in rows), dtype='<f4').reshape(len(rows), self.dimensions)
+        index.chunk_ids = numpy.concatenate([self.chunk_ids[keep], numpy.array([row[0] for row in rows], dtype=numpy.int64)])
+        index.note_ids = numpy.concatenate([self.note_ids[keep], numpy.array([row[1] for row in rows], dtype=numpy.int64)])
+        index.matrix = numpy.concatenate([self.matrix[keep], added])
+        if self.centroids is not None and len(index) < 2 * len(self.centroids) ** 2:
+            index.centroids = self.centroids
+            index.assignment = numpy.concatenate([self.assignment[keep], index.assign(added)])
+            index.group()
+        elif len(index) >= IVF_MIN_VECTORS:
+            index.train()  # First clustering, or the index doubled since the last one
+        return index
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def signature(user_id, provider_name):
+    """Changes whenever chunks of the user are added, replaced or deleted"""
+    stats = NoteChunk.objects.filter(user_id=user_id, model=provider_name).aggregate(count=Count('id'), last=Max('id'))
+    return stats['count'], stats['last']
+
+
+def get_index(user_id):
+    """The user's index, loaded again if the chunk table changed since"""
+    embedder = provider()
+    current = signature(user_id, embedder.name)
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is not None and index.signature == current and index.dimensions == embedder.dimensions:
+            _indexes.move_to_end(user_id)
+            return index
+    rows = NoteChunk.objects.filter(user_id=user_id, model=embedder.name).values_list('id', 'note_id', 'vector')
+    index = VectorIndex(embedder.dimensions, rows.iterator(chunk_size=2000))
+    index.signature = current
+    with _indexes_lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _refresh_index(user_id, note_ids, rows, provider_name):
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+    if index is None:
+        return
+    index = index.replaced(note_ids, rows)
+    index.signature = signature(user_id, provider_name)
+    with _indexes_lock:
+        if user_id in _indexes:
+            _indexes[user_id] = index
+
+
+# ==== Updates ====
+
+def update_notes(note_ids):
+    """Embed the changed chunks of notes and replace their stored chunks; returns the number embedded"""
+    embedder = provider()
+    notes = list(Note.objects.filter(pk__in=list(note_ids)).values('id', 'user_id', 'title', 'content'))
+    stored = defaultdict(list)
+    for chunk in NoteChunk.objects.filter(note_id__in=[note['id'] for note in notes]).order_by('position').values(
+        'note_id', 'model', 'text_hash', 'vector',
+    ):
+        stored[chunk['note_id']].append(chunk)
+
+    planned, unchanged, pending = [], [], {}
+    for note in notes:
+        plan = []
+        for heading, start, end in chunks(note['content']):
+            text = chunk_text(note['title'], heading, note['content'][start:end])
+            plan.append((heading, start, end, text, text_hash(embedder.name, text)))
+        existing = stored.get(note['id'], [])
+        if [(chunk['model'], chunk['text_hash']) for chunk in existing] == [(embedder.name, item[4]) for item in plan]:
+            unchanged.append(note['id'])
+            continue
+        vectors = {chunk['text_hash']: bytes(chunk['vector']) for chunk in existing if chunk['model'] == embedder.name}
+        for *_, text, digest in plan:
+            if digest not in vectors:
+                pending[digest] = text
+        planned.append((note, plan, vectors))
+
+    texts = list(pending.items())
+    embedded = {}
+    for offset in range(0, len(texts), EMBED_BATCH):
+        batch = texts[offset:offset + EMBED_BATCH]
+        for (digest, _), vector in zip(batch, embedder.embed([text for _, text in batch])):
+            embedded[digest] = pack(vector)
+
+    now = timezone.now()
+    rows = [
+        NoteChunk(
+            note_id=note['id'],
+            user_id=note['user_id'],
+            position=position,
+            heading=heading,
+            start=start,
+            end=end,
+            model=embedder.name,
+            text_hash=digest,
+            vector=vectors.get(digest) or embedded[digest],
+            embedded_at=now,
+        )
+        for note, plan, vectors in planned for position, (heading, start, end, _, digest) in enumerate(plan)
+    ]
+    with transaction.atomic():
+        # Notes deleted while they were being embedded get no chunks
+        alive = set(Note.objects.select_for_update().filter(
+            pk__in=[note['id'] for note, _, _ in planned],
+        ).values_list('id', flat=True))
+        planned = [item for item in planned if item[0]['id'] in alive]
+        rows = [row for row in rows if row.note_id in alive]
+        NoteChunk.objects.filter(note_id__in=[note['id'] for note, _, _ in planned]).delete()
+        NoteChunk.objects.bulk_create(rows, batch_size=500)
+        NoteChunk.objects.filter(note_id__in=unchanged).update(embedded_at=now)
+
+    by_user = defaultdict(list)
+    for row in rows:
+        by_user[row.user_id].append((row.pk, row.note_id, row.vector))
+    for note, _, _ in planned:
+        by_user.setdefault(note['user_id'], [])
+    for user_id, user_rows in by_user.items():
+        changed = [note['id'] for note, _, _ in planned if note['user_id'] == user_id]
+        transaction.on_commit(lambda user_id=user_id, changed=changed, user_rows=user_rows: _refresh_index(
+            user_id, changed, user_rows, embedder.name,
+        ))
+    return len(embedded)
+
+
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def _update_scheduled(note_id):
+    with _scheduled_lock:
+        _scheduled.discard(note_id)
+    update_notes([note_id])
+
+
+def schedule(note_id):
+    """Embed a saved note in the background once the transaction commits (once per burst of saves)"""
+    def submit():
+        with _scheduled_lock:
+            if note_id in _scheduled:
+                return
+            _scheduled.add(note_id)
+        background.submit(_update_scheduled, note_id)
+
+    transaction.on_commit(submit)
+
+
+def schedule_many(note_ids):
+    note_ids = list(note_ids)
+    for offset in range(0, len(note_ids), UPDATE_BATCH):
+        background.submit_on_commit(update_notes, note_ids[offset:offset + UPDATE_BATCH])
+
+
+def stale_note_ids():
+    """Notes without chunks of the current provider, or changed after they were embedded"""
+    name = provider().name
+    return Note.objects.annotate(
+        embedded=Max('chunks__embedded_at', filter=Q(chunks__model=name)),
+    ).filter(Q(embedded__isnull=True) | Q(updated_at__gt=F('embedded'))).values_list('id', flat=True)
+
+
+def embed_stale():
+    """Scheduler job: queue the notes whose embeddings are missing or out of date"""
+    note_ids = list(stale_note_ids())
+    schedule_many(note_ids)
+    return len(note_ids)
+
+
+# ==== Search ====
+
+def search(user, text, page=1, page_size=PAGE_SIZE):
+    """Page of the notes with chunks most similar to ``text``; returns ``(results, total)``
+
+    Results are ``(note, snippet html, score)`` for the best chunk of each
+    note, at most ``MAX_RESULTS`` notes in total.
+    """
+    page_size = max(1, min(page_size, MAX_RESULTS))
+    offset = (max(page, 1) - 1) * page_size
+    if not WORD.search(text or ''):
+        return [], 0
+    query = provider().embed([text])[0]
+    if not any(query):
+        return [], 0
+
+    best = {}
+    for score, chunk_id, note_id in get_index(user.id).search(query, 3 * MAX_RESULTS):
+        if score < MIN_SCORE:
+            break
+        best.setdefault(note_id, (score, chunk_id))
+    active = set(Note.objects.filter(id__in=list(best), user=user, is_archived=False).values_list('id', flat=True))
+    ranked = [(note_id, score, chunk_id) for note_id, (score, chunk_id) in best.items() if note_id in active]
+    ranked = ranked[:MAX_RESULTS]
+    shown = ranked[offset:offset + page_size]
+
+    notes = Note.objects.filter(id__in=[note_id for note_id, _, _ in shown]).select_related('folder').defer(
+        'content_html'
+    ).in_bulk()
+    spans = NoteChunk.objects.filter(id__in=[chunk_id for _, _, chunk_id in shown]).only(
+        'heading', 'start', 'end',
+    ).in_bulk()
+    results = []
+    for note_id, score, chunk_id in shown:
+        note, span = notes.get(note_id), spans.get(chunk_id)
+        if note is None:
+            continue
+        fragment = note.preview
+        if span:
+            text = note.content[span.start:span.end]
+            heading = HEADING.match(text)  # A section's first chunk starts at its heading line, shown separately
+            fragment = ' '.join(text[heading.end() if heading else 0:].split()) or fragment
+        snippet = html.escape(fragment[:SNIPPET_CHARS] + ('…' if len(fragment) > SNIPPET_CHARS else ''))
+        if span and span.heading:
+            snippet = f"<strong>{html.escape(span.heading)}</strong> {snippet}"
+        results.append((note, snippet, round(score, 4)))
+    return results, len(ranked)
@@ -0,0 +1,95 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import folders, links, rendering, search, semantic
+from .models import Folder, Note, Tag
+
+
+@receiver(pre_save, sender=Note)
+def prepare_content(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'content' not in update_fields):
+        return
+    instance.preview = Note.build_preview(instance.content)
+    instance.update_word_count()
+    instance._render_later = rendering.prepare(instance)
+
+
+@receiver(post_save, sender=Note)
+def render_large_content(sender, instance, raw=False, **kwargs):
+    if getattr(instance, '_render_later', False):
+        instance._render_later = False
+        rendering.schedule(instance.pk)
+
+
+@receiver(post_save, sender=Note)
+def index_note(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'title', 'content'} & set(update_fields)):
+        return
+    search.index_notes([instance.pk])
+
+
+@receiver(post_save, sender=Note)
+def update_links(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'title', 'content'} & set(update_fields)):
+        return
+    links.update_note(instance)
+
+
+@receiver(post_save, sender=Note)
+def embed_note(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'title', 'content'} & set(update_fields)):
+        return
+    semantic.schedule(instance.pk)
+
+
+@receiver(post_delete, sender=Note)
+def unindex_note(sender, instance, **kwargs):
+    search.remove_notes([instance.pk])
+
+
+@receiver(pre_delete, sender=Note)
+def remember_link_keys(sender, instance, **kwargs):
+    instance._incoming_link_keys = set(instance.incoming_links.values_list('target_key', flat=True))
+
+
+@receiver(post_delete, sender=Note)
+def retarget_incoming_links(sender, instance, **kwargs):
+    """Links to the deleted note move to another note with its title, if there is one"""
+    if getattr(instance, '_incoming_link_keys', None):
+        links.resolve_pending(instance.user_id, instance._incoming_link_keys)
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def index_tagged_notes(sender, instance, action, reverse, pk_set, **kwargs):
+    """Tag names are indexed with the notes they are attached to"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.index_notes([instance.pk])
+    elif action == 'pre_clear':
+        instance._indexed_note_ids = list(instance.notes.values_list('id', flat=True))
+    elif action == 'post_clear':
+        search.index_notes(getattr(instance, '_indexed_note_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        search.index_notes(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def index_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_notes(instance.notes.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_notes(sender, instance, **kwargs):
+    instance._indexed_note_ids = list(instance.notes.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def index_untagged_notes(sender, instance, **kwargs):
+    search.index_notes(getattr(instance, '_indexed_note_ids', []))
+
+
+@receiver(post_save, sender=Folder)
+@receiver(post_delete, sender=Folder)
+def invalidate_folder_tree(sender, instance, **kwargs):
+    folders.invalidate(instance.user_id)
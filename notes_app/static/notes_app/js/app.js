@@ -2,10 +2,13 @@
 let currentNote = null;
 let currentFolder = null;
 let notes = [];
+let notesCursor = null;
+let loadingMoreNotes = false;
 let folders = [];
 let tags = [];
 let autosaveTimer = null;
 let isPreviewMode = false;
+let semanticSearch = false;
 
 // Get CSRF token
 function getCookie(name) {
@@ -57,6 +60,7 @@ document.addEventListener('DOMContentLoaded', function() {
     loadFolders();
     loadNotes();
     loadTags();
+    document.getElementById('notesList').addEventListener('scroll', loadMoreNotes);
     initializeEventListeners();
     initializeEditor();
 });
@@ -121,16 +125,25 @@ function selectFolder(folderId) {
     loadNotes();
 }
 
-// Load notes
-async function loadNotes() {
+// Load notes (append: fetch the next page)
+async function loadNotes(append = false) {
     let url = '/notes/api/notes/';
     const params = new URLSearchParams();
     
+    if (append) {
+        if (!notesCursor) return;
+        params.append('cursor', notesCursor);
+    }
+    
     if (currentFolder) {
         params.append('folder', currentFolder);
     }
     
     const searchInput = document.getElementById('searchInput').value;
+    if (searchInput && semanticSearch) {
+        if (!append) await loadSemanticResults(searchInput);
+        return;
+    }
     if (searchInput) {
         params.append('search', searchInput);
     }
@@ -141,11 +154,44 @@ async function loadNotes() {
     
     const data = await apiCall(url);
     if (data) {
-        notes = data.notes;
+        notes = append ? notes.concat(data.notes) : data.notes;
+        notesCursor = data.next_cursor;
+        renderNotes();
+    }
+}
+
+// Notes closest in meaning to the query, best match first (one page, no cursor)
+async function loadSemanticResults(query) {
+    const params = new URLSearchParams({q: query, mode: 'semantic', page_size: 100});
+    const data = await apiCall('/notes/api/search/?' + params.toString());
+    if (data) {
+        notes = data.results.map(result => ({...result, folder_name: result.folder}));
+        notesCursor = null;
         renderNotes();
     }
 }
 
+function toggleSemanticSearch() {
+    semanticSearch = !semanticSearch;
+    document.getElementById('toggleSemanticSearch').classList.toggle('active', semanticSearch);
+    document.getElementById('searchInput').placeholder = semanticSearch ? 'Search notes by meaning...' : 'Search notes...';
+    if (document.getElementById('searchInput').value) loadNotes();
+}
+
+// Load the next page when the list is scrolled to the bottom
+async function loadMoreNotes() {
+    const notesList = document.getElementById('notesList');
+    if (loadingMoreNotes || !notesCursor) return;
+    if (notesList.scrollTop + notesList.clientHeight < notesList.scrollHeight - 200) return;
+    
+    loadingMoreNotes = true;
+    try {
+        await loadNotes(true);
+    } finally {
+        loadingMoreNotes = false;
+    }
+}
+
 // Render notes
 function renderNotes() {
     const notesList = document.getElementById('notesList');
@@ -166,7 +212,7 @@ function renderNotes() {
                     ${note.title}
                 </div>
             </div>
-            <div class="note-preview">${note.content}</div>
+            <div class="note-preview">${note.preview}</div>
             <div class="note-meta">
                 <span>${note.folder_name || 'Unfiled'}</span>
                 <span>${formatDate(note.updated_at)}</span>
@@ -184,9 +230,38 @@ async function loadNote(noteId) {
         currentNote = data;
         displayNote();
         renderNotes(); // Update active state
+        startCollab(data.id);
+        loadBacklinks(data.id);
     }
 }
 
+// Linked references: notes whose [[wiki links]] point at this note
+async function loadBacklinks(noteId) {
+    const panel = document.getElementById('linkedReferences');
+    const data = await apiCall(`/notes/api/notes/${noteId}/backlinks/`);
+    if (!data || !currentNote || currentNote.id !== noteId) return;
+    
+    if (data.backlinks.length === 0) {
+        panel.classList.add('hidden');
+        panel.innerHTML = '';
+        return;
+    }
+    const count = data.backlinks.reduce((total, source) => total + source.references.length, 0);
+    panel.innerHTML = `
+        <div class="linked-references-header">${count} linked reference${count === 1 ? '' : 's'}</div>
+        ${data.backlinks.map(source => `
+            <div class="linked-reference" data-note-id="${source.id}">
+                <div class="linked-reference-title">${escapeHtml(source.title)}</div>
+                ${source.references.map(ref => `<div class="linked-reference-context">${escapeHtml(ref.context)}</div>`).join('')}
+            </div>
+        `).join('')}
+    `;
+    panel.querySelectorAll('.linked-reference').forEach(item => {
+        item.onclick = () => loadNote(parseInt(item.dataset.noteId));
+    });
+    panel.classList.remove('hidden');
+}
+
 // Display note in editor
 function displayNote() {
     if (!currentNote) return;
@@ -234,11 +309,17 @@ async function saveNote() {
     const title = document.getElementById('noteTitle').value;
     const content = document.getElementById('editor').value;
     
-    const data = await apiCall(`/notes/api/notes/${currentNote.id}/update/`, 'PUT', {
+    const changes = {
         title: title,
-        content: content,
         is_favorite: currentNote.is_favorite
-    });
+    };
+    if (collabActive()) {
+        // The collaboration session saves the content
+        sendCollabChanges();
+    } else {
+        changes.content = content;
+    }
+    const data = await apiCall(`/notes/api/notes/${currentNote.id}/update/`, 'PUT', changes);
     
     if (data) {
         showSaveStatus('saved');
@@ -259,9 +340,11 @@ async function deleteNote() {
     const data = await apiCall(`/notes/api/notes/${currentNote.id}/delete/`, 'DELETE');
     
     if (data) {
+        stopCollab();
         currentNote = null;
         document.getElementById('noteTitle').value = '';
         document.getElementById('editor').value = '';
+        document.getElementById('linkedReferences').classList.add('hidden');
         await loadNotes();
     }
 }
@@ -320,7 +403,8 @@ function initializeEventListeners() {
     document.getElementById('toggleView').addEventListener('click', toggleViewMode);
     
     // Search
-    document.getElementById('searchInput').addEventListener('input', debounce(loadNotes, 300));
+    document.getElementById('searchInput').addEventListener('input', debounce(() => loadNotes(), 300));
+    document.getElementById('toggleSemanticSearch').addEventListener('click', toggleSemanticSearch);
     
     // Editor actions
     document.getElementById('saveBtn').addEventListener('click', saveNote);
@@ -340,6 +424,7 @@ function initializeEventListeners() {
     // Auto-save
     document.getElementById('editor').addEventListener('input', () => {
         showSaveStatus('typing');
+        queueCollabChanges();
         clearTimeout(autosaveTimer);
         autosaveTimer = setTimeout(() => {
             if (currentNote) {
@@ -348,6 +433,10 @@ function initializeEventListeners() {
         }, 2000);
     });
     
+    ['select', 'keyup', 'click'].forEach(type => {
+        document.getElementById('editor').addEventListener(type, queueCursorUpdate);
+    });
+    
     document.getElementById('noteTitle').addEventListener('input', () => {
         clearTimeout(autosaveTimer);
         autosaveTimer = setTimeout(() => {
@@ -424,6 +513,7 @@ function applyFormatting(action) {
     editor.value = editor.value.substring(0, start) + replacement + editor.value.substring(end);
     editor.focus();
     editor.setSelectionRange(start, start + replacement.length);
+    editor.dispatchEvent(new Event('input'));
 }
 
 // Toggle preview
@@ -594,6 +684,304 @@ document.querySelectorAll('.color-option').forEach(btn => {
     });
 });
 
+// Collaborative editing
+// Edits are sent to the note's session as operations in the ot.js format
+// (retain n > 0, delete n < 0, insert string; lengths in UTF-16 units).
+// At most one operation is in flight; our own operation coming back on the
+// event stream acknowledges it. Remote operations are transformed against
+// the one in flight and the unsent local changes before being applied.
+let collab = null;
+
+const OT = {
+    push(ops, component) {
+        if (component === 0 || component === '') return;
+        const last = ops[ops.length - 1];
+        if (typeof component === 'string') {
+            if (typeof last === 'string') {
+                ops[ops.length - 1] = last + component;
+            } else if (last < 0) {
+                // Inserts go before an adjacent delete
+                if (typeof ops[ops.length - 2] === 'string') {
+                    ops[ops.length - 2] += component;
+                } else {
+                    ops.splice(ops.length - 1, 0, component);
+                }
+            } else {
+                ops.push(component);
+            }
+        } else if (typeof last === 'number' && (last > 0) === (component > 0)) {
+            ops[ops.length - 1] = last + component;
+        } else {
+            ops.push(component);
+        }
+    },
+    
+    apply(text, op) {
+        let position = 0;
+        const parts = [];
+        for (const component of op) {
+            if (typeof component === 'string') {
+                parts.push(component);
+            } else if (component > 0) {
+                parts.push(text.slice(position, position + component));
+                position += component;
+            } else {
+                position -= component;
+            }
+        }
+        return parts.join('');
+    },
+    
+    transform(a, b) {
+        const aPrime = [];
+        const bPrime = [];
+        let i = 0;
+        let j = 0;
+        let opA = a[i];
+        let opB = b[j];
+        while (opA !== undefined || opB !== undefined) {
+            if (typeof opA === 'string') {
+                OT.push(aPrime, opA);
+                OT.push(bPrime, opA.length);
+                opA = a[++i];
+                continue;
+            }
+            if (typeof opB === 'string') {
+                OT.push(aPrime, opB.length);
+                OT.push(bPrime, opB);
+                opB = b[++j];
+                continue;
+            }
+            let length;
+            if (opA > 0 && opB > 0) {
+                length = Math.min(opA, opB);
+                OT.push(aPrime, length);
+                OT.push(bPrime, length);
+            } else if (opA < 0 && opB < 0) {
+                length = Math.min(-opA, -opB);
+            } else if (opA < 0) {
+                length = Math.min(-opA, opB);
+                OT.push(aPrime, -length);
+            } else {
+                length = Math.min(opA, -opB);
+                OT.push(bPrime, -length);
+            }
+            opA = opA > 0 ? opA - length : opA + length;
+            opB = opB > 0 ? opB - length : opB + length;
+            if (opA === 0) opA = a[++i];
+            if (opB === 0) opB = b[++j];
+        }
+        return [aPrime, bPrime];
+    },
+    
+    // Operation turning oldText into newText (one replaced range)
+    diff(oldText, newText) {
+        let prefix = 0;
+        const limit = Math.min(oldText.length, newText.length);
+        while (prefix < limit && oldText[prefix] === newText[prefix]) prefix++;
+        let suffix = 0;
+        while (suffix < limit - prefix &&
+               oldText[oldText.length - 1 - suffix] === newText[newText.length - 1 - suffix]) suffix++;
+        const op = [];
+        OT.push(op, prefix);
+        OT.push(op, newText.slice(prefix, newText.length - suffix));
+        OT.push(op, -(oldText.length - prefix - suffix));
+        OT.push(op, suffix);
+        return op;
+    },
+    
+    transformIndex(index, op) {
+        let newIndex = index;
+        for (const component of op) {
+            if (typeof component === 'string') {
+                newIndex += component.length;
+            } else if (component > 0) {
+                index -= component;
+            } else {
+                newIndex -= Math.min(index, -component);
+                index += component;
+            }
+            if (index < 0) break;
+        }
+        return newIndex;
+    }
+};
+
+function startCollab(noteId) {
+    stopCollab();
+    if (!window.EventSource) return;
+    
+    collab = {
+        noteId: noteId,
+        clientId: null,
+        revision: 0,
+        synced: null, // Server content plus the operation in flight
+        inflight: null,
+        clients: {},
+        sendTimer: null,
+        cursorTimer: null,
+        events: new EventSource(`/notes/api/notes/${noteId}/collab/events/`)
+    };
+    const session = collab;
+    
+    session.events.addEventListener('collab.state', (event) => {
+        const state = JSON.parse(event.data);
+        const editor = document.getElementById('editor');
+        session.clientId = state.client_id;
+        session.revision = state.revision;
+        session.synced = state.content;
+        session.inflight = null;
+        session.clients = {};
+        state.clients.forEach(client => { session.clients[client.client_id] = client; });
+        if (editor.value !== state.content) {
+            editor.value = state.content;
+        }
+        updateWordCount();
+        renderPresence();
+    });
+    
+    session.events.addEventListener('collab.op', (event) => {
+        const message = JSON.parse(event.data);
+        if (session.synced === null || message.revision <= session.revision) return;
+        if (message.revision !== session.revision + 1) {
+            // Missed operations (e.g. a stalled stream dropped some): start over
+            startCollab(session.noteId);
+            return;
+        }
+        session.revision = message.revision;
+        
+        if (message.client_id === session.clientId) {
+            session.inflight = null;
+            sendCollabChanges();
+            return;
+        }
+        applyRemoteOp(session, message.op);
+    });
+    
+    session.events.addEventListener('collab.join', (event) => {
+        const client = JSON.parse(event.data);
+        session.clients[client.client_id] = client;
+        renderPresence();
+    });
+    
+    session.events.addEventListener('collab.presence', (event) => {
+        const client = JSON.parse(event.data);
+        session.clients[client.client_id] = client;
+        renderPresence();
+    });
+    
+    session.events.addEventListener('collab.leave', (event) => {
+        delete session.clients[JSON.parse(event.data).client_id];
+        renderPresence();
+    });
+}
+
+function stopCollab() {
+    if (!collab) return;
+    collab.events.close();
+    clearTimeout(collab.sendTimer);
+    clearTimeout(collab.cursorTimer);
+    collab = null;
+    renderPresence();
+}
+
+function collabActive() {
+    return collab !== null && collab.synced !== null;
+}
+
+function applyRemoteOp(session, op) {
+    const editor = document.getElementById('editor');
+    let remote = op;
+    if (session.inflight) {
+        [session.inflight, remote] = OT.transform(session.inflight, remote);
+    }
+    // Unsent local changes are transformed the same way
+    const local = OT.diff(session.synced, editor.value);
+    session.synced = OT.apply(session.synced, remote);
+    const [, remoteForEditor] = OT.transform(local, remote);
+    
+    const start = OT.transformIndex(editor.selectionStart, remoteForEditor);
+    const end = OT.transformIndex(editor.selectionEnd, remoteForEditor);
+    editor.value = OT.apply(editor.value, remoteForEditor);
+    if (document.activeElement === editor) {
+        editor.setSelectionRange(start, end);
+    }
+    updateWordCount();
+    if (isPreviewMode) {
+        updatePreview();
+    }
+}
+
+function queueCollabChanges() {
+    if (!collabActive()) return;
+    clearTimeout(collab.sendTimer);
+    collab.sendTimer = setTimeout(sendCollabChanges, 50);
+}
+
+async function sendCollabChanges() {
+    const session = collab;
+    if (!collabActive() || session.inflight) return;
+    
+    const editor = document.getElementById('editor');
+    if (editor.value === session.synced) {
+        showSaveStatus('saved');
+        return;
+    }
+    const op = OT.diff(session.synced, editor.value);
+    session.inflight = op;
+    session.synced = editor.value;
+    updateWordCount();
+    
+    const response = await fetch(`/notes/api/notes/${session.noteId}/collab/op/`, {
+        method: 'POST',
+        headers: {'X-CSRFToken': csrftoken, 'Content-Type': 'application/json'},
+        body: JSON.stringify({client_id: session.clientId, revision: session.revision, op: op})
+    }).catch(() => null);
+    if (collab !== session) return;
+    if (!response || !response.ok) {
+        showSaveStatus('error');
+        // Rejoin to get the server's content; changes that were not accepted are lost
+        startCollab(session.noteId);
+    }
+}
+
+function queueCursorUpdate() {
+    if (!collabActive()) return;
+    clearTimeout(collab.cursorTimer);
+    collab.cursorTimer = setTimeout(() => {
+        if (!collabActive()) return;
+        const editor = document.getElementById('editor');
+        fetch(`/notes/api/notes/${collab.noteId}/collab/cursor/`, {
+            method: 'POST',
+            headers: {'X-CSRFToken': csrftoken, 'Content-Type': 'application/json'},
+            body: JSON.stringify({client_id: collab.clientId, cursor: [editor.selectionStart, editor.selectionEnd]})
+        }).catch(() => null);
+    }, 200);
+}
+
+function renderPresence() {
+    const container = document.getElementById('collabPresence');
+    if (!container) return;
+    
+    const others = collab ? Object.values(collab.clients).filter(client => client.client_id !== collab.clientId) : [];
+    const content = collab && collab.synced !== null ? collab.synced : '';
+    container.innerHTML = others.map(client => {
+        const initials = client.name.split(/\s+/).map(part => part[0]).join('').slice(0, 2).toUpperCase();
+        const line = client.cursor ? content.slice(0, client.cursor[0]).split('\n').length : null;
+        const title = `${client.name}${client.can_edit ? '' : ' (viewing)'}${line ? ` - line ${line}` : ''}`;
+        return `<span class="collab-user" style="background: ${client.color}" title="${escapeHtml(title)}">${escapeHtml(initials)}</span>`;
+    }).join('');
+}
+
+function updateWordCount() {
+    const content = document.getElementById('editor').value;
+    if (currentNote) {
+        currentNote.content = content; // displayNote() must not bring back older content
+    }
+    const count = content.split(/\s+/).filter(word => word.length > 0).length;
+    document.getElementById('wordCount').textContent = `${count} words`;
+}
+
 // Export options
 document.querySelectorAll('.export-option').forEach(btn => {
     btn.addEventListener('click', () => {
@@ -614,6 +1002,12 @@ function debounce(func, wait) {
     };
 }
 
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML.replace(/"/g, '&quot;');
+}
+
 function formatDate(dateString) {
     const date = new Date(dateString);
     const now = new Date();
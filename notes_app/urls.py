@@ -15,10 +15,20 @@ urlpatterns = [
     path('api/notes/', views.get_notes, name='get_notes'),
     path('api/notes/<int:note_id>/', views.get_note, name='get_note'),
     path('api/notes/create/', views.create_note, name='create_note'),
+    path('api/notes/export/', views.export_notes, name='export_notes'),
+    path('api/notes/import/', views.import_notes, name='import_notes'),
     path('api/notes/<int:note_id>/update/', views.update_note, name='update_note'),
     path('api/notes/<int:note_id>/delete/', views.delete_note, name='delete_note'),
     path('api/notes/<int:note_id>/move/', views.move_note, name='move_note'),
     path('api/notes/<int:note_id>/export/', views.export_note, name='export_note'),
+    path('api/notes/<int:note_id>/backlinks/', views.get_note_backlinks, name='get_note_backlinks'),
+    path('api/notes/<int:note_id>/graph/', views.get_note_graph, name='get_note_graph'),
+    path('api/notes/<int:note_id>/collab/events/', views.note_collab_events, name='note_collab_events'),
+    path('api/notes/<int:note_id>/collab/op/', views.note_collab_op, name='note_collab_op'),
+    path('api/notes/<int:note_id>/collab/cursor/', views.note_collab_cursor, name='note_collab_cursor'),
+    path('api/notes/<int:note_id>/versions/', views.get_note_versions, name='get_note_versions'),
+    path('api/notes/<int:note_id>/versions/diff/', views.diff_note_versions, name='diff_note_versions'),
+    path('api/notes/<int:note_id>/versions/<int:version_number>/', views.get_note_version, name='get_note_version'),
     
     # Search & Tags
     path('api/search/', views.search_notes, name='search_notes'),
@@ -0,0 +1,485 @@
+"""
+Export and import of notes as Markdown vault archives.
+
+``export_archive`` streams a ZIP of all notes of a user, or of one folder
+and its subfolders: a directory per folder and a Markdown file per note,
+with tags, flags and timestamps in a YAML front matter block and the note's
+attachments in an ``attachments`` directory next to it. The archive is
+produced by a generator in chunks of about ``CHUNK_SIZE`` bytes (ZipFile
+writes data descriptors when it cannot seek), so the download starts at
+once and memory use does not grow with the number of notes.
+
+``import_archive`` reads such an archive or an Obsidian vault: directories
+become folders, Markdown files become notes, tags come from the front
+matter and from inline ``#tags``, and the files a note embeds or links to
+(``![[image.png]]``, ``[text](file.pdf)``, or listed under
+``attachments:``) become its attachments. Notes are inserted with
+``bulk_create`` in batches of ``batch_size``, each batch in its own
+transaction, so a large vault takes a few queries per batch and never holds
+the database lock for the whole import. Bulk inserts bypass the note
+signals: the import computes previews, records first versions and updates
+the search index and wiki links itself and queues the notes for
+embedding; the HTML of imported notes is rendered when they are first
+opened.
+"""
+
+import datetime
+import json
+import mimetypes
+import posixpath
+import re
+import zipfile
+import zlib
+from collections import defaultdict
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import folders, history, links, search, semantic
+from .models import Folder, Note, NoteAttachment, NoteVersion, Tag
+
+DEFAULT_BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+NOTE_EXTENSIONS = ('.md', '.markdown')
+ATTACHMENTS_DIR = 'attachments'
+# Front matter written by the export; a block with other keys stays in the note content
+FRONT_MATTER_KEYS = {'title', 'tags', 'tag', 'created', 'updated', 'pinned', 'favorite', 'archived', 'attachments'}
+# Already compressed files are stored without deflating them again
+STORED_TYPES = ('image/', 'audio/', 'video/', 'application/zip', 'application/gzip', 'application/pdf')
+
+UNSAFE_CHARACTERS = re.compile(r'[\x00-\x1f/\\:*?"<>|]')
+FRONT_MATTER = re.compile(r'\A---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|\Z)', re.S)
+INLINE_TAG = re.compile(r'(?<![\w#&/])#([^\W\d][\w/-]*)')
+WIKI_LINK = re.compile(r'\[\[([^\]|#^]+)')
+MARKDOWN_LINK = re.compile(r'\[[^\]]*\]\(<?([^)>\s]+)>?(?:\s+"[^"]*")?\)')
+READ_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError, OSError)
+
+
+class VaultError(Exception):
+    """Raised for uploads that cannot be imported at all"""
+
+
+def max_import_bytes():
+    """Limit on the uncompressed size of an imported archive"""
+    return getattr(settings, 'NOTES_IMPORT_MAX_BYTES', 4 * 1024 ** 3)
+
+
+def safe_name(name, fallback='Untitled'):
+    """``name`` usable as a file or directory name on common file systems"""
+    return UNSAFE_CHARACTERS.sub('-', name).strip(' .')[:120] or fallback
+
+
+def _unique(name, taken, extension=''):
+    """``name + extension``, numbered if a directory's ``taken`` names (lowercased) have it already"""
+    base = (name + extension).lower()
+    candidate, number = name + extension, taken.get(base, 1)
+    while candidate.lower() in taken:
+        number += 1
+        candidate = f"{name} ({number}){extension}"
+    taken[candidate.lower()] = 1
+    taken[base] = number  # Where numbering continues for the next note with this name
+    return candidate
+
+
+def _zip_info(path, when):
+    moment = timezone.localtime(when) if timezone.is_aware(when) else when
+    info = zipfile.ZipInfo(path, date_time=max(moment.timetuple()[:6], (1980, 1, 1, 0, 0, 0)))
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+# ==== Export ====
+
+class _Buffer:
+    """Write-only file for ZipFile; without ``tell``/``seek`` it streams entries with data descriptors"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def folder_paths(user, root=None):
+    """``(archive directory by folder id, names taken in each directory)`` for all folders or ``root``'s subtree"""
+    children = defaultdict(list)
+    for folder_id, parent_id, name in Folder.objects.filter(user=user).values_list('id', 'parent_id', 'name'):
+        children[parent_id].append((folder_id, name))
+    paths = {}
+    taken = defaultdict(dict)
+
+    def walk(parent_id, directory):
+        for folder_id, name in sorted(children.get(parent_id, []), key=lambda child: child[1].lower()):
+            if folder_id in paths:
+                continue
+            paths[folder_id] = posixpath.join(directory, _unique(safe_name(name), taken[directory]))
+            walk(folder_id, paths[folder_id])
+
+    if root is None:
+        walk(None, '')
+    else:
+        paths[root.id] = _unique(safe_name(root.name), taken[''])
+        walk(root.id, paths[root.id])
+    return paths, taken
+
+
+def front_matter(note, file_name, attachment_paths):
+    lines = []
+    if file_name != f"{note.title}.md":
+        lines.append(f"title: {json.dumps(note.title, ensure_ascii=False)}")  # Renamed to be unique or valid
+    tags = [tag.name for tag in note.tags.all()]
+    if tags:
+        lines.append(f"tags: {json.dumps(tags, ensure_ascii=False)}")
+    lines.append(f"created: {note.created_at.isoformat()}")
+    lines.append(f"updated: {note.updated_at.isoformat()}")
+    for key, value in (('pinned', note.is_pinned), ('favorite', note.is_favorite), ('archived', note.is_archived)):
+        if value:
+            lines.append(f"{key}: true")
+    if attachment_paths:
+        lines.append(f"attachments: {json.dumps(attachment_paths, ensure_ascii=False)}")
+    return '---\n' + '\n'.join(lines) + '\n---\n\n'
+
+
+def export_archive(user, folder=None):
+    """Generator of the bytes of a ZIP of the user's notes, or of ``folder`` and its subfolders"""
+    paths, taken = folder_paths(user, folder)
+    notes = Note.objects.filter(user=user)
+    if folder is not None:
+        notes = notes.filter(folder_id__in=list(paths))
+    notes = notes.only(
+        'id', 'folder_id', 'title', 'content', 'is_pinned', 'is_favorite', 'is_archived', 'created_at', 'updated_at',
+    ).prefetch_related('tags', 'attachments').order_by('folder_id', 'title', 'id')
+
+    buffer = _Buffer()
+    archive = zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED)
+    for note in notes.iterator(chunk_size=DEFAULT_BATCH_SIZE):
+        directory = paths.get(note.folder_id, '')
+        attachments = []
+        for attachment in note.attachments.all():
+            if not attachment.file or not attachment.file.storage.exists(attachment.file.name):
+                continue
+            stem, extension = posixpath.splitext(safe_name(attachment.original_name, 'attachment'))
+            name = _unique(stem, taken[posixpath.join(directory, ATTACHMENTS_DIR)], extension)
+            attachments.append((posixpath.join(ATTACHMENTS_DIR, name), attachment))
+
+        file_name = _unique(safe_name(note.title), taken[directory], '.md')
+        text = front_matter(note, file_name, [relative for relative, _ in attachments]) + note.content
+        path = posixpath.join(directory, file_name)
+        archive.writestr(_zip_info(path, note.updated_at), text.encode())
+
+        for relative, attachment in attachments:
+            info = _zip_info(posixpath.join(directory, relative), attachment.uploaded_at)
+            if attachment.mime_type.startswith(STORED_TYPES):
+                info.compress_type = zipfile.ZIP_STORED
+            with attachment.file.storage.open(attachment.file.name, 'rb') as source, \
+                    archive.open(info, 'w', force_zip64=attachment.file_size > zipfile.ZIP64_LIMIT) as target:
+                while chunk := source.read(CHUNK_SIZE):
+                    target.write(chunk)
+                    if buffer.size >= CHUNK_SIZE:
+                        yield buffer.take()
+        if buffer.size >= CHUNK_SIZE:
+            yield buffer.take()
+    archive.close()
+    yield buffer.take()
+
+
+# ==== Import ====
+
+def _scalar(value):
+    value = value.strip()
+    if value.startswith('"'):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value.strip('"')
+    if len(value) > 1 and value[0] == value[-1] == "'":
+        return value[1:-1].replace("''", "'")
+    return value
+
+
+def _value(value):
+    if value.startswith('[') and value.endswith(']'):
+        try:
+            items = json.loads(value)
+        except ValueError:
+            items = [_scalar(item) for item in value[1:-1].split(',')]
+        return [str(item) for item in items if str(item).strip()]
+    return _scalar(value)
+
+
+def parse_front_matter(text):
+    """``(metadata, body)``: the simple ``key: value`` and list entries of a leading YAML block, and the rest"""
+    match = FRONT_MATTER.match(text)
+    if not match:
+        return {}, text
+    metadata = {}
+    key = None
+    for line in match.group(1).splitlines():
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        item = re.match(r'\s*-\s+(.*)', line)
+        if item and key is not None:
+            if not isinstance(metadata[key], list):
+                metadata[key] = [metadata[key]] if metadata[key] else []
+            metadata[key].append(_scalar(item.group(1)))
+        elif ':' in line and not line[0].isspace():
+            key, value = line.split(':', 1)
+            key = key.strip().lower()
+            metadata[key] = _value(value.strip())
+    body = text[match.end():]
+    return metadata, body[2:] if body.startswith('\r\n') else body[1:] if body.startswith('\n') else body
+
+
+def _flag(value):
+    return str(value).strip().lower() in ('true', 'yes', '1')
+
+
+def _datetime(value):
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = day and datetime.datetime.combine(day, datetime.time())
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def tag_names(metadata, body):
+    """Tag names from the front matter and inline ``#tags`` outside of code, without duplicates"""
+    declared = metadata.get('tags') or metadata.get('tag') or []
+    if isinstance(declared, str):
+        declared = re.split(r'[,\s]+', declared)
+    inline = INLINE_TAG.findall(links.CODE.sub('', body))
+    names = {}
+    for name in [*declared, *inline]:
+        name = str(name).strip().lstrip('#').rstrip('/-')[:50]
+        if name:
+            names.setdefault(name.lower(), name)
+    return list(names.values())
+
+
+def _resolve(target, directory, files, by_name):
+    """Archive path of the file a link target refers to, resolved like Obsidian does, or None"""
+    target = unquote(target.split('#')[0].split('?')[0]).strip().replace('\\', '/')
+    if not target or '://' in target or target.startswith('mailto:'):
+        return None
+    for candidate in (posixpath.normpath(posixpath.join(directory, target)), posixpath.normpath(target.lstrip('/'))):
+        if candidate in files:
+            return candidate
+    matches = by_name.get(posixpath.basename(target).lower())
+    if not matches:
+        return None
+    # Prefer files next to the note, then the shortest path
+    return min(matches, key=lambda path: (not path.startswith(directory), len(path)))
+
+
+def attachment_paths(metadata, body, directory, files, by_name):
+    listed = metadata.get('attachments') or []
+    targets = [listed] if isinstance(listed, str) else list(listed)
+    targets += WIKI_LINK.findall(body) + MARKDOWN_LINK.findall(body)
+    paths = []
+    for target in targets:
+        path = _resolve(str(target), directory, files, by_name)
+        if path is not None and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def _normalize(name):
+    return posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+
+
+def _is_hidden(path):
+    # Obsidian settings (.obsidian/), trash and macOS resource forks
+    return any(part.startswith('.') or part == '__MACOSX' for part in path.split('/'))
+
+
+def _modified(info):
+    try:
+        return timezone.make_aware(datetime.datetime(*info.date_time))
+    except ValueError:
+        return timezone.now()
+
+
+def create_folders(user, directories, parent=None):
+    """Folder id by archive directory, creating missing folders level by level; returns ``(ids, created)``"""
+    existing = {
+        (parent_id, name): folder_id
+        for folder_id, parent_id, name in Folder.objects.filter(user=user).values_list('id', 'parent_id', 'name')
+    }
+    ids = {'': parent.id if parent else None}
+    created = 0
+    everything = set()
+    for directory in directories:
+        while directory and directory not in everything:
+            everything.add(directory)
+            directory = posixpath.dirname(directory)
+
+    by_depth = defaultdict(list)
+    for directory in everything:
+        by_depth[directory.count('/')].append(directory)
+    with transaction.atomic():
+        for depth in sorted(by_depth):
+            pending = {}
+            for directory in sorted(by_depth[depth]):
+                key = (ids[posixpath.dirname(directory)], posixpath.basename(directory)[:255])
+                if key in existing:
+                    ids[directory] = existing[key]
+                else:
+                    pending.setdefault(key, []).append(directory)
+            new = Folder.objects.bulk_create([
+                Folder(user=user, parent_id=parent_id, name=name) for parent_id, name in pending
+            ])
+            for folder, directories_with_key in zip(new, pending.values()):
+                existing[(folder.parent_id, folder.name)] = folder.pk
+                for directory in directories_with_key:
+                    ids[directory] = folder.pk
+            created += len(new)
+    return ids, created
+
+
+def _store_attachment(archive, info, stored):
+    """Save an archive member to attachment storage once; returns its stored name"""
+    path = _normalize(info.filename)
+    if path not in stored:
+        field = NoteAttachment._meta.get_field('file')
+        name = field.generate_filename(None, posixpath.basename(path))
+        with archive.open(info) as source:
+            stored[path] = field.storage.save(name, File(source, name=posixpath.basename(path)))
+    return stored[path]
+
+
+def _import_batch(user, archive, members, folder_ids, files, by_name, tags, stored, report):
+    now = timezone.now()
+    rows = []
+    for info in members:
+        path = _normalize(info.filename)
+        try:
+            text = archive.read(info).decode('utf-8-sig', errors='replace')
+        except READ_ERRORS as e:
+            report['skipped'].append({'path': path, 'error': str(e)})
+            continue
+        metadata, body = parse_front_matter(text)
+        content = body if set(metadata) <= FRONT_MATTER_KEYS else text
+        directory = posixpath.dirname(path)
+        modified = _modified(info)
+        note = Note(
+            user=user,
+            folder_id=folder_ids[directory],
+            title=str(metadata.get('title') or posixpath.splitext(posixpath.basename(path))[0])[:255],
+            content=content,
+            preview=Note.build_preview(content),
+            is_pinned=_flag(metadata.get('pinned')),
+            is_favorite=_flag(metadata.get('favorite')),
+            is_archived=_flag(metadata.get('archived')),
+            created_at=_datetime(metadata.get('created')) or modified,
+            last_accessed=now,
+        )
+        note.update_word_count()
+        attachments = []
+        for attachment_path in attachment_paths(metadata, body, directory, files, by_name):
+            try:
+                attachments.append((attachment_path, _store_attachment(archive, files[attachment_path], stored)))
+            except READ_ERRORS as e:
+                report['skipped'].append({'path': attachment_path, 'error': str(e)})
+        rows.append((note, _datetime(metadata.get('updated')) or modified, tag_names(metadata, body), attachments))
+    if not rows:
+        return
+
+    with transaction.atomic():
+        names = {name.lower(): name for _, _, note_tags, _ in rows for name in note_tags}
+        missing = [name for key, name in names.items() if key not in tags]
+        if missing:
+            Tag.objects.bulk_create([Tag(user=user, name=name) for name in missing], ignore_conflicts=True)
+            for tag_id, name in Tag.objects.filter(user=user, name__in=missing).values_list('id', 'name'):
+                tags[name.lower()] = tag_id
+            report['tags'] += len(missing)
+
+        notes = Note.objects.bulk_create([note for note, _, _, _ in rows])
+        # auto_now overrides updated_at on insert; keep the time the note was last changed in the vault
+        # (one executemany, bulk_update would build a CASE over the whole batch)
+        with connection.cursor() as cursor:
+            cursor.executemany(f"UPDATE {Note._meta.db_table} SET updated_at = %s WHERE id = %s", [
+                (connection.ops.adapt_datetimefield_value(updated_at), note.pk) for note, updated_at, _, _ in rows
+            ])
+        for note, updated_at, _, _ in rows:
+            note.updated_at = updated_at
+        Note.tags.through.objects.bulk_create([
+            Note.tags.through(note_id=note.pk, tag_id=tags[name.lower()])
+            for note, _, note_tags, _ in rows for name in note_tags if name.lower() in tags
+        ], ignore_conflicts=True)
+        NoteVersion.objects.bulk_create([history.first_version(note, now) for note in notes])
+        NoteAttachment.objects.bulk_create([
+            NoteAttachment(
+                note=note,
+                file=stored_name,
+                original_name=posixpath.basename(path)[:255],
+                file_size=files[path].file_size,
+                mime_type=(mimetypes.guess_type(path)[0] or 'application/octet-stream')[:100],
+                uploaded_at=_modified(files[path]),
+            )
+            for note, _, _, attachments in rows for path, stored_name in attachments
+        ])
+        search.index_notes([note.pk for note in notes])
+        links.update_notes(notes)
+        semantic.schedule_many([note.pk for note in notes])
+    report['notes'] += len(notes)
+    report['attachments'] += sum(len(attachments) for _, _, _, attachments in rows)
+
+
+def import_archive(user, fileobj, folder=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Create folders, notes, tags and attachments from a vault ZIP; returns a JSON-serializable report"""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise VaultError(f"Not a ZIP archive: {e}")
+
+    with archive:
+        members = [info for info in archive.infolist() if not _is_hidden(_normalize(info.filename))]
+        if sum(info.file_size for info in members) > max_import_bytes():
+            raise VaultError('The archive is too large to import')
+        notes = [
+            info for info in members
+            if not info.is_dir() and info.filename.lower().endswith(NOTE_EXTENSIONS)
+        ]
+        files = {
+            _normalize(info.filename): info for info in members
+            if not info.is_dir() and not info.filename.lower().endswith(NOTE_EXTENSIONS)
+        }
+        by_name = defaultdict(list)
+        for path in files:
+            by_name[posixpath.basename(path).lower()].append(path)
+        directories = {posixpath.dirname(_normalize(info.filename)) for info in notes}
+        directories |= {_normalize(info.filename) for info in members if info.is_dir()}
+        directories.discard('.')
+
+        folder_ids, created = create_folders(user, directories, folder)
+        report = {'notes': 0, 'folders': created, 'tags': 0, 'attachments': 0, 'skipped': []}
+        tags = {name.lower(): tag_id for tag_id, name in Tag.objects.filter(user=user).values_list('id', 'name')}
+        stored = {}  # Archive path -> stored file name, for files attached to several notes
+        for offset in range(0, len(notes), batch_size):
+            _import_batch(user, archive, notes[offset:offset + batch_size], folder_ids, files, by_name, tags, stored, report)
+    # Links to notes of later batches
+    links.resolve_pending(user.id)
+    folders.invalidate(user.id)
+    return report
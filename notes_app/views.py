@@ -1,13 +1,16 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.db import transaction
 from django.utils import timezone
 import json
-import markdown
 import uuid
-from .models import Note, Folder, Tag, NoteVersion, NoteAttachment, SharedNote
+from .models import Note, Folder, Tag, NoteAttachment, SharedNote
+from overhead.events import format_event, sse_response
+from . import collab, folders, history, links, listing, rendering, search, semantic, vault
 
 @login_required
 def index(request):
@@ -15,25 +18,7 @@ def index(request):
 
 @login_required
 def get_folders(request):
-    folders = Folder.objects.filter(user=request.user)
-    folders_data = []
-    
-    def build_folder_tree(parent=None):
-        result = []
-        for folder in folders.filter(parent=parent):
-            folder_item = {
-                'id': folder.id,
-                'name': folder.name,
-                'color': folder.color,
-                'icon': folder.icon,
-                'position': folder.position,
-                'children': build_folder_tree(folder)
-            }
-            result.append(folder_item)
-        return result
-    
-    folders_data = build_folder_tree()
-    return JsonResponse({'folders': folders_data})
+    return JsonResponse({'folders': folders.folder_tree(request.user)})
 
 @login_required
 @require_http_methods(["POST"])
@@ -93,19 +78,19 @@ def delete_folder(request, folder_id):
 
 @login_required
 def get_notes(request):
-    notes = Note.objects.filter(user=request.user, is_archived=False)
+    # Listings only need the stored preview, never the full body
+    notes = Note.objects.filter(user=request.user, is_archived=False).select_related('folder').prefetch_related('tags').defer(
+        'content', 'content_html'
+    )
     
     # Apply filters
     folder_id = request.GET.get('folder')
     if folder_id:
         notes = notes.filter(folder_id=folder_id)
     
-    search = request.GET.get('search')
-    if search:
-        notes = notes.filter(
-            Q(title__icontains=search) | 
-            Q(content__icontains=search)
-        )
+    query = request.GET.get('search')
+    if query:
+        notes = search.filter_notes(notes, query)
     
     favorites_only = request.GET.get('favorites')
     if favorites_only == 'true':
@@ -115,13 +100,19 @@ def get_notes(request):
     if tag_names:
         notes = notes.filter(tags__name__in=tag_names).distinct()
     
+    try:
+        limit = int(request.GET.get('limit', listing.PAGE_SIZE))
+        page, next_cursor = listing.page(notes, request.GET.get('cursor'), limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
     notes_data = []
-    for note in notes:
+    for note in page:
         notes_data.append({
             'id': note.id,
             'title': note.title,
-            'content': note.content[:200],  # Preview
-            'folder_id': note.folder.id if note.folder else None,
+            'preview': note.preview,
+            'folder_id': note.folder_id,
             'folder_name': note.folder.name if note.folder else None,
             'tags': [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in note.tags.all()],
             'is_favorite': note.is_favorite,
@@ -131,25 +122,20 @@ def get_notes(request):
             'updated_at': note.updated_at.isoformat()
         })
     
-    return JsonResponse({'notes': notes_data})
+    return JsonResponse({'notes': notes_data, 'next_cursor': next_cursor})
 
 @login_required
 def get_note(request, note_id):
     note = get_object_or_404(Note, pk=note_id, user=request.user)
     
-    # Update last accessed
-    note.last_accessed = timezone.now()
-    note.save()
-    
-    # Convert markdown to HTML
-    md = markdown.Markdown(extensions=['extra', 'codehilite', 'fenced_code', 'tables'])
-    content_html = md.convert(note.content)
+    # Update last accessed without touching updated_at or re-saving the note
+    Note.objects.filter(pk=note.pk).update(last_accessed=timezone.now())
     
     return JsonResponse({
         'id': note.id,
         'title': note.title,
         'content': note.content,
-        'content_html': content_html,
+        'content_html': rendering.note_html(note),
         'folder_id': note.folder.id if note.folder else None,
         'tags': [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in note.tags.all()],
         'is_favorite': note.is_favorite,
@@ -165,6 +151,13 @@ def get_note(request, note_id):
         } for att in note.attachments.all()]
     })
 
+def get_tag_ids(user, tag_ids):
+    tag_ids = {int(tag_id) for tag_id in tag_ids}
+    found = set(Tag.objects.filter(user=user, pk__in=tag_ids).values_list('id', flat=True))
+    if found != tag_ids:
+        raise Http404('Tag not found')
+    return found
+
 @login_required
 @require_http_methods(["POST"])
 def create_note(request):
@@ -173,6 +166,7 @@ def create_note(request):
     folder = None
     if data.get('folder_id'):
         folder = get_object_or_404(Folder, pk=data['folder_id'], user=request.user)
+    tag_ids = get_tag_ids(request.user, data.get('tags', []))
     
     note = Note.objects.create(
         user=request.user,
@@ -183,21 +177,12 @@ def create_note(request):
         is_pinned=data.get('is_pinned', False)
     )
     
-    # Update word count
-    note.update_word_count()
-    
     # Add tags
-    tag_ids = data.get('tags', [])
-    for tag_id in tag_ids:
-        tag = get_object_or_404(Tag, pk=tag_id, user=request.user)
-        note.tags.add(tag)
+    if tag_ids:
+        note.tags.add(*tag_ids)
     
     # Create initial version
-    NoteVersion.objects.create(
-        note=note,
-        content=note.content,
-        version_number=1
-    )
+    history.record(note, note.content)
     
     return JsonResponse({
         'id': note.id,
@@ -208,47 +193,43 @@ def create_note(request):
 @login_required
 @require_http_methods(["PUT"])
 def update_note(request, note_id):
-    note = get_object_or_404(Note, pk=note_id, user=request.user)
     data = json.loads(request.body)
     
-    # Save version if content changed
-    if 'content' in data and data['content'] != note.content:
-        last_version = note.versions.first()
-        version_number = (last_version.version_number + 1) if last_version else 1
+    folder = None
+    if data.get('folder_id'):
+        folder = get_object_or_404(Folder, pk=data['folder_id'], user=request.user)
+    tag_ids = get_tag_ids(request.user, data['tags']) if 'tags' in data else None
+    
+    # One write transaction per autosave instead of one per statement
+    with transaction.atomic():
+        note = get_object_or_404(Note, pk=note_id, user=request.user)
         
-        # Keep only last 10 versions
-        if version_number > 10:
-            oldest_version = note.versions.last()
-            oldest_version.delete()
+        # Save version if content changed, at most one per NOTES_VERSION_INTERVAL_SECONDS
+        if 'content' in data and data['content'] != note.content:
+            history.record(note, note.content, min_interval=history.autosave_interval())  # Save old content
         
-        NoteVersion.objects.create(
-            note=note,
-            content=note.content,  # Save old content
-            version_number=version_number
-        )
-    
-    # Update note
-    note.title = data.get('title', note.title)
-    note.content = data.get('content', note.content)
-    note.is_favorite = data.get('is_favorite', note.is_favorite)
-    note.is_pinned = data.get('is_pinned', note.is_pinned)
-    
-    if 'folder_id' in data:
-        if data['folder_id']:
-            folder = get_object_or_404(Folder, pk=data['folder_id'], user=request.user)
+        # Update note
+        changed = False
+        for field in ('title', 'content', 'is_favorite', 'is_pinned'):
+            if field in data and data[field] != getattr(note, field):
+                setattr(note, field, data[field])
+                changed = True
+        if 'folder_id' in data and note.folder_id != (folder.id if folder else None):
             note.folder = folder
-        else:
-            note.folder = None
-    
-    # Update tags
-    if 'tags' in data:
-        note.tags.clear()
-        for tag_id in data['tags']:
-            tag = get_object_or_404(Tag, pk=tag_id, user=request.user)
-            note.tags.add(tag)
-    
-    note.update_word_count()
-    note.save()
+            changed = True
+        if changed:
+            note.save()
+            if 'content' in data:
+                # Editors in a live session receive the write as an operation
+                transaction.on_commit(lambda: collab.replace(note.id, note.content))
+        
+        # Update tags
+        if tag_ids is not None:
+            current_ids = set(note.tags.values_list('id', flat=True))
+            if current_ids - tag_ids:
+                note.tags.remove(*(current_ids - tag_ids))
+            if tag_ids - current_ids:
+                note.tags.add(*(tag_ids - current_ids))
     
     return JsonResponse({'success': True})
 
@@ -259,6 +240,138 @@ def delete_note(request, note_id):
     note.delete()
     return JsonResponse({'success': True})
 
+@login_required
+def get_note_versions(request, note_id):
+    note = get_object_or_404(Note, pk=note_id, user=request.user)
+    versions = note.versions.only('version_number', 'kind', 'size', 'created_at')
+    
+    return JsonResponse({'versions': [{
+        'version_number': version.version_number,
+        'created_at': version.created_at.isoformat(),
+        'size': version.size,
+        'kind': version.kind,
+    } for version in versions]})
+
+@login_required
+def get_note_version(request, note_id, version_number):
+    note = get_object_or_404(Note, pk=note_id, user=request.user)
+    content = history.content(note.id, version_number)
+    if content is None:
+        return JsonResponse({'error': 'Version not found'}, status=404)
+    
+    return JsonResponse({
+        'note_id': note.id,
+        'version_number': version_number,
+        'content': content,
+    })
+
+@login_required
+def diff_note_versions(request, note_id):
+    note = get_object_or_404(Note, pk=note_id, user=request.user)
+    
+    # Either side is a version number or 'current' for the note as it is now
+    contents = {}
+    for side, default in (('from', None), ('to', 'current')):
+        value = request.GET.get(side, default)
+        if value == 'current':
+            contents[side] = note.content
+            continue
+        try:
+            contents[side] = history.content(note.id, int(value))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': f"'{side}' must be a version number or 'current'"}, status=400)
+        if contents[side] is None:
+            return JsonResponse({'error': f"Version {value} not found"}, status=404)
+    
+    labels = {side: request.GET.get(side, 'current') for side in ('from', 'to')}
+    return JsonResponse({
+        'from': labels['from'],
+        'to': labels['to'],
+        'diff': history.diff(contents['from'], contents['to'], f"v{labels['from']}", f"v{labels['to']}"),
+    })
+
+@login_required
+async def note_collab_events(request, note_id):
+    user = await request.auser()
+    access = await sync_to_async(collab.permission)(user, note_id)
+    if access is None:
+        return JsonResponse({'error': 'Note not found'}, status=404)
+    client = {}
+    
+    def initial():
+        state = collab.join(note_id, user, access)
+        client['id'] = state['client_id']
+        return [format_event('collab.state', state)]
+    
+    def close():
+        if 'id' in client:
+            collab.leave(note_id, client['id'])
+    
+    return sse_response(collab.channel(note_id), initial, on_close=close)
+
+def collab_call(request, func, *args):
+    try:
+        return JsonResponse(func(*args, user_id=request.user.id) or {})
+    except collab.ResyncRequired as e:
+        return JsonResponse({'error': str(e), 'resync': True}, status=409)
+    except PermissionError as e:
+        return JsonResponse({'error': str(e)}, status=403)
+    except collab.CollabError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+@require_http_methods(["POST"])
+def note_collab_op(request, note_id):
+    data = json.loads(request.body)
+    if not data.get('client_id'):
+        return JsonResponse({'error': 'client_id is required'}, status=400)
+    
+    def submit(user_id):
+        return {'revision': collab.submit(note_id, data['client_id'], data.get('revision'), data.get('op'), user_id=user_id)}
+    
+    return collab_call(request, submit)
+
+@login_required
+@require_http_methods(["POST"])
+def note_collab_cursor(request, note_id):
+    data = json.loads(request.body)
+    if not data.get('client_id'):
+        return JsonResponse({'error': 'client_id is required'}, status=400)
+    return collab_call(request, collab.move_cursor, note_id, data['client_id'], data.get('cursor'))
+
+@login_required
+def get_note_backlinks(request, note_id):
+    note = get_object_or_404(Note, pk=note_id, user=request.user)
+    
+    backlinks = {}
+    for link in links.backlinks(note):
+        source = backlinks.setdefault(link.source_id, {
+            'id': link.source.id,
+            'title': link.source.title,
+            'folder_id': link.source.folder_id,
+            'is_archived': link.source.is_archived,
+            'updated_at': link.source.updated_at.isoformat(),
+            'references': []
+        })
+        source['references'].append({'anchor': link.anchor, 'alias': link.alias, 'context': link.context})
+    
+    return JsonResponse({'backlinks': list(backlinks.values())})
+
+@login_required
+def get_note_graph(request, note_id):
+    note = get_object_or_404(Note, pk=note_id, user=request.user)
+    try:
+        depth = int(request.GET.get('depth', links.GRAPH_DEPTH))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid depth'}, status=400)
+    
+    nodes, edges, truncated = links.graph(note, depth)
+    return JsonResponse({
+        'nodes': nodes,
+        'edges': [{'source': source_id, 'target': target_id} for source_id, target_id in edges],
+        'truncated': truncated
+    })
+
 @login_required
 @require_http_methods(["PATCH"])
 def move_note(request, note_id):
@@ -278,35 +391,40 @@ def move_note(request, note_id):
 @login_required
 def search_notes(request):
     query = request.GET.get('q', '')
-    if not query:
-        return JsonResponse({'results': []})
-    
-    notes = Note.objects.filter(
-        user=request.user,
-        is_archived=False
-    ).filter(
-        Q(title__icontains=query) | 
-        Q(content__icontains=query) |
-        Q(tags__name__icontains=query)
-    ).distinct()[:20]
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', search.PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page'}, status=400)
+    page = max(page, 1)
+    page_size = max(1, min(page_size, search.MAX_PAGE_SIZE))
+    
+    mode = request.GET.get('mode', 'text')
+    if mode == 'semantic':
+        matches, total = semantic.search(request.user, query, page, page_size)
+    elif mode == 'text':
+        matches, total = search.search(request.user, query, page, page_size)
+        matches = [(note, snippet, None) for note, snippet in matches]
+    else:
+        return JsonResponse({'error': 'Invalid mode'}, status=400)
     
     results = []
-    for note in notes:
-        # Highlight matching text
-        content_preview = note.content[:200]
-        if query.lower() in content_preview.lower():
-            start = content_preview.lower().index(query.lower())
-            content_preview = '...' + content_preview[max(0, start-30):min(len(content_preview), start+100)] + '...'
-        
+    for note, snippet, score in matches:
         results.append({
             'id': note.id,
             'title': note.title,
-            'preview': content_preview,
+            'preview': snippet,  # HTML, matches wrapped in <mark> (text) or the best matching section (semantic)
             'folder': note.folder.name if note.folder else None,
-            'updated_at': note.updated_at.isoformat()
+            'updated_at': note.updated_at.isoformat(),
+            'score': score
         })
     
-    return JsonResponse({'results': results})
+    return JsonResponse({
+        'results': results,
+        'total': total,
+        'page': page,
+        'has_more': page * page_size < total
+    })
 
 @login_required
 def get_tags(request):
@@ -346,7 +464,6 @@ def export_note(request, note_id):
         response = HttpResponse(note.content, content_type='text/markdown')
         response['Content-Disposition'] = f'attachment; filename="{note.title}.md"'
     elif format_type == 'html':
-        md = markdown.Markdown(extensions=['extra', 'codehilite', 'fenced_code', 'tables'])
         html_content = f"""
         <!DOCTYPE html>
         <html>
@@ -364,7 +481,7 @@ def export_note(request, note_id):
         </head>
         <body>
             <h1>{note.title}</h1>
-            {md.convert(note.content)}
+            {rendering.note_html(note)}
         </body>
         </html>
         """
@@ -375,6 +492,51 @@ def export_note(request, note_id):
     
     return response
 
+def streamed(request, chunks):
+    """``chunks`` as the iterator type the server streams without buffering (async under ASGI)"""
+    if not isinstance(request, ASGIRequest):
+        return chunks
+    
+    async def iterate():
+        try:
+            while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+                yield chunk
+        finally:
+            await sync_to_async(chunks.close)()
+    
+    return iterate()
+
+@login_required
+def export_notes(request):
+    folder = None
+    if request.GET.get('folder_id'):
+        folder = get_object_or_404(Folder, pk=request.GET['folder_id'], user=request.user)
+    
+    name = vault.safe_name(folder.name if folder else 'notes', 'notes')
+    response = StreamingHttpResponse(
+        streamed(request, vault.export_archive(request.user, folder)),
+        content_type='application/zip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{name}.zip"'
+    return response
+
+@login_required
+@require_http_methods(["POST"])
+def import_notes(request):
+    upload = request.FILES.get('file')
+    if not upload:
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+    
+    folder = None
+    if request.POST.get('folder_id'):
+        folder = get_object_or_404(Folder, pk=request.POST['folder_id'], user=request.user)
+    
+    try:
+        report = vault.import_archive(request.user, upload, folder=folder)
+    except vault.VaultError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(report)
+
 # AI Agent Functions
 @login_required
 def get_ai_templates(request):
@@ -460,9 +622,6 @@ def generate_ai_document(request):
         folder=folder
     )
     
-    # Update word count
-    note.update_word_count()
-    
     # Add AI-generated tag
     ai_tag, _ = Tag.objects.get_or_create(
         user=request.user,
@@ -480,11 +639,7 @@ def generate_ai_document(request):
     note.tags.add(template_tag)
     
     # Create initial version
-    NoteVersion.objects.create(
-        note=note,
-        content=note.content,
-        version_number=1
-    )
+    history.record(note, note.content)
     
     return JsonResponse({
         'success': True,
@@ -537,19 +692,12 @@ def enhance_ai_document(request):
         return JsonResponse({'error': result.get('error', 'Failed to enhance document')}, status=500)
     
     # Save old version
-    last_version = note.versions.first()
-    version_number = (last_version.version_number + 1) if last_version else 1
-    
-    NoteVersion.objects.create(
-        note=note,
-        content=note.content,
-        version_number=version_number
-    )
+    history.record(note, note.content)
     
     # Update note with enhanced content
     note.content = result['content']
-    note.update_word_count()
     note.save()
+    collab.replace(note.id, note.content)
     
     # Add AI-enhanced tag
     enhanced_tag, _ = Tag.objects.get_or_create(
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'overhead.settings')
 
 application = get_asgi_application()
+
+# Periodic jobs (timesheet reports, timer reconciliation), see overhead/scheduler.py
+from overhead import scheduler  # noqa: E402
+
+scheduler.autostart()
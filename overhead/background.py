@@ -0,0 +1,70 @@
+"""
+Shared in-process worker pool.
+
+Rendering PDFs, rebuilding indexes and similar slow work is handed to this
+pool so it never runs inside a web request thread. Set
+``BACKGROUND_TASKS_EAGER = True`` to run submitted work synchronously
+(useful for management commands and debugging).
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide executor, creating it on first use"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                thread_name_prefix='background',
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+        raise
+    finally:
+        close_old_connections()
+
+
+def submit(func, *args, **kwargs):
+    """Run ``func`` in the worker pool and return a Future"""
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as exc:
+            logger.exception('Background task %s failed', getattr(func, '__name__', func))
+            future.set_exception(exc)
+        return future
+    return get_executor().submit(_run, func, args, kwargs)
+
+
+def submit_on_commit(func, *args, **kwargs):
+    """Submit ``func`` once the current transaction has committed"""
+    transaction.on_commit(lambda: submit(func, *args, **kwargs))
+
+
+def shutdown(wait=True):
+    """Wait for queued work to finish (used by batch commands before exiting)"""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,109 @@
+"""
+In-process publish/subscribe broker for Server-Sent Events.
+
+Views publish small JSON events to named channels (e.g. ``timer:<user_id>``)
+from synchronous code; async SSE views subscribe to a channel and stream the
+events to the browser. Subscribers are held in memory, so every open tab of a
+user must be served by the same ASGI process (run a single worker, or put a
+shared broker in front when scaling out).
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+HEARTBEAT_SECONDS = 20
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, channel, loop):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def deliver(self, message):
+        if self.queue.full():
+            # A stalled client only needs the most recent state
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class Broker:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(channel, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def publish(self, channel, event, data):
+        """Send an event to every subscriber of a channel (thread-safe)"""
+        message = format_event(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Event loop already closed; the stream is going away
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(channel, initial=None, on_close=None):
+    """Async generator yielding SSE frames for a channel until the client leaves
+
+    ``initial`` may be a (synchronous) callable returning the initial events;
+    it is called after subscribing, so no event published in between is
+    lost. ``on_close`` is called when the stream ends and must not block.
+    """
+    subscription = broker.subscribe(channel)
+    try:
+        yield "retry: 3000\n\n"
+        if callable(initial):
+            initial = await sync_to_async(initial)()
+        for message in initial or ():
+            yield message
+        while True:
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+        if on_close is not None:
+            on_close()
+
+
+def sse_response(channel, initial=None, on_close=None):
+    """StreamingHttpResponse for an SSE channel (must be served via ASGI)"""
+    response = StreamingHttpResponse(event_stream(channel, initial, on_close), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,95 @@
+"""
+Lightweight in-process scheduler.
+
+Apps register periodic jobs in ``AppConfig.ready``. One daemon thread wakes
+up every ``SCHEDULER_TICK_SECONDS`` and runs the jobs that are due. Jobs
+should only find out what is due and hand slow work (rendering, email) to
+``overhead.background``. The loop runs in ``manage.py run_scheduler`` or,
+with ``SCHEDULER_AUTOSTART = True``, inside the web process. Nothing here
+coordinates between processes, so jobs must claim their work with
+conditional updates to be safe when several schedulers run.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_jobs = {}
+_lock = threading.Lock()
+_stop = threading.Event()
+_thread = None
+
+
+class Job:
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = 0.0  # time.monotonic(); 0 runs it on the first tick
+
+
+def register(name, func, interval):
+    """Run ``func()`` every ``interval`` seconds; registering a name again replaces the job"""
+    with _lock:
+        _jobs[name] = Job(name, func, interval)
+
+
+def jobs():
+    with _lock:
+        return list(_jobs.values())
+
+
+def run_pending(now=None):
+    """Run every due job once; returns the names of the jobs that ran"""
+    now = time.monotonic() if now is None else now
+    due = [job for job in jobs() if job.next_run <= now]
+    for job in due:
+        job.next_run = now + job.interval
+        close_old_connections()
+        try:
+            job.func()
+        except Exception:
+            logger.exception('Scheduled job %s failed', job.name)
+        finally:
+            close_old_connections()
+    return [job.name for job in due]
+
+
+def run(tick=None):
+    """Run due jobs until ``stop`` is called (blocks the calling thread)"""
+    tick = tick or getattr(settings, 'SCHEDULER_TICK_SECONDS', 30)
+    _stop.clear()
+    while not _stop.is_set():
+        run_pending()
+        _stop.wait(tick)
+
+
+def start(tick=None):
+    """Start the scheduler thread unless it is already running"""
+    global _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return _thread
+        _thread = threading.Thread(target=run, args=(tick,), name='scheduler', daemon=True)
+        _thread.start()
+        return _thread
+
+
+def stop(timeout=None):
+    global _thread
+    _stop.set()
+    with _lock:
+        thread, _thread = _thread, None
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(timeout)
+
+
+def autostart():
+    """Start the scheduler in a server process when ``SCHEDULER_AUTOSTART`` is set"""
+    if getattr(settings, 'SCHEDULER_AUTOSTART', False):
+        start()
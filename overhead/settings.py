@@ -90,6 +90,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent
+            # writers wait for up to `timeout` seconds instead of failing with
+            # "database is locked" when a read lock cannot be upgraded
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -183,3 +190,57 @@ SOCIALACCOUNT_PROVIDERS = {
         }
     }
 }
+
+# In-process background worker pool (see overhead/background.py)
+BACKGROUND_WORKERS = 2
+BACKGROUND_TASKS_EAGER = False
+
+# Currency that time tracker statistics and reports are converted to
+TIME_TRACKER_BASE_CURRENCY = 'EUR'
+
+# Report results and other derived data; use a shared backend (Redis,
+# Memcached) when running more than one server process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'overhead',
+    }
+}
+
+# Timers and open time entries running longer than this are reconciled by
+# `manage.py reconcile_timers` (users can override it in their settings)
+TIME_TRACKER_IDLE_TIMER_HOURS = 10
+
+# In-process scheduler for periodic jobs (see overhead/scheduler.py). Run
+# `manage.py run_scheduler` as a separate process, or start it inside the
+# web server process with SCHEDULER_AUTOSTART
+SCHEDULER_AUTOSTART = False
+SCHEDULER_TICK_SECONDS = 30
+
+# Outgoing email goes to a local SMTP stand-in during development, e.g.
+# `python -m aiosmtpd -n -l localhost:1025`
+EMAIL_HOST = 'localhost'
+EMAIL_PORT = 1025
+DEFAULT_FROM_EMAIL = 'overhead@localhost'
+
+# `manage.py archive_entries` moves time entries out of the live table when
+# they were soft-deleted (and synced as tombstones) or billed long enough ago
+TIME_TRACKER_ARCHIVE_DELETED_DAYS = 30
+TIME_TRACKER_ARCHIVE_BILLED_DAYS = 730
+
+# Note version history is thinned by age: (max age in days, one version per
+# this many seconds) tiers, 0 keeps every version, a None age keeps the
+# rest forever (see notes_app/history.py)
+NOTES_VERSION_RETENTION = (
+    (1, 0),
+    (7, 60 * 60),
+    (90, 24 * 60 * 60),
+    (None, 7 * 24 * 60 * 60),
+)
+# Autosaves record at most one note version per this many seconds
+NOTES_VERSION_INTERVAL_SECONDS = 300
+
+# Semantic note search embeds note sections with this provider: a class with
+# `name`, `dimensions` and `embed(texts)`. The default is a local hashing
+# stand-in that needs no model download (see notes_app/semantic.py)
+NOTES_EMBEDDING_PROVIDER = 'notes_app.semantic.HashingEmbedder'
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class TimeTrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'time_tracker'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from overhead import scheduler
+        from . import archive, idle, timesheets
+
+        scheduler.register('time_tracker.timesheets', timesheets.run_due, 60)
+        scheduler.register('time_tracker.reconcile_timers', idle.reconcile, 15 * 60)
+        scheduler.register('time_tracker.archive_entries', archive.archive_entries, 24 * 60 * 60)
@@ -0,0 +1,95 @@
+"""
+Archival of soft-deleted and old billed time entries.
+
+Live queries always filter ``is_deleted=False`` and are served by partial
+indexes, but soft-deleted rows and years of billed history still bloat the
+entries table. ``archive_entries`` moves
+
+* entries soft-deleted more than ``TIME_TRACKER_ARCHIVE_DELETED_DAYS`` ago
+  (sync clients receive them as tombstones until then) and
+* billed entries that ended more than ``TIME_TRACKER_ARCHIVE_BILLED_DAYS`` ago
+
+into ``ArchivedTimeEntry``. Each batch is copied with one INSERT ... SELECT
+and removed with one DELETE inside a transaction. The DELETE bypasses model
+signals on purpose: billed entries keep counting in ``DailyRollup`` and
+project totals, deleted entries were taken out when they were deleted.
+Reports and ``rollups.rebuild`` read archived entries alongside live ones.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedTimeEntry, TimeEntry
+
+FIELDS = ('id', 'user', 'task', 'start_time', 'end_time', 'description', 'is_billable', 'is_billed',
+          'is_deleted', 'invoice', 'client_uuid', 'version', 'created_at', 'updated_at')
+BATCH_SIZE = 1000
+
+
+def deleted_retention():
+    return datetime.timedelta(days=getattr(settings, 'TIME_TRACKER_ARCHIVE_DELETED_DAYS', 30))
+
+
+def billed_retention():
+    return datetime.timedelta(days=getattr(settings, 'TIME_TRACKER_ARCHIVE_BILLED_DAYS', 730))
+
+
+def candidates(now=None):
+    """Live table entries that are due for archival"""
+    now = now or timezone.now()
+    return TimeEntry.objects.filter(
+        Q(is_deleted=True, updated_at__lt=now - deleted_retention())
+        | Q(is_deleted=False, is_billed=True, end_time__lt=now - billed_retention())
+    )
+
+
+def _move(source, target, ids, extra_columns=(), extra_params=()):
+    """Copy rows ``ids`` from one entry table to the other and delete them from the source"""
+    quote = connection.ops.quote_name
+    columns = [quote(source._meta.get_field(name).column) for name in FIELDS]
+    id_placeholders = ', '.join(['%s'] * len(ids))
+    target_columns = ', '.join(columns + [quote(column) for column in extra_columns])
+    source_columns = ', '.join(columns + ['%s'] * len(extra_params))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(target._meta.db_table)} ({target_columns}) "
+            f"SELECT {source_columns} FROM {quote(source._meta.db_table)} WHERE {quote('id')} IN ({id_placeholders})",
+            [*extra_params, *ids],
+        )
+        cursor.execute(f"DELETE FROM {quote(source._meta.db_table)} WHERE {quote('id')} IN ({id_placeholders})", ids)
+
+
+def archive_entries(now=None, batch_size=BATCH_SIZE, dry_run=False):
+    """Move entries due for archival in batches; returns the number of archived entries"""
+    now = now or timezone.now()
+    queryset = candidates(now)
+    if dry_run:
+        return queryset.count()
+
+    archived_at = connection.ops.adapt_datetimefield_value(now)
+    archived = 0
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return archived
+        last_id = ids[-1]
+        with transaction.atomic():
+            # Re-check under lock, an entry may have been restored or re-billed meanwhile
+            ids = list(candidates(now).select_for_update().filter(id__in=ids).values_list('id', flat=True))
+            if ids:
+                _move(TimeEntry, ArchivedTimeEntry, ids, ['archived_at'], [archived_at])
+        archived += len(ids)
+
+
+def restore(entries):
+    """Move archived entries back into the live table, e.g. when their invoice is cancelled"""
+    ids = list(entries.values_list('id', flat=True))
+    for start in range(0, len(ids), BATCH_SIZE):
+        with transaction.atomic():
+            _move(ArchivedTimeEntry, TimeEntry, ids[start:start + BATCH_SIZE])
+    return len(ids)
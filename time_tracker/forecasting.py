@@ -0,0 +1,89 @@
+"""
+Budget burn-down and forecasting from daily rollups.
+
+Burn-down series and burn rates are read from ``DailyRollup`` instead of
+scanning entries. The forecast uses the average daily burn over a trailing
+window to project when the remaining budget runs out.
+"""
+
+import datetime
+import math
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .models import DailyRollup
+
+DEFAULT_WINDOW_DAYS = 14
+MAX_WINDOW_DAYS = 365
+
+
+def burn_down(project):
+    """Cumulative hours per day for a project, with remaining budget"""
+    budget = project.budget_hours
+    cumulative = Decimal('0')
+    series = []
+    rows = (DailyRollup.objects.filter(project=project)
+            .values('day').annotate(seconds=Sum('seconds')).order_by('day'))
+    for row in rows:
+        hours = Decimal(row['seconds']) / 3600
+        cumulative += hours
+        series.append({
+            'date': row['day'].isoformat(),
+            'hours': round(float(hours), 2),
+            'cumulative_hours': round(float(cumulative), 2),
+            'remaining_hours': round(float(budget - cumulative), 2) if budget else None,
+        })
+    return series
+
+
+def recent_burn(projects, window_days=DEFAULT_WINDOW_DAYS, today=None):
+    """Tracked seconds in the trailing window per project, from one grouped query"""
+    today = today or datetime.date.today()
+    since = today - datetime.timedelta(days=window_days - 1)
+    totals = defaultdict(int)
+    rows = (DailyRollup.objects.filter(project__in=projects, day__gte=since, day__lte=today)
+            .values('project_id').annotate(seconds=Sum('seconds')))
+    for row in rows:
+        totals[row['project_id']] = row['seconds']
+    return totals
+
+
+def forecast(project, window_seconds, window_days=DEFAULT_WINDOW_DAYS, today=None):
+    """Forecast for one project given its tracked seconds in the trailing window"""
+    today = today or datetime.date.today()
+    tracked_hours = project.get_tracked_hours()
+    daily_burn = Decimal(window_seconds) / 3600 / window_days
+    result = {
+        'project_id': project.id,
+        'project_name': project.name,
+        'client_name': project.client.name,
+        'budget_hours': float(project.budget_hours) if project.budget_hours else None,
+        'tracked_hours': round(float(tracked_hours), 2),
+        'budget_percentage': round(float(project.get_budget_percentage()), 1) if project.budget_hours else None,
+        'daily_burn_hours': round(float(daily_burn), 2),
+        'remaining_hours': None,
+        'projected_exhaustion_date': None,
+        'days_remaining': None,
+    }
+    if not project.budget_hours:
+        return result
+
+    remaining = project.budget_hours - tracked_hours
+    result['remaining_hours'] = round(float(remaining), 2)
+    if remaining <= 0:
+        result['projected_exhaustion_date'] = today.isoformat()
+        result['days_remaining'] = 0
+    elif daily_burn > 0:
+        days = math.ceil(remaining / daily_burn)
+        result['projected_exhaustion_date'] = (today + datetime.timedelta(days=days)).isoformat()
+        result['days_remaining'] = days
+    return result
+
+
+def forecast_projects(projects, window_days=DEFAULT_WINDOW_DAYS, today=None):
+    """Forecasts for many projects with a single rollup query"""
+    projects = list(projects)
+    burn = recent_burn(projects, window_days, today)
+    return [forecast(project, burn[project.id], window_days, today) for project in projects]
@@ -0,0 +1,177 @@
+"""
+Reconciliation of forgotten timers and open time entries.
+
+A timer or open entry left running keeps growing with every request that
+computes its duration from "now". ``reconcile`` finds everything that has
+been running longer than the shortest configured threshold with one query
+per table (using the ``start_time`` indexes), applies each user's rule and
+records a ``TrackerNotification``:
+
+* ``cap``: finish it at start + the user's maximum duration
+* ``split``: finish it as one entry per day, each capped at the maximum
+* ``notify``: leave it running and only notify (once)
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import intervals, realtime
+from .models import Timer, TimeEntry, TrackerNotification, TrackerSettings
+
+
+def default_max_hours():
+    return Decimal(str(getattr(settings, 'TIME_TRACKER_IDLE_TIMER_HOURS', 10)))
+
+
+def load_rules():
+    """``(default rule, {user_id: (max hours, action)})`` for users with settings"""
+    default = (default_max_hours(), 'cap')
+    rules = {}
+    for user_id, max_hours, action in TrackerSettings.objects.values_list('user_id', 'max_timer_hours', 'idle_action'):
+        rules[user_id] = (max_hours or default[0], action)
+    return default, rules
+
+
+def segments(start, end, max_hours, action):
+    """``(start, end)`` pieces an interval is reduced to under a rule"""
+    limit = datetime.timedelta(seconds=float(max_hours) * 3600)
+    if action == 'split':
+        return [
+            (segment_start, min(segment_end, segment_start + limit))
+            for _, segment_start, segment_end in intervals.split_by_day(start, end, start, end)
+        ]
+    return [(start, min(end, start + limit))]
+
+
+def _notify(user_id, kind, message, **data):
+    return TrackerNotification.objects.create(user_id=user_id, kind=kind, message=message, data=data)
+
+
+def _describe(pieces):
+    hours = sum((end - start).total_seconds() for start, end in pieces) / 3600
+    return f"{hours:.2f}h until {timezone.localtime(pieces[-1][1]):%Y-%m-%d %H:%M}"
+
+
+def reconcile_timer(timer, max_hours, action, now):
+    """Finish a forgotten timer; returns the created entries (None if it was stopped meanwhile)"""
+    pieces = segments(timer.start_time, now, max_hours, action)
+    with transaction.atomic():
+        # Conditional delete: a concurrent stop or restart wins
+        deleted, _ = Timer.objects.filter(pk=timer.pk, start_time=timer.start_time).delete()
+        if not deleted:
+            return None
+        entries = [
+            TimeEntry.objects.create(
+                user_id=timer.user_id,
+                task_id=timer.task_id,
+                start_time=start,
+                end_time=end,
+                description=timer.description,
+                is_billable=True,
+            )
+            for start, end in pieces
+        ]
+        _notify(
+            timer.user_id, 'idle_timer',
+            f"Timer for {timer.task.name} was running since {timezone.localtime(timer.start_time):%Y-%m-%d %H:%M} "
+            f"and was stopped automatically after {_describe(pieces)}",
+            entry_ids=[entry.id for entry in entries],
+        )
+        realtime.publish_timer_stopped(timer.user_id, entries[-1])
+    return entries
+
+
+def reconcile_entry(entry, max_hours, action, now):
+    """Close an open entry; returns the resulting entries (None if it was closed meanwhile)"""
+    pieces = segments(entry.start_time, now, max_hours, action)
+    with transaction.atomic():
+        entry = TimeEntry.objects.select_for_update().filter(
+            pk=entry.pk, end_time__isnull=True, is_deleted=False
+        ).select_related('task').first()
+        if entry is None:
+            return None
+        entry.end_time = pieces[0][1]
+        entry.save()
+        entries = [entry] + [
+            TimeEntry.objects.create(
+                user_id=entry.user_id,
+                task_id=entry.task_id,
+                start_time=start,
+                end_time=end,
+                description=entry.description,
+                is_billable=entry.is_billable,
+            )
+            for start, end in pieces[1:]
+        ]
+        _notify(
+            entry.user_id, 'open_entry',
+            f"Open time entry for {entry.task.name} was closed automatically after {_describe(pieces)}",
+            entry_ids=[item.id for item in entries],
+        )
+    return entries
+
+
+def _due(start, max_hours, now):
+    return start + datetime.timedelta(seconds=float(max_hours) * 3600) <= now
+
+
+def reconcile(now=None):
+    """Reconcile all timers and open entries past their user's threshold; returns counts"""
+    now = now or timezone.now()
+    default, rules = load_rules()
+    shortest = min([default[0]] + [max_hours for max_hours, _ in rules.values()])
+    cutoff = now - datetime.timedelta(seconds=float(shortest) * 3600)
+
+    timers = [
+        timer for timer in Timer.objects.filter(start_time__lt=cutoff).select_related('task')
+        if _due(timer.start_time, rules.get(timer.user_id, default)[0], now)
+    ]
+    open_entries = [
+        entry for entry in TimeEntry.objects.filter(
+            end_time__isnull=True, is_deleted=False, start_time__lt=cutoff
+        ).select_related('task')
+        if _due(entry.start_time, rules.get(entry.user_id, default)[0], now)
+    ]
+
+    # Only the first notification per timer/entry for users who asked to be notified only;
+    # look up the notifications of this run's candidates, not the whole history
+    notify_users = {user_id for user_id, (_, action) in rules.items() if action == 'notify'}
+    notified = set()
+    timer_ids = [timer.id for timer in timers if timer.user_id in notify_users]
+    if timer_ids:
+        notified.update(('idle_timer', item_id) for item_id in TrackerNotification.objects.filter(
+            user_id__in=notify_users, kind='idle_timer', data__timer_id__in=timer_ids,
+        ).values_list('data__timer_id', flat=True))
+    entry_ids = [entry.id for entry in open_entries if entry.user_id in notify_users]
+    if entry_ids:
+        notified.update(('open_entry', item_id) for item_id in TrackerNotification.objects.filter(
+            user_id__in=notify_users, kind='open_entry', data__entry_id__in=entry_ids,
+        ).values_list('data__entry_id', flat=True))
+
+    summary = {'timers': 0, 'entries': 0, 'notified': 0}
+    for timer in timers:
+        max_hours, action = rules.get(timer.user_id, default)
+        if action == 'notify':
+            if ('idle_timer', timer.id) not in notified:
+                _notify(timer.user_id, 'idle_timer',
+                        f"Timer for {timer.task.name} has been running for more than {max_hours}h",
+                        timer_id=timer.id)
+                summary['notified'] += 1
+        elif reconcile_timer(timer, max_hours, action, now):
+            summary['timers'] += 1
+
+    for entry in open_entries:
+        max_hours, action = rules.get(entry.user_id, default)
+        if action == 'notify':
+            if ('open_entry', entry.id) not in notified:
+                _notify(entry.user_id, 'open_entry',
+                        f"Time entry for {entry.task.name} has been open for more than {max_hours}h",
+                        entry_id=entry.id)
+                summary['notified'] += 1
+        elif reconcile_entry(entry, max_hours, action, now):
+            summary['entries'] += 1
+    return summary
@@ -0,0 +1,407 @@
+"""
+Bulk import of time entries from CSV and iCalendar (.ics) files.
+
+Rows are parsed into ``ImportRow`` objects, mapped to the user's tasks by
+name or by explicit rules, validated (times, overlaps with existing entries
+and with each other) and inserted with ``bulk_create`` in batches. A dry run
+returns the same report without writing anything.
+"""
+
+import csv
+import datetime
+import io
+import re
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import intervals, rollups
+from .models import Task, TimeEntry
+
+DEFAULT_BATCH_SIZE = 500
+PREVIEW_SIZE = 50
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'ja', 'x'}
+DATE_FORMATS = ['%Y-%m-%d', '%d.%m.%Y', '%Y/%m/%d', '%d.%m.%y']
+TIME_FORMATS = ['%H:%M:%S', '%H:%M']
+
+
+class ImportFileError(Exception):
+    """Raised for files that cannot be parsed at all"""
+
+
+@dataclass
+class ImportRow:
+    line: int
+    start_time: datetime.datetime = None
+    end_time: datetime.datetime = None
+    task_ref: str = ''
+    description: str = ''
+    is_billable: bool = True
+    task: Task = None
+    errors: list = field(default_factory=list)
+
+    def as_preview(self):
+        return {
+            'line': self.line,
+            'start_time': self.start_time.isoformat() if self.start_time else None,
+            'end_time': self.end_time.isoformat() if self.end_time else None,
+            'task_ref': self.task_ref,
+            'task_id': self.task.id if self.task else None,
+            'task_name': self.task.name if self.task else None,
+            'description': self.description,
+            'is_billable': self.is_billable,
+            'errors': self.errors,
+        }
+
+
+# ==================== PARSING ====================
+
+def _aware(value):
+    if timezone.is_naive(value):
+        return timezone.make_aware(value, timezone.get_current_timezone())
+    return value
+
+
+def _parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date '{value}'")
+
+
+def _parse_time(value):
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized time '{value}'")
+
+
+def _parse_datetime(value, day=None):
+    """Parse a full datetime, or a time of day combined with ``day``"""
+    value = value.strip()
+    try:
+        return _aware(datetime.datetime.fromisoformat(value))
+    except ValueError:
+        pass
+    if ' ' in value:
+        date_part, time_part = value.split(' ', 1)
+        return _aware(datetime.datetime.combine(_parse_date(date_part), _parse_time(time_part)))
+    if day is None:
+        raise ValueError(f"Missing date for time '{value}'")
+    return _aware(datetime.datetime.combine(day, _parse_time(value)))
+
+
+def _is_time_only(value):
+    try:
+        _parse_time(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _parse_duration(value):
+    """Parse ``HH:MM[:SS]`` or decimal hours (``1.5`` / ``1,5``)"""
+    value = value.strip()
+    if ':' in value:
+        parts = [int(part) for part in value.split(':')]
+        while len(parts) < 3:
+            parts.append(0)
+        return datetime.timedelta(hours=parts[0], minutes=parts[1], seconds=parts[2])
+    return datetime.timedelta(hours=float(value.replace(',', '.')))
+
+
+def _normalize_header(name):
+    return re.sub(r'[^a-z0-9]+', '_', (name or '').strip().lower()).strip('_')
+
+
+def parse_csv(text):
+    """Parse CSV exports (own format, Toggl/Clockify style columns)"""
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    if not reader.fieldnames:
+        raise ImportFileError('CSV file has no header row')
+    reader.fieldnames = [_normalize_header(name) for name in reader.fieldnames]
+
+    rows = []
+    for line, record in enumerate(reader, start=2):
+        record = {key: (value or '').strip() for key, value in record.items() if key}
+        row = ImportRow(line=line)
+        try:
+            day = None
+            date_value = record.get('start_date') or record.get('date')
+            if date_value:
+                day = _parse_date(date_value)
+            start_value = record.get('start_time') or record.get('start') or record.get('start_datetime')
+            if not start_value:
+                raise ValueError('Missing start time')
+            row.start_time = _parse_datetime(start_value, day)
+
+            end_value = record.get('end_time') or record.get('end') or record.get('end_datetime')
+            if end_value:
+                end_day = _parse_date(record['end_date']) if record.get('end_date') else row.start_time.date()
+                row.end_time = _parse_datetime(end_value, end_day)
+                if row.end_time <= row.start_time and not record.get('end_date') and _is_time_only(end_value):
+                    # A bare end time before the start means the entry ran past midnight
+                    row.end_time += datetime.timedelta(days=1)
+            elif record.get('duration'):
+                row.end_time = row.start_time + _parse_duration(record['duration'])
+            else:
+                raise ValueError('Missing end time or duration')
+        except (ValueError, OverflowError) as exc:
+            row.errors.append(str(exc))
+
+        row.task_ref = ' > '.join(
+            part for part in (record.get('client'), record.get('project'), record.get('task')) if part
+        )
+        row.description = record.get('description', '')
+        if record.get('billable'):
+            row.is_billable = record['billable'].lower() in TRUE_VALUES
+        rows.append(row)
+    return rows
+
+
+def _unfold_ics(text):
+    lines = []
+    for raw in text.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        if raw[:1] in (' ', '\t') and lines:
+            lines[-1] += raw[1:]
+        elif raw:
+            lines.append(raw)
+    return lines
+
+
+def _unescape_ics(value):
+    return (value.replace('\\n', '\n').replace('\\N', '\n')
+            .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def _parse_ics_datetime(value, params):
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return None  # All-day events are not time entries
+    if value.endswith('Z'):
+        return datetime.datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=datetime.timezone.utc)
+    naive = datetime.datetime.strptime(value, '%Y%m%dT%H%M%S')
+    if 'TZID' in params:
+        try:
+            from zoneinfo import ZoneInfo
+            return naive.replace(tzinfo=ZoneInfo(params['TZID']))
+        except (KeyError, ValueError):
+            pass
+    return _aware(naive)
+
+
+def _parse_ics_duration(value):
+    match = re.fullmatch(r'([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?', value)
+    if not match:
+        raise ValueError(f"Unrecognized duration '{value}'")
+    _, weeks, days, hours, minutes, seconds = (int(g) if g and g.isdigit() else 0 for g in match.groups())
+    return datetime.timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def parse_ics(text):
+    """Parse VEVENTs of an iCalendar file; all-day events are skipped"""
+    lines = _unfold_ics(text)
+    if not lines or lines[0].upper() != 'BEGIN:VCALENDAR':
+        raise ImportFileError('Not an iCalendar file')
+
+    rows = []
+    event = None
+    for line_number, line in enumerate(lines, start=1):
+        name_part, _, value = line.partition(':')
+        name, *param_parts = name_part.split(';')
+        name = name.upper()
+        params = dict(part.split('=', 1) for part in param_parts if '=' in part)
+
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event = {'line': line_number}
+        elif name == 'END' and value.upper() == 'VEVENT' and event is not None:
+            event, finished = None, event
+            if finished.get('DTSTART') is None:
+                continue
+            row = ImportRow(line=finished['line'], start_time=finished['DTSTART'])
+            try:
+                row.end_time = finished.get('DTEND')
+                if row.end_time is None and 'DURATION' in finished:
+                    row.end_time = row.start_time + _parse_ics_duration(finished['DURATION'])
+                if row.end_time is None:
+                    raise ValueError('Event has no end')
+            except ValueError as exc:
+                row.errors.append(str(exc))
+            row.task_ref = finished.get('CATEGORIES', '') or finished.get('SUMMARY', '')
+            row.description = finished.get('SUMMARY', '')
+            if finished.get('DESCRIPTION'):
+                row.description = f"{row.description}\n{finished['DESCRIPTION']}".strip()
+            rows.append(row)
+        elif event is not None:
+            if name in ('DTSTART', 'DTEND'):
+                try:
+                    event[name] = _parse_ics_datetime(value, params)
+                except ValueError:
+                    event[name] = None
+            elif name in ('SUMMARY', 'DESCRIPTION', 'CATEGORIES', 'DURATION'):
+                event[name] = _unescape_ics(value).strip()
+    return rows
+
+
+def parse_file(name, content):
+    """Parse uploaded bytes based on the file extension"""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig', errors='replace')
+    if name.lower().endswith(('.ics', '.ical', '.ifb')):
+        return parse_ics(content)
+    return parse_csv(content)
+
+
+# ==================== MAPPING ====================
+
+class TaskMatcher:
+    """Maps task references to the user's tasks using rules and names
+
+    ``rules`` is a list of ``{"pattern": <regex>, "task_id": <id>}`` that is
+    tried first against the task reference and description. After that the
+    reference is matched against "client > project > task",
+    "project > task" and finally the bare task name (if unique).
+    """
+
+    def __init__(self, user, rules=None, default_task_id=None):
+        tasks = Task.objects.filter(user=user).select_related('project__client')
+        self.tasks = {task.id: task for task in tasks}
+        self.by_path = {}
+        task_names = {}
+        for task in self.tasks.values():
+            project = task.project
+            self.by_path[self._key(project.client.name, project.name, task.name)] = task
+            self.by_path.setdefault(self._key(project.name, task.name), task)
+            task_names.setdefault(self._key(task.name), []).append(task)
+        for key, candidates in task_names.items():
+            if len(candidates) == 1:
+                self.by_path.setdefault(key, candidates[0])
+
+        if rules is not None and not isinstance(rules, list):
+            raise ImportFileError('Rules must be a list')
+        self.rules = [self._rule(number, rule) for number, rule in enumerate(rules or [], 1)]
+        self.default_task = self.tasks.get(int(default_task_id)) if default_task_id else None
+
+    def _rule(self, number, rule):
+        """``(compiled pattern, task)`` for a rule, raising ``ImportFileError`` naming an invalid one"""
+        if not isinstance(rule, dict) or not isinstance(rule.get('pattern'), str) or not rule['pattern']:
+            raise ImportFileError(f"Rule {number} needs a \"pattern\" and a \"task_id\"")
+        try:
+            task = self.tasks.get(int(rule.get('task_id') or 0))
+        except (TypeError, ValueError):
+            task = None
+        if task is None:
+            raise ImportFileError(f"Rule {number} refers to unknown task {rule.get('task_id')}")
+        try:
+            return re.compile(rule['pattern'], re.IGNORECASE), task
+        except re.error as exc:
+            raise ImportFileError(f"Rule {number} has an invalid pattern {rule['pattern']!r}: {exc}")
+
+    @staticmethod
+    def _key(*parts):
+        return ' > '.join(part.strip().lower() for part in parts)
+
+    def match(self, row):
+        haystack = f"{row.task_ref}\n{row.description}"
+        for pattern, task in self.rules:
+            if pattern.search(haystack):
+                return task
+        if row.task_ref:
+            parts = [part for part in re.split(r'\s*[>|]\s*', row.task_ref) if part]
+            for size in range(len(parts), 0, -1):
+                task = self.by_path.get(self._key(*parts[-size:]))
+                if task:
+                    return task
+        return self.default_task
+
+
+# ==================== VALIDATION & INSERT ====================
+
+def find_overlaps(user, rows):
+    """Flag rows overlapping existing entries or each other"""
+    candidates = sorted((row for row in rows if not row.errors), key=lambda r: r.start_time)
+    if not candidates:
+        return
+
+    now = timezone.now()
+    existing = [
+        (start, end or now)
+        for start, end in intervals.entries_overlapping(
+            user, candidates[0].start_time, max(row.end_time for row in candidates)
+        ).order_by('start_time').values_list('start_time', 'end_time')
+    ]
+
+    # Sweep over existing entries and rows together, both sorted by start
+    index = 0
+    previous = None
+    for row in candidates:
+        while index < len(existing) and existing[index][1] <= row.start_time:
+            index += 1
+        probe = index
+        while probe < len(existing) and existing[probe][0] < row.end_time:
+            if existing[probe][1] > row.start_time:
+                row.errors.append(f"Overlaps existing entry {existing[probe][0]:%Y-%m-%d %H:%M}")
+                break
+            probe += 1
+        if previous is not None and row.start_time < previous.end_time:
+            row.errors.append(f"Overlaps line {previous.line}")
+        if previous is None or row.end_time > previous.end_time:
+            previous = row
+
+
+def validate_rows(user, rows, matcher):
+    for row in rows:
+        if row.errors:
+            continue
+        if row.end_time <= row.start_time:
+            row.errors.append('End time must be after start time')
+        row.task = matcher.match(row)
+        if row.task is None:
+            row.errors.append(f"No task matches '{row.task_ref}'")
+    find_overlaps(user, rows)
+
+
+def import_rows(user, rows, matcher, dry_run=False, allow_partial=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate and insert rows; returns a JSON-serializable report"""
+    validate_rows(user, rows, matcher)
+    valid = [row for row in rows if not row.errors]
+    invalid = [row for row in rows if row.errors]
+
+    report = {
+        'dry_run': dry_run,
+        'total': len(rows),
+        'valid': len(valid),
+        'invalid': len(invalid),
+        'created': 0,
+        'errors': [{'line': row.line, 'errors': row.errors} for row in invalid],
+        'preview': [row.as_preview() for row in rows[:PREVIEW_SIZE]],
+    }
+    if dry_run or not valid or (invalid and not allow_partial):
+        return report
+
+    with transaction.atomic():
+        for offset in range(0, len(valid), batch_size):
+            entries = TimeEntry.objects.bulk_create([
+                TimeEntry(
+                    user=user,
+                    task=row.task,
+                    start_time=row.start_time,
+                    end_time=row.end_time,
+                    description=row.description,
+                    is_billable=row.is_billable,
+                )
+                for row in valid[offset:offset + batch_size]
+            ])
+            # bulk_create bypasses the signals that maintain the rollups
+            rollups.apply_entries(entries)
+    report['created'] = len(valid)
+    return report
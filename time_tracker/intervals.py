@@ -0,0 +1,166 @@
+"""
+Interval-aware queries over time entries.
+
+Entries are treated as half-open intervals ``[start_time, end_time)``; an
+entry without ``end_time`` is still running and extends to "now". All
+lookups use plain range predicates on ``start_time``/``end_time`` so they can
+use the ``(user, start_time)`` and ``(user, end_time)`` indexes, unlike
+``start_time__date`` lookups which also miss entries spanning midnight.
+"""
+
+import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TimeEntry
+
+WORKDAY_START = datetime.time(9, 0)
+WORKDAY_END = datetime.time(17, 0)
+WORKING_WEEKDAYS = (0, 1, 2, 3, 4)  # Monday - Friday
+
+
+def overlap_q(start, end):
+    """Q matching entries that intersect ``[start, end)``"""
+    return Q(start_time__lt=end) & (Q(end_time__gt=start) | Q(end_time__isnull=True))
+
+
+def entries_overlapping(user, start, end, queryset=None):
+    """Live entries of a user that intersect ``[start, end)``"""
+    if queryset is None:
+        queryset = TimeEntry.objects.filter(user=user, is_deleted=False)
+    return queryset.filter(overlap_q(start, end))
+
+
+def find_conflict(user, start, end, exclude_id=None):
+    """First entry overlapping ``[start, end)`` or None
+
+    ``end`` may be None for a running entry, which conflicts with everything
+    that ends after ``start``.
+    """
+    if end is None:
+        conflicts = TimeEntry.objects.filter(user=user, is_deleted=False).filter(
+            Q(end_time__gt=start) | Q(end_time__isnull=True)
+        )
+    else:
+        conflicts = entries_overlapping(user, start, end)
+    if exclude_id:
+        conflicts = conflicts.exclude(id=exclude_id)
+    return conflicts.order_by('start_time').first()
+
+
+def day_bounds(day):
+    """Aware datetimes for the start of ``day`` and of the following day"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min), tz)
+    end = timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min), tz)
+    return start, end
+
+
+def range_bounds(date_from, date_to):
+    """Aware ``[start, end)`` covering whole days ``date_from`` .. ``date_to``"""
+    return day_bounds(date_from)[0], day_bounds(date_to)[1]
+
+
+def split_by_day(start, end, window_start, window_end):
+    """Yield ``(day, segment_start, segment_end)`` pieces of an interval clipped to a window"""
+    start = max(start, window_start)
+    end = min(end, window_end)
+    tz = timezone.get_current_timezone()
+    while start < end:
+        day = timezone.localtime(start, tz).date()
+        next_day = day_bounds(day)[1]
+        segment_end = min(end, next_day)
+        yield day, start, segment_end
+        start = segment_end
+
+
+def timeline(user, date_from, date_to):
+    """Entries intersecting the given days, split into per-day segments"""
+    window_start, window_end = range_bounds(date_from, date_to)
+    now = timezone.now()
+    entries = entries_overlapping(user, window_start, window_end).select_related(
+        'task__project__client'
+    ).order_by('start_time')
+
+    days = {}
+    day = date_from
+    while day <= date_to:
+        days[day] = []
+        day += datetime.timedelta(days=1)
+
+    for entry in entries:
+        end = entry.end_time or now
+        for day, segment_start, segment_end in split_by_day(entry.start_time, end, window_start, window_end):
+            local_start = timezone.localtime(segment_start)
+            days[day].append({
+                'id': entry.id,
+                'task_name': entry.task.name,
+                'project_name': entry.task.project.name,
+                'client_name': entry.task.project.client.name,
+                'start_hour': local_start.hour + local_start.minute / 60 + local_start.second / 3600,
+                'duration_hours': (segment_end - segment_start).total_seconds() / 3600,
+                'color': entry.task.project.color,
+                'description': entry.description,
+                'is_billable': entry.is_billable,
+                'is_running': entry.end_time is None,
+            })
+    return days
+
+
+def merge_intervals(intervals):
+    """Merge overlapping ``(start, end)`` pairs; input must be sorted by start"""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def find_gaps(user, date_from, date_to, work_start=WORKDAY_START, work_end=WORKDAY_END,
+              weekdays=WORKING_WEEKDAYS, min_minutes=15):
+    """Untracked stretches inside working hours between two dates (inclusive)
+
+    Loads the entries of the whole range with one query and sweeps over them
+    day by day, so a year of entries is handled in a single pass.
+    """
+    window_start, window_end = range_bounds(date_from, date_to)
+    now = timezone.now()
+    busy = merge_intervals(
+        (start, end or now)
+        for start, end in entries_overlapping(user, window_start, window_end)
+        .order_by('start_time').values_list('start_time', 'end_time')
+    )
+
+    tz = timezone.get_current_timezone()
+    min_gap = datetime.timedelta(minutes=min_minutes)
+    gaps = []
+    index = 0
+    day = date_from
+    while day <= date_to:
+        if day.weekday() in weekdays:
+            cursor = timezone.make_aware(datetime.datetime.combine(day, work_start), tz)
+            day_end = timezone.make_aware(datetime.datetime.combine(day, work_end), tz)
+            while index < len(busy) and busy[index][1] <= cursor:
+                index += 1
+            probe = index
+            while cursor < day_end:
+                if probe < len(busy) and busy[probe][0] < day_end:
+                    gap_end = min(busy[probe][0], day_end)
+                    next_cursor = busy[probe][1]
+                    probe += 1
+                else:
+                    gap_end = day_end
+                    next_cursor = day_end
+                if gap_end - cursor >= min_gap:
+                    gaps.append({
+                        'date': day.isoformat(),
+                        'start': cursor.isoformat(),
+                        'end': gap_end.isoformat(),
+                        'minutes': int((gap_end - cursor).total_seconds() // 60),
+                    })
+                cursor = max(cursor, next_cursor)
+        day += datetime.timedelta(days=1)
+    return gaps
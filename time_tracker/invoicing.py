@@ -0,0 +1,218 @@
+"""
+Invoice generation for billable time entries.
+
+An invoice covers the unbilled, billable and finished entries of one client
+within a period. Entries are loaded with a single query, grouped into one
+line per task and applicable rate, and marked as billed with a single UPDATE
+inside the same transaction. The PDF is rendered afterwards by the background
+worker.
+"""
+
+import calendar
+import datetime
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from overhead import background
+
+from . import archive
+from .models import ArchivedTimeEntry, Client, Invoice, InvoiceLine, TimeEntry
+from .pdf import SimplePDF, MARGIN
+from .rates import RateResolver
+
+CENT = Decimal('0.01')
+
+
+class InvoiceError(Exception):
+    """Raised when an invoice cannot be created"""
+
+
+def month_period(year, month):
+    """Return the first and last day of a month"""
+    last_day = calendar.monthrange(year, month)[1]
+    return datetime.date(year, month, 1), datetime.date(year, month, last_day)
+
+
+def _period_bounds(period_start, period_end):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.datetime.combine(period_start, datetime.time.min), tz)
+    end = timezone.make_aware(datetime.datetime.combine(period_end + datetime.timedelta(days=1), datetime.time.min), tz)
+    return start, end
+
+
+def billable_entries(client, period_start, period_end):
+    """Unbilled billable entries of a client whose start falls into the period"""
+    start, end = _period_bounds(period_start, period_end)
+    return TimeEntry.objects.filter(
+        user=client.user,
+        task__project__client=client,
+        is_billable=True,
+        is_billed=False,
+        is_deleted=False,
+        end_time__isnull=False,
+        start_time__gte=start,
+        start_time__lt=end,
+    )
+
+
+def group_entries(entries, resolver):
+    """Group entries into invoice lines, one per task and applicable rate"""
+    groups = OrderedDict()
+    for entry in sorted(entries, key=lambda e: (e.task.project.name, e.task.name, e.start_time)):
+        task = entry.task
+        rate = resolver.hourly_rate(task, timezone.localtime(entry.start_time).date())
+        group = groups.setdefault((task.id, rate), {
+            'project': task.project,
+            'task': task,
+            'rate': rate,
+            'seconds': 0,
+            'entry_count': 0,
+        })
+        group['seconds'] += entry.get_duration_seconds()
+        group['entry_count'] += 1
+
+    lines = []
+    for position, group in enumerate(groups.values()):
+        project = group['project']
+        hours = (Decimal(str(group['seconds'])) / 3600).quantize(CENT, rounding=ROUND_HALF_UP)
+        rate = group['rate']
+        lines.append(InvoiceLine(
+            project=project,
+            task=group['task'],
+            description=f"{project.name} - {group['task'].name}",
+            hours=hours,
+            rate=rate,
+            amount=(hours * rate).quantize(CENT, rounding=ROUND_HALF_UP),
+            entry_count=group['entry_count'],
+            position=position,
+        ))
+    return lines
+
+
+def next_invoice_number(user, issue_date):
+    """Next sequential invoice number of the form YYYY-NNNN"""
+    prefix = f"{issue_date.year}-"
+    last = (Invoice.objects.filter(user=user, number__startswith=prefix)
+            .order_by('-number').values_list('number', flat=True).first())
+    sequence = int(last[len(prefix):]) + 1 if last else 1
+    return f"{prefix}{sequence:04d}"
+
+
+def create_invoice(client, period_start, period_end, issue_date=None, tax_rate=Decimal('0.00'), render=True):
+    """Create an invoice for a client and period and mark its entries as billed"""
+    issue_date = issue_date or datetime.date.today()
+
+    with transaction.atomic():
+        entries_qs = billable_entries(client, period_start, period_end)
+        entries = list(entries_qs.select_for_update().select_related('task__project__client'))
+        if not entries:
+            raise InvoiceError(f"No unbilled billable entries for {client.name} in this period")
+
+        lines = group_entries(entries, RateResolver(client.user))
+        invoice = Invoice.objects.create(
+            user=client.user,
+            client=client,
+            currency=client.currency,
+            number=next_invoice_number(client.user, issue_date),
+            period_start=period_start,
+            period_end=period_end,
+            issue_date=issue_date,
+            tax_rate=tax_rate,
+            total_hours=sum((line.hours for line in lines), Decimal('0.00')),
+            subtotal=sum((line.amount for line in lines), Decimal('0.00')),
+        )
+        for line in lines:
+            line.invoice = invoice
+        InvoiceLine.objects.bulk_create(lines)
+
+        billed = entries_qs.filter(id__lte=max(e.id for e in entries)).update(
+            is_billed=True,
+            invoice=invoice,
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        if billed != len(entries):
+            # Another request billed or added entries in the meantime
+            raise InvoiceError("Time entries changed while invoicing, please retry")
+
+        if render:
+            background.submit_on_commit(render_invoice_pdf, invoice.id)
+
+    return invoice
+
+
+def cancel_invoice(invoice):
+    """Cancel an invoice and release its entries for billing again"""
+    with transaction.atomic():
+        archive.restore(ArchivedTimeEntry.objects.filter(invoice=invoice))
+        TimeEntry.objects.filter(invoice=invoice).update(
+            is_billed=False,
+            invoice=None,
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        invoice.status = 'cancelled'
+        invoice.save(update_fields=['status', 'updated_at'])
+
+
+def run_batch(user, period_start, period_end, issue_date=None, tax_rate=Decimal('0.00'), clients=None):
+    """Invoice every active client of a user; returns (invoices, skipped client names)"""
+    if clients is None:
+        clients = Client.objects.filter(user=user, is_active=True)
+
+    invoices, skipped = [], []
+    for client in clients:
+        try:
+            invoices.append(create_invoice(client, period_start, period_end, issue_date, tax_rate))
+        except InvoiceError:
+            skipped.append(client.name)
+    return invoices, skipped
+
+
+def build_invoice_pdf(invoice):
+    """Render an invoice to PDF bytes"""
+    client = invoice.client
+    user = invoice.user
+    pdf = SimplePDF(title=f"Invoice {invoice.number}")
+
+    pdf.line((MARGIN, 'INVOICE'), size=20, font='bold', spacing=24)
+    pdf.line((MARGIN, user.get_full_name() or user.username), (380, f"Number: {invoice.number}"))
+    pdf.line((380, f"Date: {invoice.issue_date:%d.%m.%Y}"))
+    pdf.line((380, f"Period: {invoice.period_start:%d.%m.%Y} - {invoice.period_end:%d.%m.%Y}"))
+    pdf.skip(16)
+
+    pdf.line((MARGIN, client.company or client.name), font='bold')
+    if client.company:
+        pdf.line((MARGIN, client.name))
+    for address_line in client.address.splitlines():
+        pdf.line((MARGIN, address_line))
+    pdf.skip(24)
+
+    columns = (MARGIN, 330, 400, 480)
+    pdf.line(*zip(columns, ('Description', 'Hours', 'Rate', 'Amount')), font='bold')
+    pdf.rule()
+    for line in invoice.lines.all():
+        pdf.line(*zip(columns, (line.description[:55], f"{line.hours:.2f}", f"{line.rate:.2f}", f"{line.amount:.2f}")))
+    pdf.rule()
+
+    pdf.line((MARGIN, 'Total hours'), (330, f"{invoice.total_hours:.2f}"))
+    pdf.line((MARGIN, f"Subtotal ({invoice.currency})"), (480, f"{invoice.subtotal:.2f}"))
+    if invoice.tax_rate:
+        pdf.line((MARGIN, f"Tax {invoice.tax_rate:.2f}%"), (480, f"{invoice.get_tax_amount():.2f}"))
+    pdf.line((MARGIN, f"Total ({invoice.currency})"), (480, f"{invoice.get_total():.2f}"), font='bold')
+    return pdf.render()
+
+
+def render_invoice_pdf(invoice_id):
+    """Background job: render and store the PDF of an invoice"""
+    invoice = Invoice.objects.select_related('client', 'user').get(pk=invoice_id)
+    content = build_invoice_pdf(invoice)
+    invoice.pdf.save(f"invoice-{invoice.number}.pdf", ContentFile(content), save=False)
+    invoice.rendered_at = timezone.now()
+    invoice.save(update_fields=['pdf', 'rendered_at', 'updated_at'])
+    return invoice
@@ -0,0 +1,189 @@
+"""
+Synthetic time tracking data for benchmarks and load tests.
+
+Users, clients, projects and tasks are inserted with ``bulk_create``. Time
+entries are generated lazily, one working day at a time, and written with a
+plain ``executemany`` INSERT in large batches inside a transaction each;
+building model instances and compiling ``bulk_create`` SQL costs more than
+the insert itself at this volume. Memory stays flat however many years are
+generated. Entries of a day never overlap and stay within the day, which
+lets the generator accumulate daily rollups and project totals on the fly
+instead of re-reading every entry with ``rollups.rebuild``.
+"""
+
+import datetime
+import random
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import Client, DailyRollup, Project, Task, TimeEntry
+
+CLIENT_WORDS = ['Nordic', 'Alpine', 'Urban', 'Blue', 'Digital', 'Green', 'Bright', 'Solid', 'Rapid', 'Smart']
+CLIENT_SUFFIXES = ['Solutions', 'Systems', 'Labs', 'Partners', 'Works', 'Consulting', 'Logistics', 'Media']
+PROJECT_NAMES = ['Website Relaunch', 'Data Platform', 'Mobile App', 'CRM Migration', 'Security Audit',
+                 'Reporting Suite', 'Cloud Migration', 'Checkout Redesign', 'Search Revamp', 'API Gateway']
+TASK_NAMES = ['Analysis', 'Design', 'Implementation', 'Code Review', 'Testing', 'Deployment',
+              'Meetings', 'Documentation', 'Support', 'Project Management']
+DESCRIPTIONS = ['Working on implementation', 'Bug fixes and improvements', 'Code review and refactoring',
+                'Meeting with client', 'Documentation update', 'Testing and debugging',
+                'Feature development', 'Performance optimization']
+COLORS = ['#1E3A5F', '#2E4A7F', '#3A5F1E', '#7F2E4A', '#5F1E3A']
+DURATIONS = [15, 30, 45, 60, 90, 120, 150, 180]  # Minutes
+
+
+def _create_owners(rng, username_prefix, users, clients_per_user, projects_per_client, tasks_per_project):
+    """Create users with their clients, projects and tasks; returns ``{user: [task, ...]}``"""
+    password = make_password('loadtest')
+    existing = set(User.objects.filter(username__startswith=username_prefix).values_list('username', flat=True))
+    # Users left over from an earlier run are skipped, their data would overlap
+    names = [f"{username_prefix}{index:04d}" for index in range(1, users + 1)]
+    names = [name for name in names if name not in existing]
+    User.objects.bulk_create([User(username=name, email=f"{name}@example.com", password=password) for name in names])
+    owners = list(User.objects.filter(username__in=names).order_by('username'))
+
+    clients = []
+    for user in owners:
+        for index in range(clients_per_user):
+            name = f"{rng.choice(CLIENT_WORDS)} {rng.choice(CLIENT_SUFFIXES)} {index + 1}"
+            clients.append(Client(
+                user=user, name=name, company=name,
+                hourly_rate=Decimal(rng.randrange(80, 200, 5)),
+                color=rng.choice(COLORS),
+            ))
+    Client.objects.bulk_create(clients, batch_size=1000)
+
+    projects = []
+    for client in clients:
+        for index in range(projects_per_client):
+            projects.append(Project(
+                user_id=client.user_id, client=client,
+                name=f"{rng.choice(PROJECT_NAMES)} {index + 1}",
+                hourly_rate=Decimal(rng.randrange(90, 220, 10)) if rng.random() < 0.3 else None,
+                budget_hours=Decimal(rng.randrange(40, 800, 20)) if rng.random() < 0.7 else None,
+                color=rng.choice(COLORS),
+            ))
+    Project.objects.bulk_create(projects, batch_size=1000)
+
+    tasks = []
+    for project in projects:
+        for index in range(tasks_per_project):
+            tasks.append(Task(
+                user_id=project.user_id, project=project,
+                name=TASK_NAMES[index % len(TASK_NAMES)] + (f" {index // len(TASK_NAMES) + 1}" if index >= len(TASK_NAMES) else ''),
+                estimated_hours=Decimal(rng.randrange(4, 80)),
+            ))
+    Task.objects.bulk_create(tasks, batch_size=1000)
+
+    tasks_by_user = defaultdict(list)
+    for task in tasks:
+        tasks_by_user[task.user_id].append(task)
+    return {user: tasks_by_user[user.id] for user in owners}
+
+
+def _insert_rows(model, fields, rows):
+    """INSERT rows that already hold database values, bypassing the ORM"""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})", rows)
+
+
+ENTRY_COLUMNS = ('user', 'task', 'start_time', 'end_time', 'description', 'is_billable',
+                 'is_billed', 'is_deleted', 'version', 'created_at', 'updated_at')
+ROLLUP_COLUMNS = ('user', 'project', 'task', 'day', 'seconds', 'billable_seconds', 'entry_count')
+
+
+def _day_entries(rng, tasks, day, entries_per_day, tz):
+    """Non-overlapping ``(task, start, end, description, is_billable)`` of one working day"""
+    count = max(1, int(rng.gauss(entries_per_day, 1)))
+    cursor = timezone.make_aware(datetime.datetime.combine(day, datetime.time(8, 0)), tz)
+    day_end = timezone.make_aware(datetime.datetime.combine(day, datetime.time(20, 0)), tz)
+    for _ in range(count):
+        cursor += datetime.timedelta(minutes=rng.choice((0, 0, 15, 30)))
+        end = cursor + datetime.timedelta(minutes=rng.choice(DURATIONS))
+        if end > day_end:
+            break
+        yield rng.choice(tasks), cursor, end, rng.choice(DESCRIPTIONS), rng.random() < 0.8
+        cursor = end
+
+
+def _write_rollups(user, totals, batch_size):
+    """Store the rollups accumulated while generating one user's entries"""
+    adapt_date = connection.ops.adapt_datefield_value
+    project_seconds = defaultdict(int)
+    rows = []
+    for (task, day), (seconds, billable, count) in totals.items():
+        project_seconds[task.project_id] += seconds
+        rows.append((user.id, task.project_id, task.id, adapt_date(day), seconds, billable, count))
+    with transaction.atomic():
+        for start in range(0, len(rows), batch_size):
+            _insert_rows(DailyRollup, ROLLUP_COLUMNS, rows[start:start + batch_size])
+        for project_id, seconds in project_seconds.items():
+            Project.objects.filter(id=project_id).update(tracked_seconds=seconds)
+    rollups.evaluate_budget_alerts(project_seconds)
+    return len(rows)
+
+
+def generate(users=1, clients_per_user=5, projects_per_client=3, tasks_per_project=5, years=1,
+             entries_per_day=4, seed=None, batch_size=10000, username_prefix='loaduser', end_date=None,
+             progress=None):
+    """Generate a full data set; returns counts of created rows"""
+    rng = random.Random(seed)
+    tz = timezone.get_current_timezone()
+    end_date = end_date or datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=int(365 * years))
+
+    owners = _create_owners(rng, username_prefix, users, clients_per_user, projects_per_client, tasks_per_project)
+
+    adapt_datetime = connection.ops.adapt_datetimefield_value
+    now = adapt_datetime(timezone.now())
+    created = 0
+    rollup_count = 0
+    batch = []
+
+    def flush():
+        nonlocal created, batch
+        if batch:
+            with transaction.atomic():
+                _insert_rows(TimeEntry, ENTRY_COLUMNS, batch)
+            created += len(batch)
+            batch = []
+            if progress:
+                progress(created)
+
+    for user, tasks in owners.items():
+        if not tasks:
+            continue
+        totals = {}
+        day = start_date
+        while day <= end_date:
+            if day.weekday() < 5:
+                for task, start, end, description, is_billable in _day_entries(rng, tasks, day, entries_per_day, tz):
+                    batch.append((
+                        user.id, task.id, adapt_datetime(start), adapt_datetime(end), description,
+                        is_billable, False, False, 1, now, now,
+                    ))
+                    seconds = int((end - start).total_seconds())
+                    total = totals.setdefault((task, day), [0, 0, 0])
+                    total[0] += seconds
+                    total[1] += seconds if is_billable else 0
+                    total[2] += 1
+                    if len(batch) >= batch_size:
+                        flush()
+            day += datetime.timedelta(days=1)
+        flush()
+        rollup_count += _write_rollups(user, totals, batch_size)
+
+    return {
+        'users': len(owners),
+        'tasks': sum(len(tasks) for tasks in owners.values()),
+        'entries': created,
+        'rollups': rollup_count,
+    }
@@ -0,0 +1,19 @@
+"""Management command to move soft-deleted and old billed time entries to the archive"""
+from django.core.management.base import BaseCommand
+
+from time_tracker import archive
+
+
+class Command(BaseCommand):
+    help = 'Moves soft-deleted and long billed time entries into the archive table in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE, help='Entries moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the entries due for archival')
+
+    def handle(self, *args, **options):
+        count = archive.archive_entries(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{count} entries are due for archival')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Archived {count} entries'))
@@ -0,0 +1,109 @@
+"""Management command to benchmark the time tracker APIs at several data scales"""
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from time_tracker import loadgen
+
+ENDPOINTS = ['api_clients', 'api_projects', 'api_tasks', 'api_time_entries', 'api_statistics', 'api_timeline']
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database at several scales, measures wall time and SQL queries '
+            'of the time tracker APIs and fails when query counts grow with the data size')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1,4,16',
+                            help='Comma separated scale factors (clients = 2 x scale, years of entries = scale / 4)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per endpoint')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the generated data')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            scales = sorted({int(scale) for scale in options['scales'].split(',')})
+        except ValueError:
+            raise CommandError('--scales must be a comma separated list of integers')
+        if len(scales) < 2:
+            raise CommandError('At least two scales are needed to detect growing query counts')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = [self.run_scale(scale, options) for scale in scales]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        regressions = []
+        for endpoint in ENDPOINTS:
+            counts = [result['endpoints'][endpoint]['queries'] for result in results]
+            if counts[-1] > counts[0]:
+                regressions.append({'endpoint': endpoint, 'queries': dict(zip(scales, counts))})
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'scales': results,
+            'regressions': regressions,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if regressions:
+            names = ', '.join(regression['endpoint'] for regression in regressions)
+            raise CommandError(f'Query count grows with data size for: {names}')
+        self.stderr.write(self.style.SUCCESS('Query counts are independent of data size'))
+
+    def run_scale(self, scale, options):
+        started = time.monotonic()
+        stats = loadgen.generate(
+            users=1,
+            clients_per_user=2 * scale,
+            projects_per_client=2,
+            tasks_per_project=3,
+            years=scale / 4,
+            seed=options['seed'],
+            username_prefix=f'bench{scale}-',
+        )
+        seed_seconds = time.monotonic() - started
+        self.stderr.write(f"scale {scale}: {stats['entries']} entries seeded in {seed_seconds:.1f}s")
+
+        client = Client()
+        client.force_login(django.contrib.auth.get_user_model().objects.get(username=f'bench{scale}-0001'))
+        endpoints = {}
+        for name in ENDPOINTS:
+            url = reverse(f'time_tracker:{name}')
+            client.get(url)  # Warm up caches and lazy imports
+            timings = []
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as queries:
+                    request_started = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - request_started) * 1000)
+            endpoints[name] = {
+                'status': response.status_code,
+                'queries': len(queries),
+                'median_ms': round(statistics.median(timings), 2),
+                'min_ms': round(min(timings), 2),
+                'max_ms': round(max(timings), 2),
+            }
+            self.stderr.write(f"  {name}: {len(queries)} queries, {endpoints[name]['median_ms']} ms")
+
+        return {'scale': scale, 'seed_seconds': round(seed_seconds, 2), **stats, 'endpoints': endpoints}
@@ -1,16 +1,61 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
 from time_tracker.models import Client, Project, Task, TimeEntry
+from time_tracker import loadgen
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import timedelta
 from decimal import Decimal
 import random
+import time
 
 
 class Command(BaseCommand):
-    help = 'Creates test data for time tracker'
+    help = 'Creates test data for time tracker (pass --users to generate load test data)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, help='Generate load test data for this many users')
+        parser.add_argument('--clients', type=int, default=5, help='Clients per user')
+        parser.add_argument('--projects', type=int, default=3, help='Projects per client')
+        parser.add_argument('--tasks', type=int, default=5, help='Tasks per project')
+        parser.add_argument('--years', type=float, default=1, help='Years of time entries per user')
+        parser.add_argument('--entries-per-day', type=int, default=4, help='Average entries per working day')
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible data')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert')
+        parser.add_argument('--prefix', default='loaduser', help='Username prefix of generated users')
 
     def handle(self, *args, **options):
+        if options['users'] is not None:
+            return self.generate_load(options)
+        self.create_demo_data()
+
+    def generate_load(self, options):
+        if options['users'] < 1 or options['years'] <= 0:
+            raise CommandError('--users and --years must be positive')
+        started = time.monotonic()
+
+        def progress(count):
+            self.stdout.write(f'{count} entries ({count / (time.monotonic() - started):.0f}/s)')
+
+        stats = loadgen.generate(
+            users=options['users'],
+            clients_per_user=options['clients'],
+            projects_per_client=options['projects'],
+            tasks_per_project=options['tasks'],
+            years=options['years'],
+            entries_per_day=options['entries_per_day'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            username_prefix=options['prefix'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['users']} users, {stats['tasks']} tasks, {stats['entries']} time entries "
+            f"and {stats['rollups']} daily rollups in {time.monotonic() - started:.1f}s"
+        ))
+        if stats['users'] < options['users']:
+            self.stdout.write(f"Skipped {options['users'] - stats['users']} existing '{options['prefix']}' users")
+
+    def create_demo_data(self):
         # Get or create a test user
         user, created = User.objects.get_or_create(
             username='admin',
@@ -0,0 +1,54 @@
+"""Management command for month-end invoicing"""
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from overhead import background
+from time_tracker import invoicing
+
+
+class Command(BaseCommand):
+    help = 'Generates invoices for all active clients from unbilled billable time entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Billing month as YYYY-MM (default: previous month)')
+        parser.add_argument('--user', help='Only invoice clients of this username')
+        parser.add_argument('--tax-rate', default='0.00', help='Tax rate in percent')
+        parser.add_argument('--issue-date', help='Issue date as YYYY-MM-DD (default: today)')
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                year, month = (int(part) for part in options['month'].split('-'))
+            except ValueError:
+                raise CommandError('--month must be given as YYYY-MM')
+        else:
+            last_month = datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
+            year, month = last_month.year, last_month.month
+        period_start, period_end = invoicing.month_period(year, month)
+
+        issue_date = datetime.date.fromisoformat(options['issue_date']) if options['issue_date'] else None
+        users = User.objects.filter(clients__is_active=True).distinct()
+        if options['user']:
+            users = users.filter(username=options['user'])
+
+        total = 0
+        for user in users:
+            invoices, skipped = invoicing.run_batch(
+                user, period_start, period_end,
+                issue_date=issue_date,
+                tax_rate=Decimal(options['tax_rate']),
+            )
+            total += len(invoices)
+            for invoice in invoices:
+                self.stdout.write(f'{user.username}: {invoice.number} {invoice.client.name} {invoice.get_total():.2f}')
+            for name in skipped:
+                self.stdout.write(f'{user.username}: nothing to bill for {name}')
+
+        # Wait for the PDFs to be rendered before the process exits
+        background.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {total} invoices for {period_start:%Y-%m-%d} - {period_end:%Y-%m-%d}'
+        ))
@@ -0,0 +1,53 @@
+"""Management command to import time entries from CSV or iCalendar files"""
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from time_tracker import importers
+
+
+class Command(BaseCommand):
+    help = 'Imports time entries for a user from a CSV or iCalendar (.ics) file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or .ics file to import')
+        parser.add_argument('--user', required=True, help='Username to import the entries for')
+        parser.add_argument('--rules', help='JSON file with [{"pattern": ..., "task_id": ...}] mapping rules')
+        parser.add_argument('--default-task', type=int, help='Task ID for rows no rule or name matches')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and preview without writing')
+        parser.add_argument('--allow-partial', action='store_true', help='Import valid rows even if others fail')
+        parser.add_argument('--batch-size', type=int, default=importers.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']}")
+
+        rules = []
+        if options['rules']:
+            with open(options['rules']) as f:
+                rules = json.load(f)
+
+        with open(options['path'], 'rb') as f:
+            content = f.read()
+        try:
+            rows = importers.parse_file(options['path'], content)
+            matcher = importers.TaskMatcher(user, rules, options['default_task'])
+        except importers.ImportFileError as e:
+            raise CommandError(str(e))
+
+        report = importers.import_rows(
+            user, rows, matcher,
+            dry_run=options['dry_run'],
+            allow_partial=options['allow_partial'],
+            batch_size=options['batch_size'],
+        )
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {'; '.join(error['errors'])}"))
+
+        summary = f"{report['valid']} of {report['total']} rows valid, {report['created']} entries created"
+        if options['dry_run']:
+            summary += ' (dry run)'
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,23 @@
+"""Management command to rebuild daily rollups from time entries"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from time_tracker import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes daily rollups, project totals and budget alerts from time entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild for this username')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']}")
+
+        count = rollups.rebuild(user)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily rollups'))
@@ -0,0 +1,15 @@
+"""Management command to stop forgotten timers and close open time entries"""
+from django.core.management.base import BaseCommand
+
+from time_tracker import idle
+
+
+class Command(BaseCommand):
+    help = 'Caps or splits timers and open time entries running longer than the configured threshold'
+
+    def handle(self, *args, **options):
+        summary = idle.reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stopped {summary['timers']} timers, closed {summary['entries']} open entries, "
+            f"sent {summary['notified']} notifications"
+        ))
@@ -0,0 +1,28 @@
+"""Management command to run the in-process scheduler"""
+from django.core.management.base import BaseCommand
+
+from overhead import background, scheduler
+
+
+class Command(BaseCommand):
+    help = 'Runs registered periodic jobs (timesheet reports, timer reconciliation) until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run all jobs once and exit')
+        parser.add_argument('--tick', type=int, help='Seconds between checks for due jobs')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            names = scheduler.run_pending()
+            # Let queued deliveries finish before the process exits
+            background.shutdown(wait=True)
+            self.stdout.write(self.style.SUCCESS(f"Ran {', '.join(names) or 'no jobs'}"))
+            return
+
+        self.stdout.write(f"Scheduler running: {', '.join(job.name for job in scheduler.jobs())}")
+        try:
+            scheduler.run(options['tick'])
+        except KeyboardInterrupt:
+            scheduler.stop()
+        background.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS('Scheduler stopped'))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:11
+
+import datetime
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_tracker', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.CharField(max_length=50)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('issue_date', models.DateField(default=datetime.date.today)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('issued', 'Issued'), ('paid', 'Paid'), ('cancelled', 'Cancelled')], default='issued', max_length=20)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Tax rate in percent', max_digits=5, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('pdf', models.FileField(blank=True, null=True, upload_to='invoices/%Y/%m/')),
+                ('rendered_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='time_tracker.client')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoices', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'time_tracker_invoices',
+                'ordering': ['-issue_date', '-number'],
+                'unique_together': {('user', 'number')},
+            },
+        ),
+        migrations.AddField(
+            model_name='timeentry',
+            name='invoice',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='time_entries', to='time_tracker.invoice'),
+        ),
+        migrations.CreateModel(
+            name='InvoiceLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=500)),
+                ('hours', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('entry_count', models.IntegerField(default=0)),
+                ('position', models.IntegerField(default=0)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='time_tracker.invoice')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoice_lines', to='time_tracker.project')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoice_lines', to='time_tracker.task')),
+            ],
+            options={
+                'db_table': 'time_tracker_invoice_lines',
+                'ordering': ['position'],
+            },
+        ),
+    ]
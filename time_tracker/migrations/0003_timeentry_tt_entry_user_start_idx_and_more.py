@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_tracker', '0002_invoice_timeentry_invoice_invoiceline'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['user', 'start_time'], name='tt_entry_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['user', 'end_time'], name='tt_entry_user_end_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_tracker', '0003_timeentry_tt_entry_user_start_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='tracked_seconds',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BudgetAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('threshold', models.IntegerField()),
+                ('hours_at_crossing', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('is_acknowledged', models.BooleanField(default=False)),
+                ('crossed_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_alerts', to='time_tracker.project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'time_tracker_budget_alerts',
+                'ordering': ['-crossed_at'],
+                'unique_together': {('project', 'threshold')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('seconds', models.BigIntegerField(default=0)),
+                ('billable_seconds', models.BigIntegerField(default=0)),
+                ('entry_count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='time_tracker.project')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='time_tracker.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'time_tracker_daily_rollups',
+                'ordering': ['day'],
+                'indexes': [models.Index(fields=['project', 'day'], name='tt_rollup_project_day_idx'), models.Index(fields=['user', 'day'], name='tt_rollup_user_day_idx')],
+                'unique_together': {('task', 'day')},
+            },
+        ),
+    ]
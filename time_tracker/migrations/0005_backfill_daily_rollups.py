@@ -0,0 +1,69 @@
+import datetime
+from collections import defaultdict
+
+from django.db import migrations
+from django.utils import timezone
+
+
+# Frozen copy of rollups.contribution as of this migration, so later changes
+# to the app code cannot change what the backfill computes
+def contribution(task_id, start, end, is_billable):
+    """Map ``(task_id, day) -> [seconds, billable_seconds, entry_count]`` for a finished entry"""
+    result = {}
+    if end <= start:
+        return result
+    tz = timezone.get_current_timezone()
+    first = True
+    while start < end:
+        local = timezone.localtime(start, tz)
+        next_midnight = timezone.make_aware(
+            datetime.datetime.combine(local.date() + datetime.timedelta(days=1), datetime.time.min), tz
+        )
+        segment_end = min(end, next_midnight)
+        seconds = int(round((segment_end - start).total_seconds()))
+        result[(task_id, local.date())] = [seconds, seconds if is_billable else 0, 1 if first else 0]
+        first = False
+        start = segment_end
+    return result
+
+
+def backfill_rollups(apps, schema_editor):
+    TimeEntry = apps.get_model('time_tracker', 'TimeEntry')
+    Task = apps.get_model('time_tracker', 'Task')
+    Project = apps.get_model('time_tracker', 'Project')
+    DailyRollup = apps.get_model('time_tracker', 'DailyRollup')
+
+    tasks = {task_id: (user_id, project_id) for task_id, user_id, project_id in Task.objects.values_list('id', 'user_id', 'project_id')}
+    totals = defaultdict(lambda: [0, 0, 0])
+    entries = TimeEntry.objects.filter(is_deleted=False, end_time__isnull=False).values_list(
+        'task_id', 'start_time', 'end_time', 'is_billable'
+    )
+    for task_id, start, end, is_billable in entries.iterator():
+        for key, values in contribution(task_id, start, end, is_billable).items():
+            total = totals[key]
+            for i, value in enumerate(values):
+                total[i] += value
+
+    project_seconds = defaultdict(int)
+    rollups = []
+    for (task_id, day), (seconds, billable, count) in totals.items():
+        user_id, project_id = tasks[task_id]
+        project_seconds[project_id] += seconds
+        rollups.append(DailyRollup(
+            user_id=user_id, project_id=project_id, task_id=task_id, day=day,
+            seconds=seconds, billable_seconds=billable, entry_count=count,
+        ))
+    DailyRollup.objects.bulk_create(rollups, batch_size=2000)
+    for project_id, seconds in project_seconds.items():
+        Project.objects.filter(id=project_id).update(tracked_seconds=seconds)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_tracker', '0004_project_tracked_seconds_budgetalert_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
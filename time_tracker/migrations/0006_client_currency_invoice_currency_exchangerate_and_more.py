@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:18
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_tracker', '0005_backfill_daily_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='currency',
+            field=models.CharField(default='EUR', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='currency',
+            field=models.CharField(default='EUR', max_length=3),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base', models.CharField(max_length=3)),
+                ('quote', models.CharField(max_length=3)),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+                ('date', models.DateField()),
+            ],
+            options={
+                'db_table': 'time_tracker_exchange_rates',
+                'ordering': ['-date'],
+                'unique_together': {('base', 'quote', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RateSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hourly_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('daily_rate', models.DecimalField(blank=True, decimal_places=2, help_text='Used when no hourly rate is set (8 hours)', max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))])),
+                ('valid_from', models.DateField()),
+                ('valid_to', models.DateField(blank=True, help_text='Inclusive; empty means open-ended', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rate_schedules', to='time_tracker.client')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rate_schedules', to='time_tracker.project')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rate_schedules', to='time_tracker.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_schedules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'time_tracker_rate_schedules',
+                'ordering': ['valid_from'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_tracker', '0006_client_currency_invoice_currency_exchangerate_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimerOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('action', models.CharField(choices=[('start', 'Start'), ('stop', 'Stop')], max_length=10)),
+                ('status_code', models.PositiveSmallIntegerField(default=200)),
+                ('response', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timer_operations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'time_tracker_timer_operations',
+                'unique_together': {('user', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_tracker', '0007_timeroperation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeentry',
+            name='client_uuid',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='timeentry',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['user', 'updated_at'], name='tt_entry_user_updated_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timeentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_uuid__isnull', False)), fields=('user', 'client_uuid'), name='tt_entry_user_client_uuid_uniq'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:28
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_tracker', '0008_entry_sync_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackerNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('idle_timer', 'Idle timer'), ('open_entry', 'Open time entry')], max_length=20)),
+                ('message', models.TextField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'time_tracker_notifications',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrackerSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_timer_hours', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, validators=[django.core.validators.MinValueValidator(Decimal('0.25'))])),
+                ('idle_action', models.CharField(choices=[('cap', 'Stop at the maximum duration'), ('split', 'Split at midnight, capping each day'), ('notify', 'Only notify')], default='cap', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'time_tracker_settings',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(condition=models.Q(('end_time__isnull', True), ('is_deleted', False)), fields=['start_time'], name='tt_entry_open_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timer',
+            index=models.Index(fields=['start_time'], name='tt_timer_start_idx'),
+        ),
+        migrations.AddField(
+            model_name='trackernotification',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_tracker_notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='trackersettings',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='time_tracker_settings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='trackernotification',
+            index=models.Index(fields=['user', 'is_read'], name='tt_notification_user_read_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_app', '0001_initial'),
+        ('time_tracker', '0009_idle_reconciliation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('weekly', 'Weekly (previous Monday to Sunday)'), ('monthly', 'Monthly (previous calendar month)')], default='weekly', max_length=10)),
+                ('recipients', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('next_run_at', models.DateTimeField()),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='report_schedules', to='time_tracker.client')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_schedules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'time_tracker_report_schedules',
+                'ordering': ['next_run_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('html_file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='storage_app.storagefile')),
+                ('pdf_file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='storage_app.storagefile')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='time_tracker.reportschedule')),
+            ],
+            options={
+                'db_table': 'time_tracker_report_deliveries',
+                'ordering': ['-period_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reportschedule',
+            index=models.Index(fields=['is_active', 'next_run_at'], name='tt_schedule_due_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reportdelivery',
+            unique_together={('schedule', 'period_start')},
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_tracker', '0010_report_schedules'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTimeEntry',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('description', models.TextField(blank=True)),
+                ('is_billable', models.BooleanField(default=True)),
+                ('is_billed', models.BooleanField(default=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('client_uuid', models.CharField(blank=True, max_length=64, null=True)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'time_tracker_archived_entries',
+                'ordering': ['-start_time'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='timeentry',
+            name='tt_entry_user_start_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='timeentry',
+            name='tt_entry_user_end_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'start_time'], name='tt_entry_live_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'end_time'], name='tt_entry_live_user_end_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedtimeentry',
+            name='invoice',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_time_entries', to='time_tracker.invoice'),
+        ),
+        migrations.AddField(
+            model_name='archivedtimeentry',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_time_entries', to='time_tracker.task'),
+        ),
+        migrations.AddField(
+            model_name='archivedtimeentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_time_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtimeentry',
+            index=models.Index(fields=['user', 'start_time'], name='tt_archived_user_start_idx'),
+        ),
+    ]
@@ -1,10 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
 import datetime
 
+HOURS_PER_DAY = Decimal('8')  # Basis for converting daily rates
+
 
 class Client(models.Model):
     """Client/Customer model"""
@@ -20,6 +22,7 @@ class Client(models.Model):
         default=Decimal('100.00'),
         validators=[MinValueValidator(Decimal('0.00'))]
     )
+    currency = models.CharField(max_length=3, default='EUR')
     color = models.CharField(max_length=7, default='#1E3A5F')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -34,17 +37,13 @@ class Client(models.Model):
     
     def get_total_hours(self):
         """Get total hours worked for this client"""
-        total = 0
-        for project in self.projects.all():
-            total += project.get_total_hours()
-        return total
+        from .totals import total_hours
+        return total_hours(self.user_id, 'client', [self.id]).get(self.id, 0)
     
     def get_total_revenue(self):
-        """Get total revenue for this client"""
-        total = Decimal('0.00')
-        for project in self.projects.all():
-            total += project.get_total_revenue()
-        return total
+        """Get total revenue for this client in the client's currency"""
+        from .totals import total_revenue
+        return total_revenue(self.user_id, 'client', {self.id: self.currency}).get(self.id, Decimal('0.00'))
 
 
 class Project(models.Model):
@@ -85,6 +84,7 @@ class Project(models.Model):
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     color = models.CharField(max_length=7, default='#3A5F1E')
+    tracked_seconds = models.BigIntegerField(default=0)  # Maintained by rollups
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -96,29 +96,37 @@ class Project(models.Model):
         return f"{self.client.name} - {self.name}"
     
     def get_effective_hourly_rate(self):
-        """Get the effective hourly rate (project rate or client rate)"""
-        return self.hourly_rate or self.client.hourly_rate
+        """Get the current static hourly rate (project rate, daily rate or client rate)
+
+        Historical revenue is computed by ``rates.RateResolver``, which also
+        honors effective-dated rate schedules.
+        """
+        if self.hourly_rate:
+            return self.hourly_rate
+        if self.daily_rate:
+            return (self.daily_rate / HOURS_PER_DAY).quantize(Decimal('0.01'))
+        return self.client.hourly_rate
     
     def get_total_hours(self):
         """Get total hours worked on this project"""
-        total_seconds = 0
-        for task in self.tasks.all():
-            for entry in task.time_entries.filter(is_deleted=False):
-                total_seconds += entry.get_duration_seconds()
-        return total_seconds / 3600  # Convert to hours
+        from .totals import running_seconds
+        running = running_seconds(self.user_id, 'project', [self.id]).get(self.id, 0)
+        return (self.tracked_seconds + running) / 3600  # Convert to hours
     
     def get_total_revenue(self):
-        """Calculate total revenue for this project"""
-        total_hours = self.get_total_hours()
-        rate = self.get_effective_hourly_rate()
-        return Decimal(str(total_hours)) * rate
+        """Calculate total billable revenue for this project"""
+        from .totals import total_revenue
+        return total_revenue(self.user_id, 'project', {self.id: self.client.currency}).get(self.id, Decimal('0.00'))
+    
+    def get_tracked_hours(self):
+        """Get hours of finished entries from the maintained running total"""
+        return Decimal(self.tracked_seconds) / 3600
     
     def get_budget_percentage(self):
         """Get percentage of budget used"""
         if not self.budget_hours:
             return None
-        total_hours = self.get_total_hours()
-        return (Decimal(str(total_hours)) / self.budget_hours) * 100
+        return (self.get_tracked_hours() / self.budget_hours) * 100
 
 
 class Task(models.Model):
@@ -147,10 +155,8 @@ class Task(models.Model):
     
     def get_total_hours(self):
         """Get total hours worked on this task"""
-        total_seconds = 0
-        for entry in self.time_entries.filter(is_deleted=False):
-            total_seconds += entry.get_duration_seconds()
-        return total_seconds / 3600
+        from .totals import total_hours
+        return total_hours(self.user_id, 'task', [self.id]).get(self.id, 0)
 
 
 class TimeEntry(models.Model):
@@ -163,12 +169,47 @@ class TimeEntry(models.Model):
     is_billable = models.BooleanField(default=True)
     is_billed = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)  # Soft delete
+    invoice = models.ForeignKey(
+        'Invoice',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='time_entries'
+    )
+    client_uuid = models.CharField(max_length=64, null=True, blank=True)  # ID assigned by an offline client
+    version = models.PositiveIntegerField(default=1)  # Incremented on every change, for optimistic concurrency
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-start_time']
         db_table = 'time_tracker_entries'
+        indexes = [
+            # Every listing filters is_deleted=False; soft-deleted rows stay out of these indexes
+            models.Index(
+                fields=['user', 'start_time'],
+                condition=models.Q(is_deleted=False),
+                name='tt_entry_live_user_start_idx',
+            ),
+            models.Index(
+                fields=['user', 'end_time'],
+                condition=models.Q(is_deleted=False),
+                name='tt_entry_live_user_end_idx',
+            ),
+            models.Index(fields=['user', 'updated_at'], name='tt_entry_user_updated_idx'),  # Sync deltas include deletions
+            models.Index(
+                fields=['start_time'],
+                condition=models.Q(end_time__isnull=True, is_deleted=False),
+                name='tt_entry_open_start_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'client_uuid'],
+                condition=models.Q(client_uuid__isnull=False),
+                name='tt_entry_user_client_uuid_uniq',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.task.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
@@ -197,21 +238,72 @@ class TimeEntry(models.Model):
         return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
     
     def get_revenue(self):
-        """Calculate revenue for this entry"""
+        """Calculate revenue for this entry in the client's currency"""
         if not self.is_billable:
             return Decimal('0.00')
         
-        hours = Decimal(str(self.get_duration_hours()))
-        rate = self.task.project.get_effective_hourly_rate()
-        return hours * rate
+        from .rates import RateResolver
+        return RateResolver(self.user).entry_revenue(self)
+    
+    ROLLUP_FIELDS = {'task_id', 'start_time', 'end_time', 'is_billable', 'is_deleted'}
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if cls.ROLLUP_FIELDS.issubset(field_names):
+            instance._rollup_state = instance.get_rollup_state()
+        return instance
+    
+    def get_rollup_state(self):
+        """Snapshot of the fields daily rollups depend on"""
+        return (self.task_id, self.start_time, self.end_time, self.is_billable, self.is_deleted)
     
     def save(self, *args, **kwargs):
         """Override save to validate times"""
         if self.end_time and self.start_time > self.end_time:
             raise ValueError("End time must be after start time")
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at'}
         super().save(*args, **kwargs)
 
 
+class ArchivedTimeEntry(models.Model):
+    """Soft-deleted or long billed time entry moved out of the live table"""
+    id = models.BigIntegerField(primary_key=True)  # Id the entry had in time_tracker_entries
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_time_entries')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='archived_time_entries')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField(null=True, blank=True)
+    description = models.TextField(blank=True)
+    is_billable = models.BooleanField(default=True)
+    is_billed = models.BooleanField(default=False)
+    is_deleted = models.BooleanField(default=False)
+    invoice = models.ForeignKey(
+        'Invoice',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_time_entries'
+    )
+    client_uuid = models.CharField(max_length=64, null=True, blank=True)
+    version = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-start_time']
+        db_table = 'time_tracker_archived_entries'
+        indexes = [
+            models.Index(fields=['user', 'start_time'], name='tt_archived_user_start_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task_id} - {self.start_time:%Y-%m-%d %H:%M} (archived)"
+
+
 class Timer(models.Model):
     """Active timer model (one per user)"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='active_timer')
@@ -224,27 +316,36 @@ class Timer(models.Model):
     
     class Meta:
         db_table = 'time_tracker_timers'
+        indexes = [
+            models.Index(fields=['start_time'], name='tt_timer_start_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.task.name}"
     
-    def stop(self):
-        """Stop the timer and create a time entry"""
+    def stop(self, end_time=None, description=None):
+        """Stop the timer and create a time entry
+        
+        The timer row is removed with a conditional delete first; only the
+        request that actually deleted it creates the entry, so concurrent
+        stops cannot produce duplicate entries.
+        """
         if not self.is_running:
             return None
         
-        # Create time entry
-        entry = TimeEntry.objects.create(
-            user=self.user,
-            task=self.task,
-            start_time=self.start_time,
-            end_time=timezone.now(),
-            description=self.description,
-            is_billable=True
-        )
-        
-        # Delete the timer
-        self.delete()
+        with transaction.atomic():
+            deleted, _ = Timer.objects.filter(pk=self.pk, is_running=True).delete()
+            if not deleted:
+                return None
+            
+            entry = TimeEntry.objects.create(
+                user_id=self.user_id,
+                task_id=self.task_id,
+                start_time=self.start_time,
+                end_time=end_time or timezone.now(),
+                description=self.description if description is None else description,
+                is_billable=True
+            )
         
         return entry
     
@@ -259,4 +360,307 @@ class Timer(models.Model):
         hours = seconds // 3600
         minutes = (seconds % 3600) // 60
         seconds = seconds % 60
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
\ No newline at end of file
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+class TimerOperation(models.Model):
+    """Result of an idempotent timer request, replayed when a client retries"""
+    ACTION_CHOICES = [
+        ('start', 'Start'),
+        ('stop', 'Stop'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timer_operations')
+    key = models.CharField(max_length=100)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    status_code = models.PositiveSmallIntegerField(default=200)
+    response = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'time_tracker_timer_operations'
+        unique_together = ['user', 'key']
+    
+    def __str__(self):
+        return f"{self.user.username} {self.action} ({self.key})"
+
+
+class Invoice(models.Model):
+    """Invoice generated from billable time entries of one client and period"""
+    STATUS_CHOICES = [
+        ('draft', 'Draft'),
+        ('issued', 'Issued'),
+        ('paid', 'Paid'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='invoices')
+    client = models.ForeignKey(Client, on_delete=models.PROTECT, related_name='invoices')
+    number = models.CharField(max_length=50)
+    period_start = models.DateField()
+    period_end = models.DateField()
+    issue_date = models.DateField(default=datetime.date.today)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='issued')
+    currency = models.CharField(max_length=3, default='EUR')
+    total_hours = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    tax_rate = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        validators=[MinValueValidator(Decimal('0.00'))],
+        help_text="Tax rate in percent"
+    )
+    pdf = models.FileField(upload_to='invoices/%Y/%m/', null=True, blank=True)
+    rendered_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-issue_date', '-number']
+        db_table = 'time_tracker_invoices'
+        unique_together = ['user', 'number']
+    
+    def __str__(self):
+        return f"{self.number} - {self.client.name}"
+    
+    def get_tax_amount(self):
+        """Get tax amount for this invoice"""
+        return (self.subtotal * self.tax_rate / 100).quantize(Decimal('0.01'))
+    
+    def get_total(self):
+        """Get gross total including tax"""
+        return self.subtotal + self.get_tax_amount()
+
+
+class InvoiceLine(models.Model):
+    """Invoice line aggregating the entries of one task"""
+    invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='lines')
+    project = models.ForeignKey(Project, on_delete=models.PROTECT, related_name='invoice_lines')
+    task = models.ForeignKey(Task, on_delete=models.PROTECT, related_name='invoice_lines')
+    description = models.CharField(max_length=500)
+    hours = models.DecimalField(max_digits=12, decimal_places=2)
+    rate = models.DecimalField(max_digits=10, decimal_places=2)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    entry_count = models.IntegerField(default=0)
+    position = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position']
+        db_table = 'time_tracker_invoice_lines'
+    
+    def __str__(self):
+        return f"{self.invoice.number} - {self.description}"
+
+
+
+class DailyRollup(models.Model):
+    """Tracked time per task and day, maintained incrementally on entry changes"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='time_rollups')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='rollups')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='rollups')
+    day = models.DateField()
+    seconds = models.BigIntegerField(default=0)
+    billable_seconds = models.BigIntegerField(default=0)
+    entry_count = models.IntegerField(default=0)  # Entries starting on this day
+    
+    class Meta:
+        ordering = ['day']
+        db_table = 'time_tracker_daily_rollups'
+        unique_together = ['task', 'day']
+        indexes = [
+            models.Index(fields=['project', 'day'], name='tt_rollup_project_day_idx'),
+            models.Index(fields=['user', 'day'], name='tt_rollup_user_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task_id} {self.day}: {self.seconds}s"
+
+
+class BudgetAlert(models.Model):
+    """Records that a project crossed a budget threshold"""
+    THRESHOLDS = [75, 90, 100]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budget_alerts')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='budget_alerts')
+    threshold = models.IntegerField()
+    hours_at_crossing = models.DecimalField(max_digits=12, decimal_places=2)
+    is_acknowledged = models.BooleanField(default=False)
+    crossed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-crossed_at']
+        db_table = 'time_tracker_budget_alerts'
+        unique_together = ['project', 'threshold']
+    
+    def __str__(self):
+        return f"{self.project.name} reached {self.threshold}%"
+
+
+class TrackerSettings(models.Model):
+    """Per-user rules for reconciling forgotten timers"""
+    IDLE_ACTION_CHOICES = [
+        ('cap', 'Stop at the maximum duration'),
+        ('split', 'Split at midnight, capping each day'),
+        ('notify', 'Only notify'),
+    ]
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='time_tracker_settings')
+    max_timer_hours = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('0.25'))]
+    )  # None: TIME_TRACKER_IDLE_TIMER_HOURS
+    idle_action = models.CharField(max_length=10, choices=IDLE_ACTION_CHOICES, default='cap')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'time_tracker_settings'
+    
+    def __str__(self):
+        return f"{self.user.username} settings"
+
+
+class TrackerNotification(models.Model):
+    """Message for the user, e.g. about a timer that was stopped automatically"""
+    KIND_CHOICES = [
+        ('idle_timer', 'Idle timer'),
+        ('open_entry', 'Open time entry'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='time_tracker_notifications')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    message = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        db_table = 'time_tracker_notifications'
+        indexes = [
+            models.Index(fields=['user', 'is_read'], name='tt_notification_user_read_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.message}"
+
+
+class RateSchedule(models.Model):
+    """Rate valid for a date range, scoped to a client, project or task"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rate_schedules')
+    client = models.ForeignKey(Client, null=True, blank=True, on_delete=models.CASCADE, related_name='rate_schedules')
+    project = models.ForeignKey(Project, null=True, blank=True, on_delete=models.CASCADE, related_name='rate_schedules')
+    task = models.ForeignKey(Task, null=True, blank=True, on_delete=models.CASCADE, related_name='rate_schedules')
+    hourly_rate = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('0.00'))]
+    )
+    daily_rate = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('0.00'))],
+        help_text="Used when no hourly rate is set (8 hours)"
+    )
+    valid_from = models.DateField()
+    valid_to = models.DateField(null=True, blank=True, help_text="Inclusive; empty means open-ended")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['valid_from']
+        db_table = 'time_tracker_rate_schedules'
+    
+    def __str__(self):
+        scope = self.task or self.project or self.client
+        return f"{scope}: {self.get_hourly_rate()} from {self.valid_from}"
+    
+    def get_hourly_rate(self):
+        """Hourly rate, derived from the daily rate if needed"""
+        if self.hourly_rate is not None:
+            return self.hourly_rate
+        if self.daily_rate is not None:
+            return (self.daily_rate / HOURS_PER_DAY).quantize(Decimal('0.01'))
+        return None
+
+
+class ExchangeRate(models.Model):
+    """Exchange rate cache: 1 unit of base currency = rate units of quote currency"""
+    base = models.CharField(max_length=3)
+    quote = models.CharField(max_length=3)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    date = models.DateField()
+    
+    class Meta:
+        ordering = ['-date']
+        db_table = 'time_tracker_exchange_rates'
+        unique_together = ['base', 'quote', 'date']
+    
+    def __str__(self):
+        return f"{self.base}/{self.quote} {self.rate} ({self.date})"
+
+
+class ReportSchedule(models.Model):
+    """Timesheet delivered by email every week or month, for all clients or one client"""
+    FREQUENCY_CHOICES = [
+        ('weekly', 'Weekly (previous Monday to Sunday)'),
+        ('monthly', 'Monthly (previous calendar month)'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_schedules')
+    client = models.ForeignKey(Client, null=True, blank=True, on_delete=models.CASCADE, related_name='report_schedules')
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='weekly')
+    recipients = models.TextField(blank=True)  # Comma separated; empty: the user's email
+    is_active = models.BooleanField(default=True)
+    next_run_at = models.DateTimeField()
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['next_run_at']
+        db_table = 'time_tracker_report_schedules'
+        indexes = [
+            models.Index(fields=['is_active', 'next_run_at'], name='tt_schedule_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} {self.frequency} timesheet"
+    
+    def get_recipients(self):
+        recipients = [address.strip() for address in self.recipients.split(',') if address.strip()]
+        return recipients or ([self.user.email] if self.user.email else [])
+
+
+class ReportDelivery(models.Model):
+    """One rendered and sent timesheet of a schedule"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    schedule = models.ForeignKey(ReportSchedule, on_delete=models.CASCADE, related_name='deliveries')
+    period_start = models.DateField()
+    period_end = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    html_file = models.ForeignKey('storage_app.StorageFile', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    pdf_file = models.ForeignKey('storage_app.StorageFile', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-period_start']
+        db_table = 'time_tracker_report_deliveries'
+        unique_together = ['schedule', 'period_start']
+    
+    def __str__(self):
+        return f"{self.schedule} {self.period_start} ({self.status})"
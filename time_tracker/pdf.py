@@ -0,0 +1,95 @@
+"""
+Minimal PDF writer for invoices and timesheets.
+
+Produces plain text documents with the built-in Helvetica fonts, which is all
+invoices and timesheets need, without pulling in a rendering dependency.
+"""
+
+PAGE_WIDTH = 595  # A4 in points
+PAGE_HEIGHT = 842
+MARGIN = 50
+
+
+def _escape(text):
+    text = str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return text.replace('\r', '').replace('\n', ' ')
+
+
+class SimplePDF:
+    """Collects text lines page by page and serializes them to PDF bytes"""
+
+    FONTS = {'regular': 'F1', 'bold': 'F2'}
+
+    def __init__(self, title=''):
+        self.title = title
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.pages.append([])
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def text(self, x, y, value, size=10, font='regular'):
+        """Place text at an absolute position on the current page"""
+        self.pages[-1].append(
+            f"BT /{self.FONTS[font]} {size} Tf {x} {y} Td ({_escape(value)}) Tj ET"
+        )
+
+    def line(self, *columns, size=10, font='regular', spacing=None):
+        """Write a row of ``(x, text)`` columns and advance the cursor"""
+        spacing = spacing or size + 4
+        if self.y - spacing < MARGIN:
+            self.new_page()
+        self.y -= spacing
+        for x, value in columns:
+            self.text(x, self.y, value, size=size, font=font)
+
+    def rule(self):
+        """Draw a horizontal separator at the cursor"""
+        self.y -= 6
+        self.pages[-1].append(f"{MARGIN} {self.y} m {PAGE_WIDTH - MARGIN} {self.y} l S")
+
+    def skip(self, points=10):
+        self.y -= points
+
+    def render(self):
+        """Return the document as bytes"""
+        objects = []
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(None)
+        pages = add(None)
+        regular = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        bold = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        info = add(f"<< /Title ({_escape(self.title)}) /Producer (time_tracker) >>".encode('cp1252', 'replace'))
+
+        page_ids = []
+        for commands in self.pages:
+            stream = '\n'.join(commands).encode('cp1252', 'replace')
+            content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+            page_ids.append(add(
+                (f"<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                 f"/Resources << /Font << /F1 {regular} 0 R /F2 {bold} 0 R >> >> "
+                 f"/Contents {content} 0 R >>").encode()
+            ))
+
+        objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages} 0 R >>".encode()
+        kids = ' '.join(f"{pid} 0 R" for pid in page_ids)
+        objects[pages - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+        out = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        for offset in offsets:
+            out += b"%010d 00000 n \n" % offset
+        out += (f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n").encode()
+        return bytes(out)
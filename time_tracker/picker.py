@@ -0,0 +1,121 @@
+"""
+Cached task picker index.
+
+The picker lists a user's open tasks of active projects and clients as
+"client > project > task". The index is built with one query for the tasks
+and one for recent use, then cached under a per-user version that is bumped
+whenever a client, project or task changes or a timer or entry is created.
+Searching and ordering work on the cached list in memory:
+
+* every query word must match, as a prefix of a word in the display name
+  (best), as a substring, or as a subsequence of its letters (fuzzy)
+* ties are broken by when the task was last used, then alphabetically
+"""
+
+import datetime
+import re
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from . import versions
+from .models import Task, TimeEntry, Timer
+
+CACHE_TIMEOUT = 24 * 60 * 60
+RECENT_DAYS = 90
+DEFAULT_LIMIT = 50
+
+WORD_SPLIT = re.compile(r'[\s>/\-_.]+')
+
+
+def invalidate(user_id):
+    versions.bump('picker', user_id)
+
+
+def version(user_id):
+    return versions.get('picker', user_id)
+
+
+def build_index(user):
+    """Picker items sorted by recent use, then display name"""
+    since = timezone.now() - datetime.timedelta(days=RECENT_DAYS)
+    last_used = dict(
+        TimeEntry.objects.filter(user=user, is_deleted=False, start_time__gte=since)
+        .values('task_id').annotate(last=Max('start_time')).values_list('task_id', 'last')
+    )
+    timer = Timer.objects.filter(user=user).values_list('task_id', 'start_time').first()
+    if timer:
+        last_used[timer[0]] = timer[1]
+
+    tasks = Task.objects.filter(
+        user=user,
+        is_completed=False,
+        project__status='active',
+        project__client__is_active=True,
+    ).values_list('id', 'name', 'project_id', 'project__name', 'project__client__name', 'project__color')
+
+    items = []
+    for task_id, name, project_id, project_name, client_name, color in tasks:
+        label = f"{client_name} > {project_name} > {name}"
+        used = last_used.get(task_id)
+        items.append({
+            'id': task_id,
+            'label': label,
+            'project_id': project_id,
+            'color': color,
+            'last_used': used.timestamp() if used else 0,
+        })
+    items.sort(key=lambda item: (-item['last_used'], item['label'].lower()))
+    return items
+
+
+def get_index(user):
+    """Cached index of a user's tasks"""
+    key = f"time_tracker:picker:{user.id}:{version(user.id)}"
+    items = cache.get(key)
+    if items is None:
+        items = build_index(user)
+        cache.set(key, items, CACHE_TIMEOUT)
+    return items
+
+
+def _subsequence(needle, haystack):
+    position = 0
+    for char in needle:
+        position = haystack.find(char, position) + 1
+        if not position:
+            return False
+    return True
+
+
+def score(words, label):
+    """Match quality of query ``words`` against a label, 0 if any word does not match"""
+    text = label.lower()
+    label_words = [word for word in WORD_SPLIT.split(text) if word]
+    total = 0
+    for word in words:
+        if any(label_word.startswith(word) for label_word in label_words):
+            total += 3
+        elif word in text:
+            total += 2
+        elif _subsequence(word, text):
+            total += 1
+        else:
+            return 0
+    return total
+
+
+def search(items, query, limit=DEFAULT_LIMIT):
+    """Items matching ``query``, best matches first; all items in index order without a query"""
+    words = [word for word in WORD_SPLIT.split(query.lower()) if word]
+    if not words:
+        return items[:limit]
+    scored = []
+    for position, item in enumerate(items):
+        value = score(words, item['label'])
+        if value:
+            # Index position already encodes recency and name order
+            scored.append((-value, position, item))
+    scored.sort(key=lambda match: match[:2])
+    return [item for _, _, item in scored[:limit]]
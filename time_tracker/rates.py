@@ -0,0 +1,226 @@
+"""
+Rate resolution and currency conversion.
+
+``RateResolver`` loads all rate schedules of a user once and answers
+"which hourly rate applied to this task on this day" from in-memory sorted
+intervals, so revenue for a batch of entries or rollups is computed in one
+pass without a query per entry. Precedence is task schedule, project
+schedule, the project's own static rate, client schedule, then the client's
+static rate: client schedules only apply to projects that inherit the
+client rate.
+
+Amounts are in the client's currency; ``ExchangeRates`` converts them with
+rates from the local ``ExchangeRate`` table.
+"""
+
+import bisect
+import datetime
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ExchangeRate, RateSchedule, Task
+
+CENT = Decimal('0.01')
+
+
+def base_currency():
+    return getattr(settings, 'TIME_TRACKER_BASE_CURRENCY', 'EUR')
+
+
+class ExchangeRates:
+    """Exchange rates loaded once and looked up by date in memory"""
+
+    def __init__(self):
+        self._rates = None
+
+    def _load(self):
+        rates = defaultdict(list)
+        for base, quote, rate, day in ExchangeRate.objects.order_by('date').values_list('base', 'quote', 'rate', 'date'):
+            rates[(base, quote)].append((day, rate))
+        self._rates = {pair: ([day for day, _ in values], [rate for _, rate in values]) for pair, values in rates.items()}
+
+    def _lookup(self, base, quote, day):
+        series = self._rates.get((base, quote))
+        if not series:
+            return None
+        days, rates = series
+        index = bisect.bisect_right(days, day) - 1
+        # Before the first known rate use the earliest one
+        return rates[max(index, 0)]
+
+    def rate(self, source, target, day):
+        """Rate to multiply amounts in ``source`` by to get ``target``, or None"""
+        if source == target:
+            return Decimal('1')
+        if self._rates is None:
+            self._load()
+        direct = self._lookup(source, target, day)
+        if direct is not None:
+            return direct
+        inverse = self._lookup(target, source, day)
+        if inverse:
+            return Decimal('1') / inverse
+        base = base_currency()
+        if base not in (source, target):
+            to_base = self.rate(source, base, day)
+            from_base = self.rate(base, target, day)
+            if to_base is not None and from_base is not None:
+                return to_base * from_base
+        return None
+
+    def convert(self, amount, source, target, day):
+        rate = self.rate(source, target, day)
+        if rate is None:
+            return None
+        return amount * rate
+
+
+class MissingExchangeRate(Exception):
+    """Raised when an amount cannot be converted to the requested currency"""
+
+
+class RateResolver:
+    """Resolves effective hourly rates for a user's tasks by date"""
+
+    def __init__(self, user, exchange_rates=None):
+        self.user = user
+        self.exchange_rates = exchange_rates or ExchangeRates()
+        self._schedules = None
+        self._tasks = {}
+
+    def _load_schedules(self):
+        schedules = defaultdict(list)
+        for schedule in RateSchedule.objects.filter(user=self.user).order_by('valid_from'):
+            rate = schedule.get_hourly_rate()
+            if rate is None:
+                continue
+            if schedule.task_id:
+                key = ('task', schedule.task_id)
+            elif schedule.project_id:
+                key = ('project', schedule.project_id)
+            elif schedule.client_id:
+                key = ('client', schedule.client_id)
+            else:
+                continue
+            schedules[key].append((schedule.valid_from, schedule.valid_to or datetime.date.max, rate))
+        self._schedules = {
+            key: ([start for start, _, _ in values], values) for key, values in schedules.items()
+        }
+
+    def _scheduled_rate(self, key, day):
+        entry = self._schedules.get(key)
+        if not entry:
+            return None
+        starts, values = entry
+        index = bisect.bisect_right(starts, day) - 1
+        # Later schedules win when ranges overlap, so walk back from the latest start
+        while index >= 0:
+            start, end, rate = values[index]
+            if start <= day <= end:
+                return rate
+            index -= 1
+        return None
+
+    def hourly_rate(self, task, day):
+        """Hourly rate applying to ``task`` on ``day`` (task.project.client must be loaded)"""
+        if self._schedules is None:
+            self._load_schedules()
+        project = task.project
+        for key in (('task', task.id), ('project', project.id)):
+            rate = self._scheduled_rate(key, day)
+            if rate is not None:
+                return rate
+        if project.hourly_rate or project.daily_rate:
+            return project.get_effective_hourly_rate()
+        rate = self._scheduled_rate(('client', project.client_id), day)
+        if rate is not None:
+            return rate
+        return project.client.hourly_rate
+
+    def _task(self, task_id):
+        """Tasks with project and client, loaded on demand in one query per batch"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            self.prefetch_tasks([task_id])
+            task = self._tasks[task_id]
+        return task
+
+    def prefetch_tasks(self, task_ids):
+        missing = set(task_ids) - set(self._tasks)
+        if missing:
+            for task in Task.objects.filter(id__in=missing).select_related('project__client'):
+                self._tasks[task.id] = task
+
+    def _in_currency(self, amount, source, currency, day):
+        if currency is None or currency == source:
+            return amount
+        converted = self.exchange_rates.convert(amount, source, currency, day)
+        if converted is None:
+            raise MissingExchangeRate(f"No exchange rate {source}/{currency} for {day}")
+        return converted
+
+    def entry_revenue(self, entry, currency=None):
+        """Revenue of a single entry (uses the loaded ``entry.task`` relations)"""
+        if not entry.is_billable:
+            return Decimal('0.00')
+        day = timezone.localtime(entry.start_time).date()
+        rate = self.hourly_rate(entry.task, day)
+        amount = Decimal(str(entry.get_duration_seconds())) / 3600 * rate
+        return self._in_currency(amount, entry.task.project.client.currency, currency, day).quantize(CENT, ROUND_HALF_UP)
+
+    def entries_revenue(self, entries, currency=None):
+        """Map entry id -> revenue for entries loaded with ``select_related('task__project__client')``"""
+        return {entry.id: self.entry_revenue(entry, currency) for entry in entries}
+
+    def rollup_revenue(self, rollups, currency=None):
+        """Total billable revenue of ``DailyRollup`` rows (a queryset or values dicts)"""
+        if hasattr(rollups, 'values_list'):
+            rows = list(rollups.filter(billable_seconds__gt=0).values_list('task_id', 'day', 'billable_seconds'))
+        else:
+            rows = [(row['task_id'], row['day'], row['billable_seconds']) for row in rollups]
+        self.prefetch_tasks({task_id for task_id, _, _ in rows})
+
+        total = Decimal('0')
+        for task_id, day, seconds in rows:
+            total += self.seconds_revenue(task_id, day, seconds, currency)
+        return total.quantize(CENT, ROUND_HALF_UP)
+
+    def seconds_revenue(self, task_id, day, seconds, currency=None):
+        """Unrounded revenue of billable ``seconds`` worked on a task on ``day``"""
+        task = self._task(task_id)
+        amount = Decimal(seconds) / 3600 * self.hourly_rate(task, day)
+        return self._in_currency(amount, task.project.client.currency, currency, day)
+
+
+def record_rate_change(user, old_rate, new_rate, client=None, project=None, task=None, effective=None):
+    """Keep history when a static rate is edited
+
+    Past entries keep ``old_rate`` through a schedule ending the day before
+    ``effective``; the new rate applies from ``effective`` on.
+    """
+    effective = effective or datetime.date.today()
+    if old_rate == new_rate:
+        return
+    scope = {'client': client, 'project': project, 'task': task}
+    with transaction.atomic():
+        schedules = RateSchedule.objects.filter(user=user, **scope)
+        open_schedule = schedules.filter(valid_to__isnull=True).order_by('-valid_from').first()
+        if open_schedule is None and old_rate is not None:
+            RateSchedule.objects.create(
+                user=user, hourly_rate=old_rate,
+                valid_from=datetime.date(1970, 1, 1),
+                valid_to=effective - datetime.timedelta(days=1),
+                **scope
+            )
+        elif open_schedule is not None:
+            if open_schedule.valid_from >= effective:
+                open_schedule.delete()
+            else:
+                open_schedule.valid_to = effective - datetime.timedelta(days=1)
+                open_schedule.save(update_fields=['valid_to'])
+        if new_rate is not None:
+            RateSchedule.objects.create(user=user, hourly_rate=new_rate, valid_from=effective, **scope)
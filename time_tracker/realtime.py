@@ -0,0 +1,60 @@
+"""
+Server push for timer state.
+
+Timer start/stop is published to ``timer:<user_id>`` on the shared SSE broker
+after the transaction commits, so every open tab and device of the user
+updates at once. Clients compute the elapsed time locally from
+``start_time`` and ``server_time`` instead of polling.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from overhead.events import broker, format_event
+
+from .models import Timer
+
+
+def timer_channel(user_id):
+    return f"timer:{user_id}"
+
+
+def serialize_timer(timer):
+    """Timer state as sent to clients; ``timer`` may be None"""
+    data = {'is_running': False, 'server_time': timezone.now().isoformat()}
+    if timer is None:
+        return data
+    task = timer.task
+    data.update({
+        'is_running': True,
+        'timer_id': timer.id,
+        'task_id': task.id,
+        'task_name': task.name,
+        'project_name': task.project.name,
+        'client_name': task.project.client.name,
+        'start_time': timer.start_time.isoformat(),
+        'description': timer.description,
+    })
+    return data
+
+
+def current_timer(user):
+    return Timer.objects.select_related('task__project__client').filter(user=user).first()
+
+
+def initial_events(user):
+    """Events sent when a stream (re)connects so the client resyncs"""
+    return [format_event('timer.state', serialize_timer(current_timer(user)))]
+
+
+def publish_timer_started(timer):
+    data = serialize_timer(timer)
+    transaction.on_commit(lambda: broker.publish(timer_channel(timer.user_id), 'timer.state', data))
+
+
+def publish_timer_stopped(user_id, entry=None):
+    def publish():
+        data = serialize_timer(None)
+        data['entry_id'] = entry.id if entry else None
+        broker.publish(timer_channel(user_id), 'timer.state', data)
+    transaction.on_commit(publish)
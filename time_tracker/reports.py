@@ -0,0 +1,353 @@
+"""
+Ad hoc reports over tracked time.
+
+A report groups time by any combination of dimensions (client, project,
+task, day/week/month/year, billable) and returns the requested measures
+(hours, revenue, entries). It compiles to one grouped query over
+``DailyRollup``; only combinations the rollups cannot answer (entry counts
+split by billability) fall back to grouped queries over ``TimeEntry`` and
+``ArchivedTimeEntry``.
+
+Revenue depends on effective-dated rates, so when it is requested the query
+additionally groups by task and day and ``RateResolver`` prices those rows
+in memory before they are folded into the requested dimensions.
+
+Results are cached under a hash of the normalized parameters. The cache key
+includes a per-user version that is bumped whenever rollups, rates or names
+change, so stale results are never served and no keys need to be deleted.
+"""
+
+import datetime
+import hashlib
+import itertools
+import json
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+from django.db.models import Count, DateField, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Trunc, TruncDate
+
+from . import intervals, rates, versions
+from .models import ArchivedTimeEntry, DailyRollup, TimeEntry
+
+DIMENSIONS = ('client', 'project', 'task', 'day', 'week', 'month', 'year', 'billable')
+PERIODS = ('day', 'week', 'month', 'year')
+MEASURES = ('hours', 'revenue', 'entries')
+
+CACHE_TIMEOUT = 60 * 60
+CENT = Decimal('0.01')
+
+# Grouping columns per source: dimension -> (id expression, label expression)
+RELATIONS = {
+    'rollup': {
+        'client': ('project__client_id', 'project__client__name'),
+        'project': ('project_id', 'project__name'),
+        'task': ('task_id', 'task__name'),
+    },
+    'entries': {
+        'client': ('task__project__client_id', 'task__project__client__name'),
+        'project': ('task__project_id', 'task__project__name'),
+        'task': ('task_id', 'task__name'),
+    },
+}
+
+
+class ReportError(Exception):
+    """Raised for invalid report parameters"""
+
+
+def invalidate(user_id=None):
+    """Drop cached reports of a user (``None``: all users) after commit"""
+    versions.bump('report', user_id if user_id is not None else 'all')
+
+
+def _cache_key(user, spec):
+    digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+    return f"time_tracker:report:{user.id}:{versions.get('report', user.id)}:{versions.get('report', 'all')}:{digest}"
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+def _parse_day(value, name):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ReportError(f"Invalid {name} '{value}'")
+
+
+def parse_params(params):
+    """Normalize query parameters into a report spec"""
+    dimensions = _split(params.get('dimensions'))
+    measures = _split(params.get('measures')) or ['hours']
+    unknown = [name for name in dimensions if name not in DIMENSIONS] + [name for name in measures if name not in MEASURES]
+    if unknown:
+        raise ReportError(f"Unknown dimensions or measures: {', '.join(unknown)}")
+    if len(set(dimensions)) != len(dimensions):
+        raise ReportError('Dimensions must not repeat')
+    if len([name for name in dimensions if name in PERIODS]) > 1:
+        raise ReportError('Use at most one of day, week, month and year')
+
+    today = datetime.date.today()
+    date_from = _parse_day(params['date_from'], 'date_from') if params.get('date_from') else today.replace(month=1, day=1)
+    date_to = _parse_day(params['date_to'], 'date_to') if params.get('date_to') else today
+    if date_to < date_from:
+        raise ReportError('date_to must not be before date_from')
+
+    filters = {}
+    for name in ('client_id', 'project_id', 'task_id'):
+        if params.get(name):
+            try:
+                filters[name] = int(params[name])
+            except ValueError:
+                raise ReportError(f"Invalid {name} '{params[name]}'")
+    if params.get('billable') in ('true', 'false'):
+        filters['billable'] = params['billable'] == 'true'
+
+    pivot = params.get('pivot') or None
+    if pivot and pivot not in dimensions:
+        raise ReportError('pivot must be one of the dimensions')
+
+    return {
+        'dimensions': dimensions,
+        'measures': measures,
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'filters': filters,
+        'pivot': pivot,
+    }
+
+
+def _source(spec):
+    """Rollups hold entry counts per task and day only, not split by billability"""
+    needs_entry_split = 'entries' in spec['measures'] and (
+        'billable' in spec['dimensions'] or 'billable' in spec['filters']
+    )
+    return 'entries' if needs_entry_split else 'rollup'
+
+
+def _period_expression(source, kind):
+    if source == 'rollup':
+        return Trunc('day', kind, output_field=DateField())
+    return Trunc('start_time', kind, output_field=DateField())
+
+
+def _base_queryset(user, spec, source, model):
+    date_from = datetime.date.fromisoformat(spec['date_from'])
+    date_to = datetime.date.fromisoformat(spec['date_to'])
+    filters = spec['filters']
+    project_field = 'project_id' if source == 'rollup' else 'task__project_id'
+
+    if source == 'rollup':
+        queryset = model.objects.filter(user=user, day__gte=date_from, day__lte=date_to)
+    else:
+        start, end = intervals.range_bounds(date_from, date_to)
+        queryset = model.objects.filter(
+            user=user, is_deleted=False, end_time__isnull=False, start_time__gte=start, start_time__lt=end
+        )
+        if 'billable' in filters:
+            queryset = queryset.filter(is_billable=filters['billable'])
+
+    if 'client_id' in filters:
+        queryset = queryset.filter(**{RELATIONS[source]['client'][0]: filters['client_id']})
+    if 'project_id' in filters:
+        queryset = queryset.filter(**{project_field: filters['project_id']})
+    if 'task_id' in filters:
+        queryset = queryset.filter(task_id=filters['task_id'])
+    return queryset
+
+
+def _grouping(spec, source):
+    """Annotations to group by: alias -> expression"""
+    group = OrderedDict()
+    relations = RELATIONS[source]
+    for name in spec['dimensions']:
+        if name in relations:
+            id_field, label_field = relations[name]
+            group[f'd_{name}'] = F(id_field)
+            group[f'd_{name}_label'] = F(label_field)
+        elif name in PERIODS:
+            group[f'd_{name}'] = _period_expression(source, name)
+        elif name == 'billable' and source == 'entries':
+            group['d_billable'] = F('is_billable')
+    if 'revenue' in spec['measures']:
+        group['r_task'] = F('task_id')
+        group['r_day'] = F('day') if source == 'rollup' else TruncDate('start_time')
+    return group
+
+
+def _aggregates(source):
+    if source == 'rollup':
+        return {
+            'a_seconds': Sum('seconds'),
+            'a_billable': Sum('billable_seconds'),
+            'a_entries': Sum('entry_count'),
+        }
+    duration = ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+    return {
+        'a_seconds': Sum(duration),
+        'a_billable': Sum(duration, filter=Q(is_billable=True)),
+        'a_entries': Count('id'),
+    }
+
+
+def _seconds(value):
+    if value is None:
+        return 0
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return value
+
+
+def fetch_rows(user, spec):
+    """Run the single grouped query; yields ``(dimension values, seconds, billable seconds, entries, revenue key)``"""
+    source = _source(spec)
+    group = _grouping(spec, source)
+    # Archived entries are in the rollups; the entry fallback reads both tables
+    models = [DailyRollup] if source == 'rollup' else [TimeEntry, ArchivedTimeEntry]
+    querysets = [
+        _base_queryset(user, spec, source, model).annotate(**group).values(*group).annotate(**_aggregates(source)).order_by()
+        for model in models
+    ]
+    billable_filter = spec['filters'].get('billable')
+
+    rows = []
+    for row in itertools.chain.from_iterable(querysets):
+        seconds = _seconds(row['a_seconds'])
+        billable = _seconds(row['a_billable'])
+        revenue_key = (row['r_task'], row['r_day']) if 'r_task' in row else None
+        dims = {name: row.get(f'd_{name}') for name in spec['dimensions']}
+        labels = {name: row.get(f'd_{name}_label') for name in spec['dimensions']}
+
+        if source == 'rollup' and ('billable' in spec['dimensions'] or billable_filter is not None):
+            # Rollups carry both totals; split them into billable and non-billable parts
+            parts = [(True, billable, billable), (False, seconds - billable, 0)]
+            for is_billable, part_seconds, part_billable in parts:
+                if not part_seconds or (billable_filter is not None and billable_filter != is_billable):
+                    continue
+                part_dims = dict(dims)
+                if 'billable' in part_dims:
+                    part_dims['billable'] = is_billable
+                rows.append((part_dims, labels, part_seconds, part_billable, row['a_entries'], revenue_key))
+        else:
+            rows.append((dims, labels, seconds, billable, row['a_entries'], revenue_key))
+    return source, rows
+
+
+def _format_dimension(name, value):
+    if value is None or name not in PERIODS:
+        return value
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if name == 'month':
+        return value.strftime('%Y-%m')
+    if name == 'year':
+        return value.strftime('%Y')
+    return value.isoformat()
+
+
+def _sort_key(values):
+    return tuple((value is None, str(value) if not isinstance(value, (int, float)) else value) for value in values)
+
+
+def build_report(user, spec):
+    """Compute a report without the cache"""
+    source, rows = fetch_rows(user, spec)
+    dimensions = spec['dimensions']
+    measures = spec['measures']
+    currency = rates.base_currency()
+    resolver = rates.RateResolver(user)
+    missing_rates = False
+
+    if 'revenue' in measures:
+        resolver.prefetch_tasks({key[0] for *_, key in rows if key})
+
+    groups = OrderedDict()
+    for dims, labels, seconds, billable, entries, revenue_key in rows:
+        key = tuple(_format_dimension(name, dims[name]) for name in dimensions)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {'labels': labels, 'seconds': 0, 'revenue': Decimal('0'), 'entries': 0}
+        group['seconds'] += seconds
+        group['entries'] += entries or 0
+        if revenue_key and billable:
+            try:
+                group['revenue'] += resolver.seconds_revenue(revenue_key[0], revenue_key[1], billable, currency)
+            except rates.MissingExchangeRate:
+                missing_rates = True
+
+    totals = {'seconds': 0, 'revenue': Decimal('0'), 'entries': 0}
+    result_rows = []
+    for key in sorted(groups, key=_sort_key):
+        group = groups[key]
+        row = OrderedDict()
+        for name, value in zip(dimensions, key):
+            if name in RELATIONS['rollup']:
+                row[f'{name}_id'] = value
+                row[name] = group['labels'][name]
+            else:
+                row[name] = value
+        row.update(_measures(group, measures))
+        result_rows.append(row)
+        for field in totals:
+            totals[field] += group[field]
+
+    report = {
+        'dimensions': dimensions,
+        'measures': measures,
+        'date_from': spec['date_from'],
+        'date_to': spec['date_to'],
+        'currency': currency,
+        'source': source,
+        'rows': result_rows,
+        'totals': _measures(totals, measures),
+        'missing_exchange_rates': missing_rates,
+    }
+    if spec['pivot']:
+        report['pivot'] = pivot(result_rows, spec['pivot'], measures)
+    return report
+
+
+def _measures(group, measures):
+    values = {}
+    if 'hours' in measures:
+        values['hours'] = round(group['seconds'] / 3600, 2)
+    if 'revenue' in measures:
+        values['revenue'] = str(group['revenue'].quantize(CENT, ROUND_HALF_UP))
+    if 'entries' in measures:
+        values['entries'] = group['entries']
+    return values
+
+
+def pivot(rows, column, measures):
+    """Turn the values of one dimension into columns"""
+    columns = []
+    table = OrderedDict()
+    for row in rows:
+        column_value = row[column]
+        if column_value not in columns:
+            columns.append(column_value)
+        keys = OrderedDict(
+            (name, value) for name, value in row.items()
+            if name not in measures and name not in (column, f'{column}_id')
+        )
+        row_key = tuple(keys.values())
+        line = table.get(row_key)
+        if line is None:
+            line = table[row_key] = dict(keys, cells={})
+        line['cells'][str(column_value)] = {name: row[name] for name in measures}
+    return {'dimension': column, 'columns': [str(value) for value in columns], 'rows': list(table.values())}
+
+
+def run_report(user, params):
+    """Validate parameters and return the (possibly cached) report"""
+    spec = parse_params(params)
+    key = _cache_key(user, spec)
+    report = cache.get(key)
+    if report is not None:
+        return dict(report, cached=True)
+    report = build_report(user, spec)
+    cache.set(key, report, CACHE_TIMEOUT)
+    return dict(report, cached=False)
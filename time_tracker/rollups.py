@@ -0,0 +1,221 @@
+"""
+Daily rollups of tracked time.
+
+``DailyRollup`` holds seconds per task and day. It is maintained
+incrementally: every entry change is turned into the difference between its
+old and new contribution, applied with ``F()`` updates, together with the
+project's ``tracked_seconds`` running total. Only finished, non-deleted
+entries contribute; entries spanning midnight are split across days.
+Budget thresholds are evaluated for the touched projects only.
+
+Negative deltas (deleted or shortened entries) only decrement existing rows
+and can only re-arm budget alerts, never create rows: when a task, project,
+client or user is deleted, its entries' delete signals run while the
+cascade is removing the rollups and alerts that would be re-created.
+
+Bulk writes that bypass model signals (``bulk_create``, ``QuerySet.update``)
+must call ``apply_changes`` themselves.
+"""
+
+import datetime
+import itertools
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import reports
+from .models import ArchivedTimeEntry, BudgetAlert, DailyRollup, Project, Task, TimeEntry
+
+
+def split_seconds_by_day(start, end):
+    """Yield ``(day, seconds)`` for an interval, split at local midnight"""
+    tz = timezone.get_current_timezone()
+    while start < end:
+        local = timezone.localtime(start, tz)
+        next_midnight = timezone.make_aware(
+            datetime.datetime.combine(local.date() + datetime.timedelta(days=1), datetime.time.min), tz
+        )
+        segment_end = min(end, next_midnight)
+        yield local.date(), (segment_end - start).total_seconds()
+        start = segment_end
+
+
+def contribution(state):
+    """Map ``(task_id, day) -> [seconds, billable_seconds, entry_count]`` for an entry state"""
+    result = {}
+    if state is None:
+        return result
+    task_id, start, end, is_billable, is_deleted = state
+    if is_deleted or end is None or end <= start:
+        return result
+    first = True
+    for day, seconds in split_seconds_by_day(start, end):
+        seconds = int(round(seconds))
+        result[(task_id, day)] = [seconds, seconds if is_billable else 0, 1 if first else 0]
+        first = False
+    return result
+
+
+def diff_states(changes):
+    """Sum contributions of ``(old_state, new_state)`` pairs into per-key deltas"""
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for old_state, new_state in changes:
+        for key, values in contribution(old_state).items():
+            delta = deltas[key]
+            for i, value in enumerate(values):
+                delta[i] -= value
+        for key, values in contribution(new_state).items():
+            delta = deltas[key]
+            for i, value in enumerate(values):
+                delta[i] += value
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def apply_changes(changes):
+    """Apply entry state changes, a list of ``(old_state, new_state)`` tuples"""
+    deltas = diff_states(changes)
+    if not deltas:
+        return
+
+    tasks = {
+        task_id: (user_id, project_id)
+        for task_id, user_id, project_id in Task.objects.filter(
+            id__in={task_id for task_id, _ in deltas}
+        ).values_list('id', 'user_id', 'project_id')
+    }
+    project_deltas = defaultdict(int)
+
+    with transaction.atomic():
+        for (task_id, day), (seconds, billable, count) in deltas.items():
+            if task_id not in tasks:
+                continue  # Task was deleted together with its entries
+            user_id, project_id = tasks[task_id]
+            project_deltas[project_id] += seconds
+            _upsert(user_id, project_id, task_id, day, seconds, billable, count)
+
+        for user_id in {user_id for user_id, _ in tasks.values()}:
+            reports.invalidate(user_id)
+
+        for project_id, seconds in project_deltas.items():
+            if seconds:
+                Project.objects.filter(id=project_id).update(tracked_seconds=F('tracked_seconds') + seconds)
+
+    evaluate_budget_alerts(project_id for project_id, seconds in project_deltas.items() if seconds > 0)
+    evaluate_budget_alerts((project_id for project_id, seconds in project_deltas.items() if seconds < 0), create=False)
+
+
+def _upsert(user_id, project_id, task_id, day, seconds, billable, count):
+    updates = {
+        'seconds': F('seconds') + seconds,
+        'billable_seconds': F('billable_seconds') + billable,
+        'entry_count': F('entry_count') + count,
+    }
+    if DailyRollup.objects.filter(task_id=task_id, day=day).update(**updates):
+        return
+    if seconds <= 0 and billable <= 0 and count <= 0:
+        return  # Nothing to remove, possibly mid-cascade
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(
+                user_id=user_id, project_id=project_id, task_id=task_id, day=day,
+                seconds=seconds, billable_seconds=billable, entry_count=count,
+            )
+    except IntegrityError:
+        # Created concurrently, fall back to the increment
+        DailyRollup.objects.filter(task_id=task_id, day=day).update(**updates)
+
+
+def apply_entries(entries):
+    """Add freshly bulk-created entries to the rollups"""
+    apply_changes([(None, entry.get_rollup_state()) for entry in entries])
+
+
+def evaluate_budget_alerts(project_ids, create=True):
+    """Create alerts for thresholds crossed by the given projects (with ``create=False`` only re-arm dropped ones)"""
+    project_ids = list(project_ids)
+    if not project_ids:
+        return []
+
+    projects = Project.objects.filter(id__in=project_ids, budget_hours__gt=0).values_list(
+        'id', 'user_id', 'budget_hours', 'tracked_seconds'
+    )
+    existing = defaultdict(set)
+    for project_id, threshold in BudgetAlert.objects.filter(project_id__in=project_ids).values_list(
+        'project_id', 'threshold'
+    ):
+        existing[project_id].add(threshold)
+
+    created = []
+    for project_id, user_id, budget_hours, tracked_seconds in projects:
+        hours = Decimal(tracked_seconds) / 3600
+        percentage = hours / budget_hours * 100
+        reached = {threshold for threshold in BudgetAlert.THRESHOLDS if percentage >= threshold}
+        for threshold in sorted(reached - existing[project_id]) if create else ():
+            created.append(BudgetAlert(
+                user_id=user_id,
+                project_id=project_id,
+                threshold=threshold,
+                hours_at_crossing=hours.quantize(Decimal('0.01')),
+            ))
+        # Dropping back below a threshold (entry deleted or shortened) re-arms it
+        dropped = existing[project_id] - reached
+        if dropped:
+            BudgetAlert.objects.filter(project_id=project_id, threshold__in=dropped).delete()
+
+    BudgetAlert.objects.bulk_create(created, ignore_conflicts=True)
+    return created
+
+
+def rebuild(user=None):
+    """Recompute rollups and project totals from scratch"""
+    # Archived billed entries still count
+    sources = [
+        model.objects.filter(is_deleted=False, end_time__isnull=False)
+        for model in (TimeEntry, ArchivedTimeEntry)
+    ]
+    rollups = DailyRollup.objects.all()
+    projects = Project.objects.all()
+    if user is not None:
+        sources = [entries.filter(user=user) for entries in sources]
+        rollups = rollups.filter(user=user)
+        projects = projects.filter(user=user)
+
+    totals = {}
+    task_projects = dict(Task.objects.values_list('id', 'project_id'))
+    iterator = itertools.chain.from_iterable(
+        entries.values_list('user_id', 'task_id', 'start_time', 'end_time', 'is_billable').iterator(chunk_size=5000)
+        for entries in sources
+    )
+    for user_id, task_id, start, end, is_billable in iterator:
+        for key, (seconds, billable, count) in contribution((task_id, start, end, is_billable, False)).items():
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [user_id, seconds, billable, count]
+            else:
+                total[1] += seconds
+                total[2] += billable
+                total[3] += count
+
+    project_seconds = defaultdict(int)
+    objects = []
+    for (task_id, day), (user_id, seconds, billable, count) in totals.items():
+        project_id = task_projects[task_id]
+        project_seconds[project_id] += seconds
+        objects.append(DailyRollup(
+            user_id=user_id, project_id=project_id, task_id=task_id, day=day,
+            seconds=seconds, billable_seconds=billable, entry_count=count,
+        ))
+
+    with transaction.atomic():
+        rollups.delete()
+        DailyRollup.objects.bulk_create(objects, batch_size=2000)
+        projects.update(tracked_seconds=0)
+        for project_id, seconds in project_seconds.items():
+            Project.objects.filter(id=project_id).update(tracked_seconds=seconds)
+        reports.invalidate(user.id if user is not None else None)
+
+    evaluate_budget_alerts(projects.filter(budget_hours__isnull=False).values_list('id', flat=True))
+    return len(objects)
@@ -0,0 +1,74 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import picker, reports, rollups
+from .models import Client, ExchangeRate, Project, RateSchedule, Task, TimeEntry, Timer
+
+
+@receiver(pre_save, sender=TimeEntry)
+def remember_rollup_state(sender, instance, **kwargs):
+    """Load the stored state for instances that were not read from the database"""
+    if instance._state.adding or hasattr(instance, '_rollup_state'):
+        return
+    stored = TimeEntry.objects.filter(pk=instance.pk).values_list(
+        'task_id', 'start_time', 'end_time', 'is_billable', 'is_deleted'
+    ).first()
+    instance._rollup_state = stored
+
+
+@receiver(post_save, sender=TimeEntry)
+def update_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_state = None if created else instance._rollup_state
+    new_state = instance.get_rollup_state()
+    if old_state != new_state:
+        rollups.apply_changes([(old_state, new_state)])
+    instance._rollup_state = new_state
+
+
+@receiver(post_delete, sender=TimeEntry)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    old_state = getattr(instance, '_rollup_state', None)
+    if old_state is not None:
+        rollups.apply_changes([(old_state, None)])
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=RateSchedule)
+@receiver(post_delete, sender=RateSchedule)
+def invalidate_reports(sender, instance, raw=False, **kwargs):
+    """Names, currencies and rates appear in cached reports"""
+    if not raw:
+        reports.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def invalidate_all_reports(sender, raw=False, **kwargs):
+    if not raw:
+        reports.invalidate()
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_picker(sender, instance, raw=False, **kwargs):
+    if not raw:
+        picker.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=TimeEntry)
+@receiver(post_save, sender=Timer)
+def refresh_recent_tasks(sender, instance, created, raw=False, **kwargs):
+    """New timers and entries change the recently-used order of the picker"""
+    if created and not raw:
+        picker.invalidate(instance.user_id)
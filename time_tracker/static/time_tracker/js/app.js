@@ -6,6 +6,8 @@ class TimeTracker {
         this.timerStartTime = null;
         this.isTimerRunning = false;
         this.currentTimerTask = null;
+        this.clockOffset = 0;
+        this.timerEvents = null;
         
         this.clients = [];
         this.projects = [];
@@ -19,6 +21,7 @@ class TimeTracker {
         this.setupEventListeners();
         this.loadInitialData();
         this.checkTimerStatus();
+        this.subscribeTimerEvents();
         this.startTimerUpdates();
     }
     
@@ -274,37 +277,88 @@ class TimeTracker {
     async checkTimerStatus() {
         try {
             const response = await this.apiCall('/api/timer/status/');
-            if (response.is_running) {
-                this.isTimerRunning = true;
-                this.timerStartTime = new Date(response.start_time);
-                this.currentTimerTask = {
-                    id: response.task_id,
-                    name: response.task_name,
-                    project: response.project_name,
-                    client: response.client_name,
-                    description: response.description
-                };
-                this.updateTimerDisplay();
-                document.getElementById('startTimer').style.display = 'none';
-                document.getElementById('stopTimer').style.display = 'block';
-                
-                // Show description field with current description
-                const descContainer = document.getElementById('timerDescriptionContainer');
-                const descInput = document.getElementById('timerLiveDescription');
-                descContainer.style.display = 'block';
-                descInput.value = response.description || localStorage.getItem('timerDescription') || '';
-                
-                // Save description on change
-                descInput.addEventListener('input', () => {
-                    this.currentTimerTask.description = descInput.value;
-                    localStorage.setItem('timerDescription', descInput.value);
-                });
-            }
+            this.applyTimerState(response);
         } catch (error) {
             console.error('Error checking timer status:', error);
         }
     }
     
+    subscribeTimerEvents() {
+        // Timer changes from other tabs and devices are pushed by the server
+        if (!window.EventSource) return;
+        
+        this.timerEvents = new EventSource('/time-tracker/api/timer/events/');
+        this.timerEvents.addEventListener('timer.state', (event) => {
+            const state = JSON.parse(event.data);
+            const wasRunning = this.isTimerRunning;
+            this.applyTimerState(state);
+            
+            if (wasRunning && !state.is_running && state.entry_id) {
+                if (this.currentView === 'dashboard') {
+                    this.loadDashboard();
+                } else if (this.currentView === 'timesheet') {
+                    this.loadEntries();
+                }
+            }
+        });
+    }
+    
+    applyTimerState(state) {
+        const descContainer = document.getElementById('timerDescriptionContainer');
+        const descInput = document.getElementById('timerLiveDescription');
+        
+        if (state.server_time) {
+            // Elapsed time is computed locally, corrected for clock skew
+            this.clockOffset = new Date(state.server_time) - new Date();
+        }
+        
+        if (!state.is_running) {
+            this.isTimerRunning = false;
+            this.timerStartTime = null;
+            this.currentTimerTask = null;
+            
+            document.getElementById('timerDisplay').textContent = '00:00:00';
+            document.getElementById('timerTask').textContent = 'No task selected';
+            document.getElementById('startTimer').style.display = 'block';
+            document.getElementById('stopTimer').style.display = 'none';
+            descContainer.style.display = 'none';
+            descInput.value = '';
+            localStorage.removeItem('timerDescription');
+            return;
+        }
+        
+        const sameTimer = this.currentTimerTask && this.currentTimerTask.timerId === state.timer_id;
+        this.isTimerRunning = true;
+        this.timerStartTime = new Date(state.start_time);
+        this.currentTimerTask = {
+            timerId: state.timer_id,
+            id: state.task_id,
+            name: state.task_name,
+            project: state.project_name,
+            client: state.client_name,
+            description: sameTimer ? this.currentTimerTask.description : state.description
+        };
+        
+        document.getElementById('startTimer').style.display = 'none';
+        document.getElementById('stopTimer').style.display = 'block';
+        descContainer.style.display = 'block';
+        if (!sameTimer) {
+            descInput.value = state.description || localStorage.getItem('timerDescription') || '';
+        }
+        
+        // Save description on change
+        if (!descInput.dataset.bound) {
+            descInput.dataset.bound = 'true';
+            descInput.addEventListener('input', () => {
+                if (!this.currentTimerTask) return;
+                this.currentTimerTask.description = descInput.value;
+                localStorage.setItem('timerDescription', descInput.value);
+            });
+        }
+        
+        this.updateTimerDisplay();
+    }
+    
     startTimerUpdates() {
         // Update timer every second
         setInterval(() => {
@@ -317,8 +371,8 @@ class TimeTracker {
     updateTimerDisplay() {
         if (!this.isTimerRunning || !this.timerStartTime) return;
         
-        const now = new Date();
-        const elapsed = Math.floor((now - this.timerStartTime) / 1000);
+        const now = new Date(Date.now() + this.clockOffset);
+        const elapsed = Math.max(0, Math.floor((now - this.timerStartTime) / 1000));
         
         const hours = Math.floor(elapsed / 3600);
         const minutes = Math.floor((elapsed % 3600) / 60);
@@ -334,14 +388,15 @@ class TimeTracker {
     }
     
     async showTimerModal() {
-        await this.loadTasks();
+        // Recently used open tasks first; the browser revalidates via ETag
+        const data = await this.apiCall('/api/tasks/picker/?limit=500');
         const select = document.getElementById('timerTaskSelect');
         select.innerHTML = '<option value="">Choose a task...</option>';
         
-        this.tasks.forEach(task => {
+        data.tasks.forEach(task => {
             const option = document.createElement('option');
             option.value = task.id;
-            option.textContent = task.display_name;
+            option.textContent = task.label;
             select.appendChild(option);
         });
         
@@ -352,36 +407,22 @@ class TimeTracker {
         try {
             const response = await this.apiCall('/api/timer/start/', 'POST', {
                 task_id: taskId,
-                description: description
+                description: description,
+                idempotency_key: this.newIdempotencyKey()
             });
             
-            this.isTimerRunning = true;
-            this.timerStartTime = new Date(response.start_time);
-            this.currentTimerTask = {
-                id: response.task_id,
-                name: response.task_name,
-                project: response.project_name,
-                client: response.client_name,
+            localStorage.removeItem('timerDescription');
+            this.applyTimerState({
+                is_running: true,
+                timer_id: response.id,
+                task_id: response.task_id,
+                task_name: response.task_name,
+                project_name: response.project_name,
+                client_name: response.client_name,
+                start_time: response.start_time,
                 description: description
-            };
-            
-            document.getElementById('startTimer').style.display = 'none';
-            document.getElementById('stopTimer').style.display = 'block';
-            
-            // Show description field and set initial value
-            const descContainer = document.getElementById('timerDescriptionContainer');
-            const descInput = document.getElementById('timerLiveDescription');
-            descContainer.style.display = 'block';
-            descInput.value = description || '';
-            
-            // Save description on change
-            descInput.addEventListener('input', () => {
-                this.currentTimerTask.description = descInput.value;
-                // Save to localStorage for persistence
-                localStorage.setItem('timerDescription', descInput.value);
             });
             
-            this.updateTimerDisplay();
             this.showNotification('Timer started', 'success');
         } catch (error) {
             console.error('Error starting timer:', error);
@@ -397,24 +438,11 @@ class TimeTracker {
             
             // Send description with stop request
             const response = await this.apiCall('/api/timer/stop/', 'POST', {
-                description: description
+                description: description,
+                idempotency_key: this.newIdempotencyKey()
             });
             
-            this.isTimerRunning = false;
-            this.timerStartTime = null;
-            this.currentTimerTask = null;
-            
-            document.getElementById('timerDisplay').textContent = '00:00:00';
-            document.getElementById('timerTask').textContent = 'No task selected';
-            document.getElementById('startTimer').style.display = 'block';
-            document.getElementById('stopTimer').style.display = 'none';
-            
-            // Hide and clear description field
-            const descContainer = document.getElementById('timerDescriptionContainer');
-            const descInput = document.getElementById('timerLiveDescription');
-            descContainer.style.display = 'none';
-            descInput.value = '';
-            localStorage.removeItem('timerDescription');
+            this.applyTimerState({is_running: false});
             
             this.showNotification(`Timer stopped. Duration: ${response.duration}`, 'success');
             
@@ -1183,6 +1211,13 @@ class TimeTracker {
     }
     
     // API Helper
+    newIdempotencyKey() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    }
+    
     async apiCall(url, method = 'GET', data = null) {
         const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
         
@@ -0,0 +1,280 @@
+"""
+Batch synchronisation of time entries for offline clients.
+
+A client sends the operations it recorded while offline together with the
+cursor of its last sync. Operations are applied in order inside one
+transaction, each in its own savepoint:
+
+* ``create`` carries a ``client_uuid``; repeating it returns the entry that
+  was already created, so a retried sync does not duplicate entries.
+* ``update`` and ``delete`` address an entry by ``id`` or ``client_uuid``
+  and carry the ``version`` the client last saw. A different stored version
+  is reported as a conflict together with the server copy.
+
+The response lists the result of every operation and all entries changed
+since the cursor, read through the ``(user, updated_at)`` index. Deletes are
+soft deletes and therefore show up in the delta as tombstones until they
+are archived; a cursor older than a tombstone that has since been archived
+is rejected and the client has to sync from scratch. Paging through old
+history is fine as long as nothing after the cursor was archived.
+"""
+
+import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import intervals
+from .models import ArchivedTimeEntry, Task, TimeEntry
+
+MAX_OPERATIONS = 1000
+DELTA_PAGE_SIZE = 500
+# Entries committed by a concurrent transaction can carry an updated_at
+# slightly before the moment we read the delta; re-send that window.
+CURSOR_OVERLAP = datetime.timedelta(seconds=5)
+
+
+class SyncError(Exception):
+    """Raised for a malformed sync request"""
+
+
+class CursorExpired(SyncError):
+    """Raised when tombstones newer than the cursor may already have been archived"""
+
+
+class OperationError(Exception):
+    """Raised when a single operation cannot be applied"""
+
+    def __init__(self, status, message, entry=None):
+        super().__init__(message)
+        self.status = status
+        self.entry = entry
+
+
+def serialize_entry(entry):
+    return {
+        'id': entry.id,
+        'client_uuid': entry.client_uuid,
+        'version': entry.version,
+        'task_id': entry.task_id,
+        'start_time': entry.start_time.isoformat(),
+        'end_time': entry.end_time.isoformat() if entry.end_time else None,
+        'description': entry.description,
+        'is_billable': entry.is_billable,
+        'is_billed': entry.is_billed,
+        'is_deleted': entry.is_deleted,
+        'updated_at': entry.updated_at.isoformat(),
+    }
+
+
+def encode_cursor(updated_at, entry_id=0):
+    return f"{updated_at.isoformat()}|{entry_id}"
+
+
+def decode_cursor(cursor):
+    try:
+        stamp, entry_id = cursor.rsplit('|', 1)
+        return datetime.datetime.fromisoformat(stamp), int(entry_id)
+    except (AttributeError, ValueError):
+        raise SyncError(f"Invalid cursor '{cursor}'")
+
+
+def _parse_datetime(value, field):
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise OperationError('error', f"Invalid {field} '{value}'")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+
+class SyncSession:
+    """Applies one batch of operations for a user"""
+
+    def __init__(self, user, operations):
+        if not isinstance(operations, list):
+            raise SyncError('operations must be a list')
+        if len(operations) > MAX_OPERATIONS:
+            raise SyncError(f"At most {MAX_OPERATIONS} operations per sync")
+        self.user = user
+        self.operations = operations
+        self.entries_by_id = {}
+        self.entries_by_uuid = {}
+        self.task_ids = set()
+
+    def _preload(self):
+        """Load every referenced entry and task with one query each"""
+        ids, uuids = set(), set()
+        for op in self.operations:
+            if not isinstance(op, dict):
+                continue
+            if op.get('id'):
+                ids.add(op['id'])
+            if op.get('client_uuid'):
+                uuids.add(str(op['client_uuid']))
+        if ids or uuids:
+            entries = TimeEntry.objects.select_for_update().filter(
+                Q(id__in=ids) | Q(client_uuid__in=uuids), user=self.user
+            )
+            for entry in entries:
+                self._remember(entry)
+        self.task_ids = set(Task.objects.filter(user=self.user).values_list('id', flat=True))
+
+    def _remember(self, entry):
+        self.entries_by_id[entry.id] = entry
+        if entry.client_uuid:
+            self.entries_by_uuid[entry.client_uuid] = entry
+
+    def _find(self, op):
+        entry = None
+        if op.get('id'):
+            entry = self.entries_by_id.get(op['id'])
+        elif op.get('client_uuid'):
+            entry = self.entries_by_uuid.get(str(op['client_uuid']))
+        if entry is None:
+            raise OperationError('error', 'Time entry not found')
+        return entry
+
+    def _assign(self, entry, fields):
+        if 'task_id' in fields:
+            if fields['task_id'] not in self.task_ids:
+                raise OperationError('error', f"Unknown task {fields['task_id']}")
+            entry.task_id = fields['task_id']
+        if 'start_time' in fields:
+            entry.start_time = _parse_datetime(fields['start_time'], 'start_time')
+        if 'end_time' in fields:
+            entry.end_time = _parse_datetime(fields['end_time'], 'end_time') if fields['end_time'] else None
+        if 'description' in fields:
+            entry.description = fields['description'] or ''
+        if 'is_billable' in fields:
+            entry.is_billable = bool(fields['is_billable'])
+        if entry.end_time and entry.start_time > entry.end_time:
+            raise OperationError('error', 'End time must be after start time')
+
+    def _check_overlap(self, entry):
+        conflict = intervals.find_conflict(self.user, entry.start_time, entry.end_time, exclude_id=entry.id)
+        if conflict:
+            raise OperationError('conflict', f"Overlaps time entry {conflict.id}", conflict)
+
+    def _check_version(self, entry, op):
+        if op.get('version') != entry.version:
+            raise OperationError('conflict', 'Time entry was changed on the server', entry)
+
+    def _create(self, op):
+        client_uuid = op.get('client_uuid')
+        if not client_uuid:
+            raise OperationError('error', 'client_uuid is required for create')
+        client_uuid = str(client_uuid)
+        existing = self.entries_by_uuid.get(client_uuid)
+        if existing is not None:
+            return 'duplicate', existing
+
+        fields = op.get('fields') or {}
+        if 'task_id' not in fields or 'start_time' not in fields:
+            raise OperationError('error', 'task_id and start_time are required')
+        entry = TimeEntry(user=self.user, client_uuid=client_uuid)
+        self._assign(entry, fields)
+        self._check_overlap(entry)
+        entry.save()
+        return 'applied', entry
+
+    def _update(self, op):
+        entry = self._find(op)
+        self._check_version(entry, op)
+        fields = op.get('fields') or {}
+        self._assign(entry, fields)
+        if {'start_time', 'end_time'} & set(fields):
+            self._check_overlap(entry)
+        entry.save()
+        return 'applied', entry
+
+    def _delete(self, op):
+        entry = self._find(op)
+        if entry.is_deleted:
+            return 'duplicate', entry
+        self._check_version(entry, op)
+        entry.is_deleted = True
+        entry.save()
+        return 'applied', entry
+
+    def _reset(self, op):
+        """Discard in-memory changes of a failed operation (its savepoint was rolled back)"""
+        if not isinstance(op, dict) or op.get('op') == 'create':
+            return
+        try:
+            entry = self._find(op)
+        except OperationError:
+            return
+        entry.refresh_from_db()
+
+    def _apply(self, op):
+        handlers = {'create': self._create, 'update': self._update, 'delete': self._delete}
+        if not isinstance(op, dict) or op.get('op') not in handlers:
+            raise OperationError('error', 'Unknown operation')
+        return handlers[op['op']](op)
+
+    def apply(self, allow_partial=True):
+        """Apply all operations; without ``allow_partial`` any failure rolls back the batch"""
+        results = []
+        with transaction.atomic():
+            self._preload()
+            for index, op in enumerate(self.operations):
+                result = {'index': index, 'client_uuid': op.get('client_uuid') if isinstance(op, dict) else None}
+                try:
+                    with transaction.atomic():
+                        status, entry = self._apply(op)
+                except OperationError as e:
+                    self._reset(op)
+                    result.update({'status': e.status, 'error': str(e)})
+                    if e.entry is not None:
+                        result['server'] = serialize_entry(e.entry)
+                else:
+                    self._remember(entry)
+                    result.update({'status': status, 'id': entry.id, 'version': entry.version})
+                results.append(result)
+
+            failed = any(result['status'] in ('error', 'conflict') for result in results)
+            if failed and not allow_partial:
+                transaction.set_rollback(True)
+                for result in results:
+                    if result['status'] == 'applied':
+                        result['status'] = 'rolled_back'
+        return results
+
+
+def changes_since(user, cursor=None, limit=DELTA_PAGE_SIZE):
+    """Entries changed after ``cursor``; returns ``(entries, next_cursor, has_more)``"""
+    read_at = timezone.now()
+    entries = TimeEntry.objects.filter(user=user)
+    if cursor:
+        updated_at, entry_id = decode_cursor(cursor)
+        entries = entries.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=entry_id))
+    page = list(entries.order_by('updated_at', 'id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    if has_more:
+        last = page[-1]
+        next_cursor = encode_cursor(last.updated_at, last.id)
+    else:
+        next_cursor = encode_cursor(read_at - CURSOR_OVERLAP)
+    return page, next_cursor, has_more
+
+
+def sync(user, operations, cursor=None, allow_partial=True):
+    """Apply a batch of operations and return results plus the delta since ``cursor``"""
+    if cursor:
+        # Reject a bad cursor before writing anything
+        updated_at, _ = decode_cursor(cursor)
+        if ArchivedTimeEntry.objects.filter(user=user, is_deleted=True, updated_at__gte=updated_at).exists():
+            raise CursorExpired('Cursor expired, sync again without a cursor')
+    results = SyncSession(user, operations).apply(allow_partial=allow_partial)
+    changes, next_cursor, has_more = changes_since(user, cursor)
+    return {
+        'results': results,
+        'changes': [serialize_entry(entry) for entry in changes],
+        'cursor': next_cursor,
+        'has_more': has_more,
+    }
@@ -1,3 +1,228 @@
+import datetime
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import archive, idle, sync
+from .models import (
+    BudgetAlert, Client, DailyRollup, ExchangeRate, Project, Task, TimeEntry, Timer, TrackerNotification, TrackerSettings,
+)
+
+
+class CascadeDeleteTests(TestCase):
+    """Deleting an owner of time entries must not re-create rollups for it"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('tracker', password='secret')
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.project = Project.objects.create(
+            user=self.user, client=self.client_obj, name='Site', budget_hours=Decimal('1'),
+        )
+        self.task = Task.objects.create(user=self.user, project=self.project, name='Build')
+        start = timezone.now() - datetime.timedelta(days=3)
+        for day in range(3):
+            TimeEntry.objects.create(
+                user=self.user, task=self.task,
+                start_time=start + datetime.timedelta(days=day),
+                end_time=start + datetime.timedelta(days=day, hours=2),
+            )
+        self.assertTrue(BudgetAlert.objects.filter(project=self.project).exists())
+
+    def test_delete_client_with_entries(self):
+        self.client_obj.delete()
+        self.assertFalse(Project.objects.exists())
+        self.assertFalse(DailyRollup.objects.exists())
+        self.assertFalse(BudgetAlert.objects.exists())
+
+    def test_delete_task_with_entries(self):
+        self.task.delete()
+        self.assertFalse(DailyRollup.objects.exists())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.tracked_seconds, 0)
+
+    def test_delete_user_with_entries(self):
+        self.user.delete()
+        self.assertFalse(DailyRollup.objects.exists())
+        self.assertFalse(TimeEntry.objects.exists())
+
+
+class RateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rates', password='secret')
+        self.client.force_login(self.user)
+        self.client_obj = Client.objects.create(user=self.user, name='Acme', hourly_rate=Decimal('100.00'))
+        self.own_rate = Project.objects.create(
+            user=self.user, client=self.client_obj, name='Own rate', hourly_rate=Decimal('150.00'),
+        )
+        self.inherited = Project.objects.create(user=self.user, client=self.client_obj, name='Inherited')
+        start = timezone.now() - datetime.timedelta(days=5)
+        for project in (self.own_rate, self.inherited):
+            task = Task.objects.create(user=self.user, project=project, name='Work')
+            TimeEntry.objects.create(
+                user=self.user, task=task, start_time=start, end_time=start + datetime.timedelta(hours=1),
+            )
+
+    def edit_client_rate(self, rate):
+        response = self.client.put(
+            reverse('time_tracker:api_client_detail', args=[self.client_obj.id]),
+            json.dumps({'hourly_rate': rate}), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_client_rate_change_keeps_project_rates(self):
+        self.edit_client_rate('120.00')
+        self.assertEqual(self.own_rate.get_total_revenue(), Decimal('150.00'))
+        # Past entries of projects inheriting the client rate keep the old rate
+        self.assertEqual(self.inherited.get_total_revenue(), Decimal('100.00'))
+
+    def test_exchange_rates_are_staff_only(self):
+        url = reverse('time_tracker:api_exchange_rates')
+        data = json.dumps({'base': 'usd', 'quote': 'eur', 'rate': '0.9'})
+        self.assertEqual(self.client.post(url, data, content_type='application/json').status_code, 403)
+        self.assertFalse(ExchangeRate.objects.exists())
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.post(url, data, content_type='application/json').status_code, 200)
+        self.assertTrue(ExchangeRate.objects.filter(base='USD', quote='EUR').exists())
+
+
+class ImportRuleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('importer', password='secret')
+        self.client.force_login(self.user)
+        client = Client.objects.create(user=self.user, name='Acme')
+        project = Project.objects.create(user=self.user, client=client, name='Site')
+        self.task = Task.objects.create(user=self.user, project=project, name='Build')
+
+    def post_rules(self, rules):
+        upload = SimpleUploadedFile('entries.csv', b'date,start,end,task\n2024-01-02,09:00,10:00,Build\n')
+        return self.client.post(reverse('time_tracker:api_time_entries_import'), {
+            'file': upload, 'rules': json.dumps(rules),
+        })
+
+    def test_invalid_rules_are_rejected(self):
+        for rules, message in (
+            ([{'pattern': '(', 'task_id': self.task.id}], 'Rule 1 has an invalid pattern'),
+            ([{'pattern': 'x', 'task_id': self.task.id}, {'task_id': self.task.id}], 'Rule 2 needs a "pattern"'),
+            ([{'pattern': 'x', 'task_id': 'abc'}], 'Rule 1 refers to unknown task'),
+            ({'pattern': 'x'}, 'Rules must be a list'),
+        ):
+            response = self.post_rules(rules)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(message, response.json()['error'])
+
+    def test_valid_rule(self):
+        response = self.post_rules([{'pattern': 'build', 'task_id': self.task.id}])
+        self.assertEqual(response.status_code, 200)
+
+
+class SyncCursorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('syncer', password='secret')
+        client = Client.objects.create(user=self.user, name='Acme')
+        project = Project.objects.create(user=self.user, client=client, name='Site')
+        task = Task.objects.create(user=self.user, project=project, name='Build')
+        start = timezone.now() - datetime.timedelta(days=60)
+        for hour in range(5):
+            TimeEntry.objects.create(
+                user=self.user, task=task,
+                start_time=start + datetime.timedelta(hours=hour),
+                end_time=start + datetime.timedelta(hours=hour, minutes=30),
+            )
+        # Entries last touched long ago
+        TimeEntry.objects.filter(user=self.user).update(updated_at=start)
+        self.entries = list(TimeEntry.objects.filter(user=self.user).order_by('id'))
+
+    def test_page_through_old_history(self):
+        seen = []
+        changes, cursor, has_more = sync.changes_since(self.user, None, limit=2)
+        seen += [entry.id for entry in changes]
+        while has_more:
+            result = sync.sync(self.user, [], cursor=cursor)
+            seen += [change['id'] for change in result['changes']]
+            cursor, has_more = result['cursor'], result['has_more']
+        self.assertEqual(sorted(seen), [entry.id for entry in self.entries])
+
+    def test_cursor_older_than_archived_tombstone_expires(self):
+        _, cursor, _ = sync.changes_since(self.user, None, limit=2)
+        # Deleted after the cursor was issued, then archived
+        deleted_at = timezone.now() - archive.deleted_retention() - datetime.timedelta(days=1)
+        TimeEntry.objects.filter(pk=self.entries[-1].pk).update(is_deleted=True, updated_at=deleted_at)
+        self.assertEqual(archive.archive_entries(), 1)
+        with self.assertRaises(sync.CursorExpired):
+            sync.sync(self.user, [], cursor=cursor)
+        # A cursor issued after the archived tombstone keeps working
+        _, cursor, _ = sync.changes_since(self.user, None)
+        sync.sync(self.user, [], cursor=cursor)
+
+
+class ForecastWindowTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('forecaster', password='secret')
+        self.client.force_login(self.user)
+        client = Client.objects.create(user=self.user, name='Acme')
+        self.project = Project.objects.create(user=self.user, client=client, name='Site', budget_hours=Decimal('10'))
+
+    def test_invalid_window(self):
+        urls = (
+            reverse('time_tracker:api_forecast'),
+            reverse('time_tracker:api_project_forecast', args=[self.project.id]),
+        )
+        for url in urls:
+            for window in ('abc', '0', '-3', '366'):
+                self.assertEqual(self.client.get(url, {'window': window}).status_code, 400)
+            self.assertEqual(self.client.get(url, {'window': '30'}).status_code, 200)
+
+
+class IdleSettingsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('idler', password='secret')
+        self.client.force_login(self.user)
+        self.url = reverse('time_tracker:api_settings')
+
+    def put(self, data):
+        return self.client.put(self.url, json.dumps(data), content_type='application/json')
+
+    def test_get_does_not_create_settings(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['idle_action'], 'cap')
+        self.assertFalse(TrackerSettings.objects.exists())
+
+    def test_invalid_max_timer_hours(self):
+        for value in ('abc', 'NaN', '0.1', '5000'):
+            self.assertEqual(self.put({'max_timer_hours': value}).status_code, 400)
+        self.assertFalse(TrackerSettings.objects.exists())
+        self.assertEqual(self.put({'max_timer_hours': '8', 'idle_action': 'notify'}).status_code, 200)
+        self.assertEqual(TrackerSettings.objects.get(user=self.user).max_timer_hours, Decimal('8'))
+
+    def test_notify_once_per_timer(self):
+        TrackerSettings.objects.create(user=self.user, max_timer_hours=Decimal('1'), idle_action='notify')
+        client = Client.objects.create(user=self.user, name='Acme')
+        project = Project.objects.create(user=self.user, client=client, name='Site')
+        task = Task.objects.create(user=self.user, project=project, name='Build')
+        Timer.objects.create(user=self.user, task=task, start_time=timezone.now() - datetime.timedelta(hours=3))
+        self.assertEqual(idle.reconcile()['notified'], 1)
+        self.assertEqual(idle.reconcile()['notified'], 0)
+        self.assertEqual(TrackerNotification.objects.filter(user=self.user, kind='idle_timer').count(), 1)
+
+
+class InvoiceTaxRateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('biller', password='secret')
+        self.client.force_login(self.user)
+        Client.objects.create(user=self.user, name='Acme')
 
-# Create your tests here.
+    def test_invalid_tax_rate(self):
+        url = reverse('time_tracker:api_invoices')
+        period = {'period_start': '2024-01-01', 'period_end': '2024-01-31'}
+        for tax_rate in ('abc', 'NaN', '-5', '150'):
+            response = self.client.post(url, json.dumps({**period, 'tax_rate': tax_rate}), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, json.dumps({**period, 'tax_rate': '19'}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
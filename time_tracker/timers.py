@@ -0,0 +1,137 @@
+"""
+Race-free timer transitions with idempotency keys.
+
+Start and stop run in one transaction that first locks the user's row, so
+requests from several tabs and devices are applied one after another
+instead of interleaving ``get`` / ``stop`` / ``create``. Stopping claims the
+timer with a conditional delete (see ``Timer.stop``), so at most one entry
+is created per timer.
+
+Clients may send an ``Idempotency-Key`` header (or ``idempotency_key`` in
+the body). The response of the first request with a key is stored in
+``TimerOperation`` inside the same transaction and replayed for retries, so
+a retried start or stop never creates a second timer or entry.
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import realtime
+from .models import Timer, TimerOperation
+
+KEY_RETENTION = timedelta(hours=24)
+
+
+class TimerConflict(Exception):
+    """Raised when a timer transition cannot be applied"""
+
+    def __init__(self, message, status=409):
+        super().__init__(message)
+        self.status = status
+
+
+def _lock_user(user):
+    """Serialize timer transitions of one user (no-op lock on SQLite)"""
+    User.objects.select_for_update().filter(pk=user.pk).first()
+
+
+def _entry_result(entry):
+    return {
+        'success': True,
+        'entry_id': entry.id if entry else None,
+        'duration': entry.get_duration_formatted() if entry else None,
+        'revenue': str(entry.get_revenue()) if entry else None,
+    }
+
+
+def start_timer(user, task, description=''):
+    """Stop a running timer (keeping its time) and start a new one"""
+    with transaction.atomic():
+        _lock_user(user)
+        existing = Timer.objects.filter(user=user).first()
+        if existing is not None:
+            entry = existing.stop()
+            realtime.publish_timer_stopped(user.id, entry)
+        try:
+            with transaction.atomic():
+                timer = Timer.objects.create(
+                    user=user,
+                    task=task,
+                    start_time=timezone.now(),
+                    description=description,
+                )
+        except IntegrityError:
+            # Another device started a timer between our stop and create
+            raise TimerConflict('Timer was started concurrently, please retry')
+        realtime.publish_timer_started(timer)
+
+    return {
+        'id': timer.id,
+        'task_id': task.id,
+        'task_name': task.name,
+        'project_name': task.project.name,
+        'client_name': task.project.client.name,
+        'start_time': timer.start_time.isoformat(),
+    }
+
+
+def stop_timer(user, description=None):
+    """Stop the running timer and return the created entry's summary"""
+    with transaction.atomic():
+        _lock_user(user)
+        timer = Timer.objects.filter(user=user).first()
+        if timer is None:
+            raise TimerConflict('No active timer', status=400)
+        entry = timer.stop(description=description)
+        if entry is None:
+            raise TimerConflict('No active timer', status=400)
+        realtime.publish_timer_stopped(user.id, entry)
+    return _entry_result(entry)
+
+
+def idempotency_key(request, data):
+    key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    return str(key)[:100] if key else None
+
+
+def _replay(operation, action):
+    if operation.action != action:
+        return 422, {'error': 'Idempotency key was already used for another operation'}
+    return operation.status_code, operation.response
+
+
+def run(user, key, action, operation):
+    """Run ``operation`` once per key; returns ``(status, payload)``
+
+    ``operation`` returns the response payload or raises ``TimerConflict``.
+    Failures are stored too, so a retry sees the same answer.
+    """
+    def execute():
+        try:
+            return 200, operation()
+        except TimerConflict as e:
+            return e.status, {'error': str(e)}
+
+    if not key:
+        return execute()
+
+    existing = TimerOperation.objects.filter(user=user, key=key).first()
+    if existing is not None:
+        return _replay(existing, action)
+
+    try:
+        with transaction.atomic():
+            status, payload = execute()
+            TimerOperation.objects.create(user=user, key=key, action=action, status_code=status, response=payload)
+    except IntegrityError:
+        # A concurrent retry with the same key won; its transaction was applied instead
+        existing = TimerOperation.objects.filter(user=user, key=key).first()
+        if existing is None:
+            raise
+        return _replay(existing, action)
+
+    TimerOperation.objects.filter(user=user, created_at__lt=timezone.now() - KEY_RETENTION).delete()
+    return status, payload
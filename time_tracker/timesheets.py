@@ -0,0 +1,211 @@
+"""
+Scheduled timesheet reports.
+
+A ``ReportSchedule`` sends the timesheet of all clients or of one client
+every week or month. ``run_due`` is called by the in-process scheduler: it
+claims due schedules with a conditional UPDATE of ``next_run_at`` (so two
+schedulers never send the same period twice), records a ``ReportDelivery``
+for the last complete period and hands it to the background pool. The
+worker builds the timesheet from ``DailyRollup`` through the report engine,
+renders HTML and PDF, stores both in storage_app and emails them. Web
+requests only ever queue deliveries.
+"""
+
+import datetime
+import logging
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from overhead import background
+from storage_app.models import StorageFile, StorageFolder
+
+from . import reports
+from .models import ReportDelivery, ReportSchedule
+from .pdf import SimplePDF, MARGIN
+
+logger = logging.getLogger(__name__)
+
+SEND_HOUR = 6  # Local time on Mondays (weekly) and the 1st (monthly)
+STORAGE_FOLDER = 'Timesheets'
+
+
+def period_for(frequency, day):
+    """Last complete week (Monday to Sunday) or month before ``day``"""
+    if frequency == 'monthly':
+        end = day.replace(day=1) - datetime.timedelta(days=1)
+        return end.replace(day=1), end
+    start = day - datetime.timedelta(days=day.weekday() + 7)
+    return start, start + datetime.timedelta(days=6)
+
+
+def next_run_after(frequency, moment):
+    """First send time after ``moment``"""
+    day = timezone.localtime(moment).date()
+    while True:
+        if (day.day == 1) if frequency == 'monthly' else (day.weekday() == 0):
+            run_at = timezone.make_aware(datetime.datetime.combine(day, datetime.time(SEND_HOUR)))
+            if run_at > moment:
+                return run_at
+        day += datetime.timedelta(days=1)
+
+
+def build_timesheet(schedule, period_start, period_end):
+    """Timesheet rows per day and task plus project totals, from the daily rollups"""
+    params = {
+        'dimensions': 'day,client,project,task',
+        'measures': 'hours,revenue',
+        'date_from': period_start.isoformat(),
+        'date_to': period_end.isoformat(),
+    }
+    if schedule.client_id:
+        params['client_id'] = str(schedule.client_id)
+    report = reports.build_report(schedule.user, reports.parse_params(params))
+
+    projects = OrderedDict()
+    for row in sorted(report['rows'], key=lambda row: (row['client'], row['project'])):
+        project = projects.setdefault(row['project_id'], {
+            'client': row['client'], 'project': row['project'], 'hours': 0, 'revenue': Decimal('0'),
+        })
+        project['hours'] += row['hours']
+        project['revenue'] += Decimal(row['revenue'])
+    for project in projects.values():
+        project['hours'] = round(project['hours'], 2)
+
+    user = schedule.user
+    return {
+        'title': f"Timesheet {period_start:%d.%m.%Y} - {period_end:%d.%m.%Y}",
+        'owner': user.get_full_name() or user.username,
+        'client': schedule.client.name if schedule.client_id else None,
+        'period_start': period_start,
+        'period_end': period_end,
+        'currency': report['currency'],
+        'rows': report['rows'],
+        'projects': list(projects.values()),
+        'totals': report['totals'],
+        'missing_exchange_rates': report['missing_exchange_rates'],
+    }
+
+
+def render_html(timesheet):
+    return render_to_string('time_tracker/timesheet_report.html', timesheet)
+
+
+def render_pdf(timesheet):
+    pdf = SimplePDF(title=timesheet['title'])
+    pdf.line((MARGIN, 'TIMESHEET'), size=20, font='bold', spacing=24)
+    pdf.line((MARGIN, timesheet['owner']), (380, f"Period: {timesheet['period_start']:%d.%m.%Y} - {timesheet['period_end']:%d.%m.%Y}"))
+    if timesheet['client']:
+        pdf.line((MARGIN, f"Client: {timesheet['client']}"))
+    pdf.skip(16)
+
+    columns = (MARGIN, 120, 430, 490)
+    pdf.line(*zip(columns, ('Date', 'Client / Project / Task', 'Hours', f"Amount ({timesheet['currency']})")), font='bold')
+    pdf.rule()
+    for row in timesheet['rows']:
+        label = f"{row['client']} / {row['project']} / {row['task']}"
+        pdf.line(*zip(columns, (row['day'], label[:55], f"{row['hours']:.2f}", row['revenue'])))
+    pdf.rule()
+
+    pdf.skip(10)
+    pdf.line((MARGIN, 'Per project'), font='bold')
+    for project in timesheet['projects']:
+        pdf.line(*zip(columns, ('', f"{project['client']} / {project['project']}"[:55],
+                                f"{project['hours']:.2f}", f"{project['revenue']:.2f}")))
+    pdf.rule()
+    pdf.line((MARGIN, 'Total'), (430, f"{timesheet['totals']['hours']:.2f}"), (490, timesheet['totals']['revenue']), font='bold')
+    return pdf.render()
+
+
+def _store(user, name, content, mime_type):
+    folder, _ = StorageFolder.objects.get_or_create(user=user, parent=None, name=STORAGE_FOLDER)
+    stored = StorageFile(user=user, folder=folder, name=name, mime_type=mime_type)
+    stored.file.save(name, ContentFile(content), save=False)
+    stored.save()
+    return stored
+
+
+def deliver(delivery_id):
+    """Background job: render, store and email one timesheet"""
+    # Claim the delivery so a duplicate job for it does nothing
+    claimed = ReportDelivery.objects.filter(pk=delivery_id, status__in=('pending', 'failed')).update(status='sending')
+    if not claimed:
+        return None
+    delivery = ReportDelivery.objects.select_related(
+        'schedule__user', 'schedule__client', 'html_file', 'pdf_file'
+    ).get(pk=delivery_id)
+    schedule = delivery.schedule
+    try:
+        recipients = schedule.get_recipients()
+        if not recipients:
+            raise ValueError('No recipients: add recipients or an email address to the account')
+        timesheet = build_timesheet(schedule, delivery.period_start, delivery.period_end)
+        html = render_html(timesheet)
+        pdf_content = render_pdf(timesheet)
+
+        base_name = f"timesheet-{delivery.period_start:%Y-%m-%d}-{delivery.period_end:%Y-%m-%d}"
+        if schedule.client_id:
+            base_name += f"-client-{schedule.client_id}"
+        # A retry replaces the files stored by the failed attempt
+        for stored in (delivery.html_file, delivery.pdf_file):
+            if stored:
+                stored.delete()
+        delivery.html_file = delivery.pdf_file = None
+        delivery.html_file = _store(schedule.user, f"{base_name}.html", html.encode(), 'text/html')
+        delivery.pdf_file = _store(schedule.user, f"{base_name}.pdf", pdf_content, 'application/pdf')
+
+        message = EmailMultiAlternatives(
+            subject=timesheet['title'] + (f" - {timesheet['client']}" if timesheet['client'] else ''),
+            body=(f"{timesheet['title']}\n\nTotal: {timesheet['totals']['hours']:.2f} hours, "
+                  f"{timesheet['totals']['revenue']} {timesheet['currency']}\n"),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=recipients,
+        )
+        message.attach_alternative(html, 'text/html')
+        message.attach(f"{base_name}.pdf", pdf_content, 'application/pdf')
+        message.send()
+    except Exception as exc:
+        logger.exception('Timesheet delivery %s failed', delivery_id)
+        delivery.status = 'failed'
+        delivery.error = str(exc)
+        delivery.save(update_fields=['status', 'error', 'html_file', 'pdf_file'])
+        return delivery
+
+    delivery.status = 'sent'
+    delivery.error = ''
+    delivery.sent_at = timezone.now()
+    delivery.save(update_fields=['status', 'error', 'html_file', 'pdf_file', 'sent_at'])
+    return delivery
+
+
+def queue(schedule, period_start, period_end):
+    """Record the delivery of a period and render it in the background unless already sent"""
+    delivery, _ = ReportDelivery.objects.get_or_create(
+        schedule=schedule, period_start=period_start, defaults={'period_end': period_end}
+    )
+    if delivery.status in ('pending', 'failed'):
+        background.submit_on_commit(deliver, delivery.id)
+    return delivery
+
+
+def run_due(now=None):
+    """Scheduler job: queue deliveries of all due schedules; returns how many were queued"""
+    now = now or timezone.now()
+    queued = 0
+    for schedule in ReportSchedule.objects.filter(is_active=True, next_run_at__lte=now):
+        with transaction.atomic():
+            claimed = ReportSchedule.objects.filter(pk=schedule.pk, next_run_at=schedule.next_run_at).update(
+                next_run_at=next_run_after(schedule.frequency, now), last_run_at=now,
+            )
+            if not claimed:
+                continue
+            # The period follows the planned run, so late runs still send the period that was due
+            queue(schedule, *period_for(schedule.frequency, timezone.localtime(schedule.next_run_at).date()))
+            queued += 1
+    return queued
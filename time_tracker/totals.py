@@ -0,0 +1,67 @@
+"""
+Batched hour and revenue totals for listings.
+
+Totals of many clients, projects or tasks are read from ``DailyRollup`` with
+one grouped query per listing instead of one query (or one entry scan) per
+row. Running entries are not in the rollups yet; their elapsed time is added
+from a single query over the user's unfinished entries.
+"""
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import DailyRollup, TimeEntry
+
+CENT = Decimal('0.01')
+
+# Group -> (rollup field, time entry field)
+GROUPS = {
+    'task': ('task_id', 'task_id'),
+    'project': ('project_id', 'task__project_id'),
+    'client': ('project__client_id', 'task__project__client_id'),
+}
+
+
+def running_seconds(user, group, ids=None):
+    """Elapsed seconds of running entries per group id"""
+    entry_field = GROUPS[group][1]
+    entries = TimeEntry.objects.filter(user=user, is_deleted=False, end_time__isnull=True)
+    if ids is not None:
+        entries = entries.filter(**{f'{entry_field}__in': ids})
+    now = timezone.now()
+    totals = defaultdict(float)
+    for key, start in entries.values_list(entry_field, 'start_time'):
+        totals[key] += (now - start).total_seconds()
+    return totals
+
+
+def total_hours(user, group, ids=None):
+    """Tracked hours per group id, including running entries"""
+    rollup_field = GROUPS[group][0]
+    rollups = DailyRollup.objects.filter(user=user)
+    if ids is not None:
+        rollups = rollups.filter(**{f'{rollup_field}__in': ids})
+    seconds = running_seconds(user, group, ids)
+    for key, value in rollups.values(rollup_field).annotate(total=Sum('seconds')).values_list(rollup_field, 'total'):
+        seconds[key] += value
+    return {key: value / 3600 for key, value in seconds.items()}
+
+
+def total_revenue(user, group, currencies):
+    """Billable revenue per group id in the currency given by ``currencies[id]``"""
+    from .rates import RateResolver
+
+    rollup_field = GROUPS[group][0]
+    rows = list(DailyRollup.objects.filter(
+        user=user, billable_seconds__gt=0, **{f'{rollup_field}__in': list(currencies)}
+    ).values_list(rollup_field, 'task_id', 'day', 'billable_seconds'))
+
+    resolver = RateResolver(user)
+    resolver.prefetch_tasks({task_id for _, task_id, _, _ in rows})
+    totals = defaultdict(Decimal)
+    for key, task_id, day, seconds in rows:
+        totals[key] += resolver.seconds_revenue(task_id, day, seconds, currencies[key])
+    return {key: value.quantize(CENT, ROUND_HALF_UP) for key, value in totals.items()}
@@ -13,20 +13,47 @@ urlpatterns = [
     
     # Project APIs
     path('api/projects/', views.api_projects, name='api_projects'),
+    path('api/projects/<int:project_id>/forecast/', views.api_project_forecast, name='api_project_forecast'),
+    path('api/forecast/', views.api_forecast, name='api_forecast'),
+    path('api/budget-alerts/', views.api_budget_alerts, name='api_budget_alerts'),
     
     # Task APIs
     path('api/tasks/', views.api_tasks, name='api_tasks'),
+    path('api/tasks/picker/', views.api_task_picker, name='api_task_picker'),
     
     # Timer APIs
     path('api/timer/start/', views.api_timer_start, name='api_timer_start'),
     path('api/timer/stop/', views.api_timer_stop, name='api_timer_stop'),
     path('api/timer/status/', views.api_timer_status, name='api_timer_status'),
+    path('api/timer/events/', views.api_timer_events, name='api_timer_events'),
     
     # Time Entry APIs
     path('api/entries/', views.api_time_entries, name='api_time_entries'),
+    path('api/entries/import/', views.api_time_entries_import, name='api_time_entries_import'),
+    path('api/entries/sync/', views.api_time_entries_sync, name='api_time_entries_sync'),
     path('api/entries/<int:entry_id>/', views.api_time_entry_detail, name='api_time_entry_detail'),
     
     # Statistics APIs
     path('api/statistics/', views.api_statistics, name='api_statistics'),
     path('api/timeline/', views.api_timeline, name='api_timeline'),
+    path('api/timeline/range/', views.api_timeline_range, name='api_timeline_range'),
+    path('api/timeline/gaps/', views.api_timeline_gaps, name='api_timeline_gaps'),
+    path('api/reports/', views.api_reports, name='api_reports'),
+    path('api/report-schedules/', views.api_report_schedules, name='api_report_schedules'),
+    path('api/report-schedules/<int:schedule_id>/', views.api_report_schedule_detail, name='api_report_schedule_detail'),
+    path('api/report-schedules/<int:schedule_id>/send/', views.api_report_schedule_send, name='api_report_schedule_send'),
+    
+    # Settings & notifications
+    path('api/settings/', views.api_settings, name='api_settings'),
+    path('api/notifications/', views.api_notifications, name='api_notifications'),
+    
+    # Rate APIs
+    path('api/rates/', views.api_rate_schedules, name='api_rate_schedules'),
+    path('api/rates/<int:schedule_id>/', views.api_rate_schedule_detail, name='api_rate_schedule_detail'),
+    path('api/exchange-rates/', views.api_exchange_rates, name='api_exchange_rates'),
+    
+    # Invoice APIs
+    path('api/invoices/', views.api_invoices, name='api_invoices'),
+    path('api/invoices/<int:invoice_id>/', views.api_invoice_detail, name='api_invoice_detail'),
+    path('api/invoices/<int:invoice_id>/pdf/', views.api_invoice_pdf, name='api_invoice_pdf'),
 ]
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""
+Per-user cache versions.
+
+Derived data such as reports and the task picker is cached under keys that
+contain a version number. Bumping the version after commit makes every
+older entry unreachable, so nothing has to be found and deleted.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _key(namespace, scope):
+    return f"time_tracker:{namespace}-version:{scope}"
+
+
+def get(namespace, scope):
+    """Current version of ``namespace`` for a user id (or ``'all'``)"""
+    return cache.get_or_set(_key(namespace, scope), 1, None)
+
+
+def bump(namespace, scope):
+    """Increment the version once the current transaction commits"""
+    def increment():
+        key = _key(namespace, scope)
+        if cache.add(key, 2, None):
+            return
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, None)
+    transaction.on_commit(increment)
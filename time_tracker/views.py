@@ -1,14 +1,19 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Sum, Q, F
+from django.views.decorators.http import condition
+from django.db.models import Sum, Q, F, Count
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 from decimal import Decimal
+import hashlib
 import json
 
-from .models import Client, Project, Task, TimeEntry, Timer
+from overhead.events import sse_response
+
+from .models import Client, Project, Task, TimeEntry, Invoice, BudgetAlert, RateSchedule, ExchangeRate, TrackerSettings, TrackerNotification, ReportSchedule
+from . import invoicing, importers, realtime, intervals, forecasting, rates, timers, sync, reports, totals, idle, picker, timesheets
 
 
 @login_required
@@ -23,7 +28,13 @@ def tracker_view(request):
 def api_clients(request):
     """API for client operations"""
     if request.method == 'GET':
-        clients = Client.objects.filter(user=request.user, is_active=True)
+        clients = list(Client.objects.filter(user=request.user, is_active=True).annotate(
+            active_project_count=Count('projects', filter=Q(projects__status='active'))
+        ))
+        ids = [client.id for client in clients]
+        hours = totals.total_hours(request.user, 'client', ids)
+        revenue = totals.total_revenue(request.user, 'client', {client.id: client.currency for client in clients})
+        
         clients_data = []
         for client in clients:
             clients_data.append({
@@ -32,10 +43,11 @@ def api_clients(request):
                 'company': client.company,
                 'email': client.email,
                 'hourly_rate': str(client.hourly_rate),
+                'currency': client.currency,
                 'color': client.color,
-                'total_hours': round(client.get_total_hours(), 2),
-                'total_revenue': str(client.get_total_revenue()),
-                'project_count': client.projects.filter(status='active').count(),
+                'total_hours': round(hours.get(client.id, 0), 2),
+                'total_revenue': str(revenue.get(client.id, Decimal('0.00'))),
+                'project_count': client.active_project_count,
             })
         return JsonResponse({'clients': clients_data})
     
@@ -49,6 +61,7 @@ def api_clients(request):
             phone=data.get('phone', ''),
             address=data.get('address', ''),
             hourly_rate=Decimal(data.get('hourly_rate', '100.00')),
+            currency=data.get('currency', 'EUR').upper(),
             color=data.get('color', '#1E3A5F')
         )
         return JsonResponse({
@@ -74,6 +87,7 @@ def api_client_detail(request, client_id):
             'phone': client.phone,
             'address': client.address,
             'hourly_rate': str(client.hourly_rate),
+            'currency': client.currency,
             'color': client.color,
             'is_active': client.is_active,
         })
@@ -86,7 +100,12 @@ def api_client_detail(request, client_id):
         client.phone = data.get('phone', client.phone)
         client.address = data.get('address', client.address)
         if 'hourly_rate' in data:
-            client.hourly_rate = Decimal(data['hourly_rate'])
+            new_rate = Decimal(data['hourly_rate'])
+            # Keep past revenue at the old rate
+            rates.record_rate_change(request.user, client.hourly_rate, new_rate, client=client)
+            client.hourly_rate = new_rate
+        if 'currency' in data:
+            client.currency = data['currency'].upper()
         client.color = data.get('color', client.color)
         client.save()
         return JsonResponse({'success': True})
@@ -113,9 +132,13 @@ def api_projects(request):
             projects = projects.filter(client_id=client_id)
         if status:
             projects = projects.filter(status=status)
+        projects = list(projects.select_related('client'))
+        hours = totals.total_hours(request.user, 'project', [project.id for project in projects])
+        revenue = totals.total_revenue(request.user, 'project', {project.id: project.client.currency for project in projects})
         
         projects_data = []
         for project in projects:
+            budget_percentage = project.get_budget_percentage()
             projects_data.append({
                 'id': project.id,
                 'client_id': project.client.id,
@@ -127,9 +150,9 @@ def api_projects(request):
                 'budget_hours': str(project.budget_hours) if project.budget_hours else None,
                 'status': project.status,
                 'color': project.color,
-                'total_hours': round(project.get_total_hours(), 2),
-                'total_revenue': str(project.get_total_revenue()),
-                'budget_percentage': float(project.get_budget_percentage()) if project.get_budget_percentage() else None,
+                'total_hours': round(hours.get(project.id, 0), 2),
+                'total_revenue': str(revenue.get(project.id, Decimal('0.00'))),
+                'budget_percentage': float(budget_percentage) if budget_percentage else None,
             })
         return JsonResponse({'projects': projects_data})
     
@@ -157,6 +180,78 @@ def api_projects(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
+def parse_window(request):
+    """Read the ``window`` (days of recent burn) query parameter"""
+    try:
+        window_days = int(request.GET.get('window', forecasting.DEFAULT_WINDOW_DAYS))
+    except ValueError:
+        window_days = 0
+    if not 1 <= window_days <= forecasting.MAX_WINDOW_DAYS:
+        raise ValueError(f'window must be a number of days between 1 and {forecasting.MAX_WINDOW_DAYS}')
+    return window_days
+
+
+@login_required
+def api_project_forecast(request, project_id):
+    """Burn-down series and budget forecast for a project"""
+    project = get_object_or_404(Project.objects.select_related('client'), id=project_id, user=request.user)
+    try:
+        window_days = parse_window(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    data = forecasting.forecast_projects([project], window_days)[0]
+    data['burn_down'] = forecasting.burn_down(project)
+    data['alerts'] = [{
+        'threshold': alert.threshold,
+        'crossed_at': alert.crossed_at.isoformat(),
+    } for alert in project.budget_alerts.all()]
+    return JsonResponse(data)
+
+
+@login_required
+def api_forecast(request):
+    """Budget forecasts for all active projects with a budget"""
+    try:
+        window_days = parse_window(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    projects = Project.objects.filter(
+        user=request.user,
+        status='active',
+        budget_hours__isnull=False,
+    ).select_related('client')
+    
+    forecasts = forecasting.forecast_projects(projects, window_days)
+    forecasts.sort(key=lambda f: (f['days_remaining'] is None, f['days_remaining'] or 0))
+    return JsonResponse({'forecasts': forecasts})
+
+
+@login_required
+def api_budget_alerts(request):
+    """List unacknowledged budget alerts, or acknowledge them"""
+    alerts = BudgetAlert.objects.filter(user=request.user, is_acknowledged=False)
+    
+    if request.method == 'GET':
+        return JsonResponse({'alerts': [{
+            'id': alert.id,
+            'project_id': alert.project_id,
+            'project_name': alert.project.name,
+            'threshold': alert.threshold,
+            'hours_at_crossing': str(alert.hours_at_crossing),
+            'crossed_at': alert.crossed_at.isoformat(),
+        } for alert in alerts.select_related('project')]})
+    
+    elif request.method == 'POST':
+        data = json.loads(request.body) if request.body else {}
+        if data.get('ids'):
+            alerts = alerts.filter(id__in=data['ids'])
+        count = alerts.update(is_acknowledged=True)
+        return JsonResponse({'success': True, 'acknowledged': count})
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
 # ==================== TASK APIs ====================
 
 @login_required
@@ -168,6 +263,8 @@ def api_tasks(request):
         tasks = Task.objects.filter(user=request.user)
         if project_id:
             tasks = tasks.filter(project_id=project_id)
+        tasks = list(tasks.select_related('project__client'))
+        hours = totals.total_hours(request.user, 'task', [task.id for task in tasks])
         
         tasks_data = []
         for task in tasks:
@@ -179,7 +276,7 @@ def api_tasks(request):
                 'name': task.name,
                 'description': task.description,
                 'estimated_hours': str(task.estimated_hours) if task.estimated_hours else None,
-                'total_hours': round(task.get_total_hours(), 2),
+                'total_hours': round(hours.get(task.id, 0), 2),
                 'is_completed': task.is_completed,
                 'display_name': f"{task.project.client.name} > {task.project.name} > {task.name}",
             })
@@ -205,65 +302,66 @@ def api_tasks(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
+def task_picker_etag(request):
+    query = f"{request.GET.get('q', '')}|{request.GET.get('limit', '')}"
+    return f"picker-{request.user.id}-{picker.version(request.user.id)}-{hashlib.md5(query.encode()).hexdigest()[:12]}"
+
+
+@login_required
+@condition(etag_func=task_picker_etag)
+def api_task_picker(request):
+    """Compact, cached task list for the timer picker (?q= searches client > project > task)"""
+    try:
+        limit = min(int(request.GET.get('limit', picker.DEFAULT_LIMIT)), 500)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    
+    items = picker.search(picker.get_index(request.user), request.GET.get('q', ''), limit)
+    response = JsonResponse({'tasks': [{
+        'id': item['id'],
+        'label': item['label'],
+        'project_id': item['project_id'],
+        'color': item['color'],
+        'recent': bool(item['last_used']),
+    } for item in items]})
+    # Let the browser revalidate with If-None-Match instead of refetching
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # ==================== TIMER APIs ====================
 
 @login_required
 def api_timer_start(request):
-    """Start a new timer"""
+    """Start a new timer (idempotent with an Idempotency-Key)"""
     if request.method == 'POST':
-        data = json.loads(request.body)
+        data = json.loads(request.body) if request.body else {}
         task = get_object_or_404(Task, id=data.get('task_id'), user=request.user)
         
-        # Stop any existing timer
-        try:
-            existing_timer = Timer.objects.get(user=request.user)
-            existing_timer.stop()
-        except Timer.DoesNotExist:
-            pass
-        
-        # Create new timer
-        timer = Timer.objects.create(
-            user=request.user,
-            task=task,
-            start_time=timezone.now(),
-            description=data.get('description', ''),
+        status, payload = timers.run(
+            request.user,
+            timers.idempotency_key(request, data),
+            'start',
+            lambda: timers.start_timer(request.user, task, data.get('description', '')),
         )
-        
-        return JsonResponse({
-            'id': timer.id,
-            'task_id': task.id,
-            'task_name': task.name,
-            'project_name': task.project.name,
-            'client_name': task.project.client.name,
-            'start_time': timer.start_time.isoformat(),
-        })
+        return JsonResponse(payload, status=status)
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
 @login_required
 def api_timer_stop(request):
-    """Stop the active timer"""
+    """Stop the active timer (idempotent with an Idempotency-Key)"""
     if request.method == 'POST':
-        try:
-            timer = Timer.objects.get(user=request.user)
-            
-            # Update description if provided in request
-            data = json.loads(request.body) if request.body else {}
-            if 'description' in data:
-                timer.description = data['description']
-                timer.save()
-            
-            entry = timer.stop()
-            
-            return JsonResponse({
-                'success': True,
-                'entry_id': entry.id if entry else None,
-                'duration': entry.get_duration_formatted() if entry else None,
-                'revenue': str(entry.get_revenue()) if entry else None,
-            })
-        except Timer.DoesNotExist:
-            return JsonResponse({'error': 'No active timer'}, status=400)
+        data = json.loads(request.body) if request.body else {}
+        
+        status, payload = timers.run(
+            request.user,
+            timers.idempotency_key(request, data),
+            'stop',
+            lambda: timers.stop_timer(request.user, data.get('description')),
+        )
+        return JsonResponse(payload, status=status)
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
@@ -271,26 +369,35 @@ def api_timer_stop(request):
 @login_required
 def api_timer_status(request):
     """Get current timer status"""
-    try:
-        timer = Timer.objects.get(user=request.user)
-        return JsonResponse({
-            'is_running': True,
-            'timer_id': timer.id,
-            'task_id': timer.task.id,
-            'task_name': timer.task.name,
-            'project_name': timer.task.project.name,
-            'client_name': timer.task.project.client.name,
-            'start_time': timer.start_time.isoformat(),
-            'elapsed': timer.get_elapsed_formatted(),
-            'elapsed_seconds': int(timer.get_elapsed_time()),
-            'description': timer.description,
-        })
-    except Timer.DoesNotExist:
-        return JsonResponse({'is_running': False})
+    timer = realtime.current_timer(request.user)
+    data = realtime.serialize_timer(timer)
+    if timer:
+        data['elapsed'] = timer.get_elapsed_formatted()
+        data['elapsed_seconds'] = int(timer.get_elapsed_time())
+    return JsonResponse(data)
+
+
+@login_required
+async def api_timer_events(request):
+    """Server-Sent Events stream of timer state changes (served via ASGI)"""
+    user = await request.auser()
+    # Computed after subscribing, so a change published meanwhile is not lost
+    return sse_response(realtime.timer_channel(user.id), lambda: realtime.initial_events(user))
 
 
 # ==================== TIME ENTRY APIs ====================
 
+def overlap_response(conflict):
+    return JsonResponse({
+        'error': 'Time entry overlaps an existing entry',
+        'conflict': {
+            'id': conflict.id,
+            'start_time': conflict.start_time.isoformat(),
+            'end_time': conflict.end_time.isoformat() if conflict.end_time else None,
+        },
+    }, status=409)
+
+
 @login_required
 def api_time_entries(request):
     """API for time entries"""
@@ -315,8 +422,11 @@ def api_time_entries(request):
         if client_id:
             entries = entries.filter(task__project__client_id=client_id)
         
+        entries = entries.select_related('task__project__client')[:100]  # Limit to 100 entries
+        resolver = rates.RateResolver(request.user)
+        
         entries_data = []
-        for entry in entries[:100]:  # Limit to 100 entries
+        for entry in entries:
             entries_data.append({
                 'id': entry.id,
                 'task_id': entry.task.id,
@@ -330,7 +440,8 @@ def api_time_entries(request):
                 'description': entry.description,
                 'is_billable': entry.is_billable,
                 'is_billed': entry.is_billed,
-                'revenue': str(entry.get_revenue()),
+                'revenue': str(resolver.entry_revenue(entry)),
+                'currency': entry.task.project.client.currency,
             })
         
         return JsonResponse({'entries': entries_data})
@@ -338,12 +449,18 @@ def api_time_entries(request):
     elif request.method == 'POST':
         data = json.loads(request.body)
         task = get_object_or_404(Task, id=data.get('task_id'), user=request.user)
+        start_time = datetime.fromisoformat(data.get('start_time'))
+        end_time = datetime.fromisoformat(data.get('end_time')) if data.get('end_time') else None
+        
+        conflict = intervals.find_conflict(request.user, start_time, end_time)
+        if conflict:
+            return overlap_response(conflict)
         
         entry = TimeEntry.objects.create(
             user=request.user,
             task=task,
-            start_time=datetime.fromisoformat(data.get('start_time')),
-            end_time=datetime.fromisoformat(data.get('end_time')) if data.get('end_time') else None,
+            start_time=start_time,
+            end_time=end_time,
             description=data.get('description', ''),
             is_billable=data.get('is_billable', True),
         )
@@ -369,6 +486,18 @@ def api_time_entry_detail(request, entry_id):
             entry.end_time = datetime.fromisoformat(data['end_time']) if data['end_time'] else None
         entry.description = data.get('description', entry.description)
         entry.is_billable = data.get('is_billable', entry.is_billable)
+        
+        if 'version' in data and data['version'] != entry.version:
+            return JsonResponse({
+                'error': 'Time entry was changed in the meantime',
+                'version': entry.version,
+            }, status=409)
+        
+        if 'start_time' in data or 'end_time' in data:
+            conflict = intervals.find_conflict(request.user, entry.start_time, entry.end_time, exclude_id=entry.id)
+            if conflict:
+                return overlap_response(conflict)
+        
         entry.save()
         return JsonResponse({'success': True})
     
@@ -380,6 +509,61 @@ def api_time_entry_detail(request, entry_id):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
+@login_required
+def api_time_entries_import(request):
+    """Import time entries from an uploaded CSV or iCalendar file"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    upload = request.FILES.get('file')
+    if not upload:
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+    
+    try:
+        rules = json.loads(request.POST.get('rules') or '[]')
+        rows = importers.parse_file(upload.name, upload.read())
+        matcher = importers.TaskMatcher(request.user, rules, request.POST.get('default_task_id'))
+    except (ValueError, importers.ImportFileError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    report = importers.import_rows(
+        request.user,
+        rows,
+        matcher,
+        dry_run=request.POST.get('dry_run', 'true') == 'true',
+        allow_partial=request.POST.get('allow_partial') == 'true',
+    )
+    return JsonResponse(report)
+
+
+@login_required
+def api_time_entries_sync(request):
+    """Apply a batch of offline changes and return entries changed since the cursor
+    
+    Body: {"cursor": "...", "allow_partial": true, "operations": [
+        {"op": "create", "client_uuid": "...", "fields": {...}},
+        {"op": "update", "id": 1, "version": 3, "fields": {...}},
+        {"op": "delete", "client_uuid": "...", "version": 2}]}
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        result = sync.sync(
+            request.user,
+            data.get('operations', []),
+            cursor=data.get('cursor'),
+            allow_partial=data.get('allow_partial', True),
+        )
+    except sync.CursorExpired as e:
+        return JsonResponse({'error': str(e)}, status=410)
+    except (ValueError, AttributeError, sync.SyncError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse(result)
+
+
 # ==================== STATISTICS APIs ====================
 
 @login_required
@@ -389,22 +573,43 @@ def api_statistics(request):
     week_start = today - timedelta(days=today.weekday())
     month_start = today.replace(day=1)
     
-    entries = TimeEntry.objects.filter(user=request.user, is_deleted=False)
+    # One query for the longest period; the week may start in the previous month
+    entries = list(TimeEntry.objects.filter(
+        user=request.user,
+        is_deleted=False,
+        start_time__date__gte=min(week_start, month_start),
+    ).select_related('task__project__client'))
+    resolver = rates.RateResolver(request.user)
+    currency = rates.base_currency()
+    missing_rates = False
+    
+    def summarize(period_entries):
+        nonlocal missing_rates
+        seconds = Decimal('0')
+        revenue = Decimal('0.00')
+        count = 0
+        for entry in period_entries:
+            count += 1
+            seconds += Decimal(str(entry.get_duration_seconds()))
+            try:
+                revenue += resolver.entry_revenue(entry, currency)
+            except rates.MissingExchangeRate:
+                missing_rates = True
+        return float(seconds), revenue, count
+    
+    def since(day):
+        return [entry for entry in entries if timezone.localtime(entry.start_time).date() >= day]
     
     # Today's stats
-    today_entries = entries.filter(start_time__date=today)
-    today_seconds = sum(e.get_duration_seconds() for e in today_entries)
-    today_revenue = sum(e.get_revenue() for e in today_entries if e.is_billable)
+    today_seconds, today_revenue, today_count = summarize(
+        entry for entry in entries if timezone.localtime(entry.start_time).date() == today
+    )
     
     # Week's stats
-    week_entries = entries.filter(start_time__date__gte=week_start)
-    week_seconds = sum(e.get_duration_seconds() for e in week_entries)
-    week_revenue = sum(e.get_revenue() for e in week_entries if e.is_billable)
+    week_seconds, week_revenue, week_count = summarize(since(week_start))
     
     # Month's stats
-    month_entries = entries.filter(start_time__date__gte=month_start)
-    month_seconds = sum(e.get_duration_seconds() for e in month_entries)
-    month_revenue = sum(e.get_revenue() for e in month_entries if e.is_billable)
+    month_seconds, month_revenue, month_count = summarize(since(month_start))
     
     def format_duration(seconds):
         hours = int(seconds // 3600)
@@ -415,18 +620,20 @@ def api_statistics(request):
         'today': {
             'duration': format_duration(today_seconds),
             'revenue': f'{today_revenue:.2f}',
-            'entries': today_entries.count(),
+            'entries': today_count,
         },
         'week': {
             'duration': format_duration(week_seconds),
             'revenue': f'{week_revenue:.2f}',
-            'entries': week_entries.count(),
+            'entries': week_count,
         },
         'month': {
             'duration': format_duration(month_seconds),
             'revenue': f'{month_revenue:.2f}',
-            'entries': month_entries.count(),
+            'entries': month_count,
         },
+        'currency': currency,
+        'missing_exchange_rates': missing_rates,
     })
 
 
@@ -436,27 +643,444 @@ def api_timeline(request):
     date_str = request.GET.get('date', str(date.today()))
     target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
     
-    entries = TimeEntry.objects.filter(
-        user=request.user,
-        is_deleted=False,
-        start_time__date=target_date
-    ).select_related('task__project__client').order_by('start_time')
+    days = intervals.timeline(request.user, target_date, target_date)
+    return JsonResponse({'timeline': days[target_date]})
+
+
+def parse_date_range(request, max_days=366):
+    """Read ``start``/``end`` (YYYY-MM-DD) query parameters"""
+    today = date.today()
+    date_from = datetime.strptime(request.GET.get('start', str(today - timedelta(days=6))), '%Y-%m-%d').date()
+    date_to = datetime.strptime(request.GET.get('end', str(today)), '%Y-%m-%d').date()
+    if date_to < date_from:
+        raise ValueError('end must not be before start')
+    if (date_to - date_from).days >= max_days:
+        raise ValueError(f'Range must not exceed {max_days} days')
+    return date_from, date_to
+
+
+@login_required
+def api_timeline_range(request):
+    """Get timeline data for several days, entries split at midnight"""
+    try:
+        date_from, date_to = parse_date_range(request, max_days=62)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    days = intervals.timeline(request.user, date_from, date_to)
+    return JsonResponse({
+        'days': [{'date': day.isoformat(), 'timeline': segments} for day, segments in days.items()]
+    })
+
+
+@login_required
+def api_timeline_gaps(request):
+    """List untracked stretches within working hours"""
+    try:
+        date_from, date_to = parse_date_range(request)
+        work_start = datetime.strptime(request.GET.get('work_start', '09:00'), '%H:%M').time()
+        work_end = datetime.strptime(request.GET.get('work_end', '17:00'), '%H:%M').time()
+        min_minutes = int(request.GET.get('min_minutes', 15))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    gaps = intervals.find_gaps(
+        request.user, date_from, date_to,
+        work_start=work_start,
+        work_end=work_end,
+        min_minutes=min_minutes,
+    )
+    return JsonResponse({
+        'gaps': gaps,
+        'total_minutes': sum(gap['minutes'] for gap in gaps),
+    })
+
+
+@login_required
+def api_reports(request):
+    """Ad hoc report, e.g. ?dimensions=client,month&measures=hours,revenue&date_from=2025-01-01"""
+    try:
+        report = reports.run_report(request.user, request.GET)
+    except reports.ReportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(report)
+
+
+# ==================== SETTINGS & NOTIFICATION APIs ====================
+
+@login_required
+def api_settings(request):
+    """Get or update the user's timer reconciliation rules"""
+    # Reads fall back to the defaults without creating a row
+    settings_obj = TrackerSettings.objects.filter(user=request.user).first() or TrackerSettings(user=request.user)
+    
+    if request.method == 'PUT':
+        data = json.loads(request.body)
+        if 'max_timer_hours' in data:
+            try:
+                max_hours = Decimal(str(data['max_timer_hours'])) if data['max_timer_hours'] else None
+                valid = max_hours is None or Decimal('0.25') <= max_hours <= Decimal('999.99')
+            except ArithmeticError:  # Not a number, or NaN
+                valid = False
+            if not valid:
+                return JsonResponse({'error': 'max_timer_hours must be a number between 0.25 and 999.99'}, status=400)
+            settings_obj.max_timer_hours = max_hours
+        if 'idle_action' in data:
+            if data['idle_action'] not in dict(TrackerSettings.IDLE_ACTION_CHOICES):
+                return JsonResponse({'error': 'Unknown idle_action'}, status=400)
+            settings_obj.idle_action = data['idle_action']
+        settings_obj.save()
+    elif request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    return JsonResponse({
+        'max_timer_hours': str(settings_obj.max_timer_hours) if settings_obj.max_timer_hours else None,
+        'default_max_timer_hours': str(idle.default_max_hours()),
+        'idle_action': settings_obj.idle_action,
+    })
+
+
+@login_required
+def api_notifications(request):
+    """List unread notifications, or mark them as read"""
+    notifications = TrackerNotification.objects.filter(user=request.user, is_read=False)
+    
+    if request.method == 'GET':
+        return JsonResponse({'notifications': [{
+            'id': notification.id,
+            'kind': notification.kind,
+            'message': notification.message,
+            'data': notification.data,
+            'created_at': notification.created_at.isoformat(),
+        } for notification in notifications[:50]]})
+    
+    elif request.method == 'POST':
+        data = json.loads(request.body) if request.body else {}
+        if data.get('ids'):
+            notifications = notifications.filter(id__in=data['ids'])
+        count = notifications.update(is_read=True)
+        return JsonResponse({'success': True, 'read': count})
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+# ==================== REPORT SCHEDULE APIs ====================
+
+def serialize_report_schedule(schedule, include_deliveries=False):
+    data = {
+        'id': schedule.id,
+        'client_id': schedule.client_id,
+        'frequency': schedule.frequency,
+        'recipients': schedule.get_recipients(),
+        'is_active': schedule.is_active,
+        'next_run_at': schedule.next_run_at.isoformat(),
+        'last_run_at': schedule.last_run_at.isoformat() if schedule.last_run_at else None,
+    }
+    if include_deliveries:
+        data['deliveries'] = [serialize_report_delivery(delivery) for delivery in schedule.deliveries.all()[:20]]
+    return data
+
+
+def serialize_report_delivery(delivery):
+    return {
+        'id': delivery.id,
+        'period_start': delivery.period_start.isoformat(),
+        'period_end': delivery.period_end.isoformat(),
+        'status': delivery.status,
+        'html_file_id': delivery.html_file_id,
+        'pdf_file_id': delivery.pdf_file_id,
+        'error': delivery.error,
+        'sent_at': delivery.sent_at.isoformat() if delivery.sent_at else None,
+    }
+
+
+def apply_report_schedule_data(request, schedule, data):
+    if 'client_id' in data:
+        schedule.client_id = get_object_or_404(Client, id=data['client_id'], user=request.user).id if data['client_id'] else None
+    if 'frequency' in data:
+        if data['frequency'] not in dict(ReportSchedule.FREQUENCY_CHOICES):
+            raise ValueError('frequency must be weekly or monthly')
+        if data['frequency'] != schedule.frequency:
+            schedule.frequency = data['frequency']
+            schedule.next_run_at = None
+    if 'recipients' in data:
+        recipients = data['recipients']
+        schedule.recipients = ', '.join(recipients) if isinstance(recipients, list) else (recipients or '')
+    if 'is_active' in data:
+        schedule.is_active = bool(data['is_active'])
+    if not schedule.next_run_at:
+        schedule.next_run_at = timesheets.next_run_after(schedule.frequency, timezone.now())
+
+
+@login_required
+def api_report_schedules(request):
+    """API for scheduled timesheet emails"""
+    if request.method == 'GET':
+        schedules = ReportSchedule.objects.filter(user=request.user)
+        return JsonResponse({'schedules': [serialize_report_schedule(schedule) for schedule in schedules]})
+    
+    elif request.method == 'POST':
+        data = json.loads(request.body)
+        schedule = ReportSchedule(user=request.user)
+        try:
+            apply_report_schedule_data(request, schedule, data)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        schedule.save()
+        return JsonResponse(serialize_report_schedule(schedule), status=201)
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@login_required
+def api_report_schedule_detail(request, schedule_id):
+    """API for single report schedule operations"""
+    schedule = get_object_or_404(ReportSchedule, id=schedule_id, user=request.user)
+    
+    if request.method == 'GET':
+        return JsonResponse(serialize_report_schedule(schedule, include_deliveries=True))
+    
+    elif request.method == 'PUT':
+        data = json.loads(request.body)
+        try:
+            apply_report_schedule_data(request, schedule, data)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        schedule.save()
+        return JsonResponse(serialize_report_schedule(schedule))
+    
+    elif request.method == 'DELETE':
+        schedule.delete()
+        return JsonResponse({'success': True})
     
-    timeline_data = []
-    for entry in entries:
-        start_hour = entry.start_time.hour + entry.start_time.minute / 60
-        duration_hours = entry.get_duration_hours()
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@login_required
+def api_report_schedule_send(request, schedule_id):
+    """Send the last complete period now; rendering and email happen in the background"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    schedule = get_object_or_404(ReportSchedule, id=schedule_id, user=request.user)
+    period_start, period_end = timesheets.period_for(schedule.frequency, timezone.localdate())
+    delivery = timesheets.queue(schedule, period_start, period_end)
+    return JsonResponse(serialize_report_delivery(delivery), status=202)
+
+
+# ==================== INVOICE APIs ====================
+
+def serialize_invoice(invoice, include_lines=False):
+    data = {
+        'id': invoice.id,
+        'number': invoice.number,
+        'client_id': invoice.client_id,
+        'client_name': invoice.client.name,
+        'period_start': invoice.period_start.isoformat(),
+        'period_end': invoice.period_end.isoformat(),
+        'issue_date': invoice.issue_date.isoformat(),
+        'status': invoice.status,
+        'total_hours': str(invoice.total_hours),
+        'currency': invoice.currency,
+        'subtotal': str(invoice.subtotal),
+        'tax_rate': str(invoice.tax_rate),
+        'total': str(invoice.get_total()),
+        'pdf_ready': bool(invoice.pdf),
+    }
+    if include_lines:
+        data['lines'] = [{
+            'project_id': line.project_id,
+            'task_id': line.task_id,
+            'description': line.description,
+            'hours': str(line.hours),
+            'rate': str(line.rate),
+            'amount': str(line.amount),
+            'entry_count': line.entry_count,
+        } for line in invoice.lines.all()]
+    return data
+
+
+@login_required
+def api_invoices(request):
+    """API for invoice operations"""
+    if request.method == 'GET':
+        invoices = Invoice.objects.filter(user=request.user).select_related('client')
+        client_id = request.GET.get('client_id')
+        if client_id:
+            invoices = invoices.filter(client_id=client_id)
+        return JsonResponse({'invoices': [serialize_invoice(invoice) for invoice in invoices[:100]]})
+    
+    elif request.method == 'POST':
+        data = json.loads(request.body)
+        try:
+            period_start = date.fromisoformat(data['period_start'])
+            period_end = date.fromisoformat(data['period_end'])
+        except (KeyError, TypeError, ValueError):
+            return JsonResponse({'error': 'period_start and period_end are required (YYYY-MM-DD)'}, status=400)
+        try:
+            tax_rate = Decimal(str(data.get('tax_rate', '0.00')))
+            valid = Decimal('0') <= tax_rate <= Decimal('100')
+        except ArithmeticError:  # Not a number, or NaN
+            valid = False
+        if not valid:
+            return JsonResponse({'error': 'tax_rate must be a percentage between 0 and 100'}, status=400)
         
-        timeline_data.append({
-            'id': entry.id,
-            'task_name': entry.task.name,
-            'project_name': entry.task.project.name,
-            'client_name': entry.task.project.client.name,
-            'start_hour': start_hour,
-            'duration_hours': duration_hours,
-            'color': entry.task.project.color,
-            'description': entry.description,
-            'is_billable': entry.is_billable,
+        if data.get('client_id'):
+            clients = [get_object_or_404(Client, id=data['client_id'], user=request.user)]
+        else:
+            clients = Client.objects.filter(user=request.user, is_active=True)
+        
+        invoices, skipped = invoicing.run_batch(request.user, period_start, period_end, tax_rate=tax_rate, clients=clients)
+        return JsonResponse({
+            'invoices': [serialize_invoice(invoice) for invoice in invoices],
+            'skipped': skipped,
         })
     
-    return JsonResponse({'timeline': timeline_data})
\ No newline at end of file
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@login_required
+def api_invoice_detail(request, invoice_id):
+    """API for single invoice operations"""
+    invoice = get_object_or_404(Invoice.objects.select_related('client'), id=invoice_id, user=request.user)
+    
+    if request.method == 'GET':
+        return JsonResponse(serialize_invoice(invoice, include_lines=True))
+    
+    elif request.method == 'PUT':
+        data = json.loads(request.body)
+        if data.get('status') in ('draft', 'issued', 'paid'):
+            invoice.status = data['status']
+            invoice.save(update_fields=['status', 'updated_at'])
+        return JsonResponse({'success': True})
+    
+    elif request.method == 'DELETE':
+        invoicing.cancel_invoice(invoice)
+        return JsonResponse({'success': True})
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@login_required
+def api_invoice_pdf(request, invoice_id):
+    """Download the rendered invoice PDF"""
+    invoice = get_object_or_404(Invoice, id=invoice_id, user=request.user)
+    if not invoice.pdf:
+        return JsonResponse({'status': 'rendering'}, status=202)
+    return FileResponse(invoice.pdf.open('rb'), as_attachment=True, filename=f"invoice-{invoice.number}.pdf")
+
+
+
+# ==================== RATE APIs ====================
+
+def serialize_rate_schedule(schedule):
+    return {
+        'id': schedule.id,
+        'client_id': schedule.client_id,
+        'project_id': schedule.project_id,
+        'task_id': schedule.task_id,
+        'hourly_rate': str(schedule.hourly_rate) if schedule.hourly_rate is not None else None,
+        'daily_rate': str(schedule.daily_rate) if schedule.daily_rate is not None else None,
+        'effective_hourly_rate': str(schedule.get_hourly_rate()) if schedule.get_hourly_rate() is not None else None,
+        'valid_from': schedule.valid_from.isoformat(),
+        'valid_to': schedule.valid_to.isoformat() if schedule.valid_to else None,
+    }
+
+
+def apply_rate_schedule_data(request, schedule, data):
+    for field, model in (('client_id', Client), ('project_id', Project), ('task_id', Task)):
+        if field in data:
+            value = data[field]
+            setattr(schedule, field, get_object_or_404(model, id=value, user=request.user).id if value else None)
+    if 'hourly_rate' in data:
+        schedule.hourly_rate = Decimal(str(data['hourly_rate'])) if data['hourly_rate'] not in (None, '') else None
+    if 'daily_rate' in data:
+        schedule.daily_rate = Decimal(str(data['daily_rate'])) if data['daily_rate'] not in (None, '') else None
+    if 'valid_from' in data:
+        schedule.valid_from = date.fromisoformat(data['valid_from'])
+    if 'valid_to' in data:
+        schedule.valid_to = date.fromisoformat(data['valid_to']) if data['valid_to'] else None
+    
+    if sum(1 for scope in (schedule.client_id, schedule.project_id, schedule.task_id) if scope) != 1:
+        raise ValueError('Exactly one of client_id, project_id or task_id is required')
+    if schedule.get_hourly_rate() is None:
+        raise ValueError('hourly_rate or daily_rate is required')
+    if schedule.valid_to and schedule.valid_to < schedule.valid_from:
+        raise ValueError('valid_to must not be before valid_from')
+
+
+@login_required
+def api_rate_schedules(request):
+    """API for effective-dated rate schedules"""
+    if request.method == 'GET':
+        schedules = RateSchedule.objects.filter(user=request.user)
+        for field in ('client_id', 'project_id', 'task_id'):
+            if request.GET.get(field):
+                schedules = schedules.filter(**{field: request.GET[field]})
+        return JsonResponse({'rates': [serialize_rate_schedule(schedule) for schedule in schedules]})
+    
+    elif request.method == 'POST':
+        data = json.loads(request.body)
+        schedule = RateSchedule(user=request.user, valid_from=date.today())
+        try:
+            apply_rate_schedule_data(request, schedule, data)
+        except (ValueError, ArithmeticError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        schedule.save()
+        return JsonResponse(serialize_rate_schedule(schedule))
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@login_required
+def api_rate_schedule_detail(request, schedule_id):
+    """API for single rate schedule operations"""
+    schedule = get_object_or_404(RateSchedule, id=schedule_id, user=request.user)
+    
+    if request.method == 'PUT':
+        data = json.loads(request.body)
+        try:
+            apply_rate_schedule_data(request, schedule, data)
+        except (ValueError, ArithmeticError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        schedule.save()
+        return JsonResponse(serialize_rate_schedule(schedule))
+    
+    elif request.method == 'DELETE':
+        schedule.delete()
+        return JsonResponse({'success': True})
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@login_required
+def api_exchange_rates(request):
+    """API for the local exchange rate table"""
+    if request.method == 'GET':
+        exchange_rates = ExchangeRate.objects.all()
+        if request.GET.get('base'):
+            exchange_rates = exchange_rates.filter(base=request.GET['base'].upper())
+        return JsonResponse({'exchange_rates': [{
+            'base': rate.base,
+            'quote': rate.quote,
+            'rate': str(rate.rate),
+            'date': rate.date.isoformat(),
+        } for rate in exchange_rates[:500]]})
+    
+    elif request.method == 'POST':
+        # The table converts every user's revenue
+        if not request.user.is_staff:
+            return JsonResponse({'error': 'Only staff can change exchange rates'}, status=403)
+        data = json.loads(request.body)
+        try:
+            rate, _ = ExchangeRate.objects.update_or_create(
+                base=data['base'].upper(),
+                quote=data['quote'].upper(),
+                date=date.fromisoformat(data.get('date', str(date.today()))),
+                defaults={'rate': Decimal(str(data['rate']))},
+            )
+        except (KeyError, ValueError, ArithmeticError) as e:
+            return JsonResponse({'error': f'Invalid exchange rate: {e}'}, status=400)
+        return JsonResponse({'success': True, 'id': rate.id})
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)